@@ -0,0 +1,43 @@
+"""Compare batched and sequential execution of parameterized lookups.
+
+Usage::
+
+    python benchmarks/bench_executemany.py
+
+"""
+from __future__ import print_function, division, absolute_import
+
+import time
+
+import numpy as np
+import pandas as pd
+
+import framequery as fq
+
+
+def main():
+    df = pd.DataFrame({
+        'id': np.arange(100000),
+        'value': np.random.uniform(size=100000),
+    })
+    executor = fq.Executor({'example': df})
+    statement = executor.prepare('select id, value from example where id = %(id)s')
+
+    print('{:>8} {:>16} {:>16}'.format('batch', 'sequential [s]', 'batched [s]'))
+
+    for size in [10, 100, 1000]:
+        params_seq = [{'id': int(i)} for i in np.random.randint(0, 100000, size=size)]
+
+        start = time.time()
+        pd.concat([statement.execute(params) for params in params_seq], ignore_index=True)
+        sequential = time.time() - start
+
+        start = time.time()
+        statement.executemany(params_seq)
+        batched = time.time() - start
+
+        print('{:>8} {:>16.3f} {:>16.3f}'.format(size, sequential, batched))
+
+
+if __name__ == "__main__":
+    main()
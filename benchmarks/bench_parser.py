@@ -0,0 +1,90 @@
+"""Measure parse times for nested expressions and long where clauses.
+
+The last table compares parsing with and without debug information, both in
+time and in peak memory (on python 3 only).
+
+Usage::
+
+    python benchmarks/bench_parser.py
+
+"""
+from __future__ import print_function, division, absolute_import
+
+import timeit
+
+try:
+    import tracemalloc
+
+except ImportError:
+    tracemalloc = None
+
+from framequery.parser import parse
+
+
+def nested_query(depth):
+    return 'select ' + '(' * depth + 'a + 1' + ')' * depth + ' from test'
+
+
+def where_query(n_predicates):
+    return 'select a, b from test where ' + ' and '.join(
+        'c{0} = {0}'.format(i) for i in range(n_predicates)
+    )
+
+
+def measure(query, **kwargs):
+    number = 3
+    return min(timeit.repeat(lambda: parse(query, cache=False, **kwargs), number=number, repeat=3)) / number
+
+
+def measure_memory(query, **kwargs):
+    if tracemalloc is None:
+        return float('nan')
+
+    tracemalloc.start()
+    try:
+        parse(query, cache=False, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+
+    finally:
+        tracemalloc.stop()
+
+    return peak
+
+
+def main():
+    print('nested expressions')
+    print('{:>8} {:>14} {:>14}'.format('depth', 'default [ms]', 'packrat [ms]'))
+
+    for depth in [1, 2, 4, 6, 8]:
+        query = nested_query(depth)
+        print('{:>8} {:>14.2f} {:>14.2f}'.format(
+            depth, 1e3 * measure(query), 1e3 * measure(query, packrat=True),
+        ))
+
+    print()
+    print('where clauses')
+    print('{:>8} {:>14} {:>14}'.format('terms', 'default [ms]', 'packrat [ms]'))
+
+    for n_predicates in [1, 5, 10, 20, 100, 1000]:
+        query = where_query(n_predicates)
+        print('{:>8} {:>14.2f} {:>14.2f}'.format(
+            n_predicates, 1e3 * measure(query), 1e3 * measure(query, packrat=True),
+        ))
+
+    print()
+    print('debug information (where clauses)')
+    print('{:>8} {:>14} {:>14} {:>14} {:>14}'.format(
+        'terms', 'debug [ms]', 'fast [ms]', 'debug [kB]', 'fast [kB]',
+    ))
+
+    for n_predicates in [1, 10, 100, 1000]:
+        query = where_query(n_predicates)
+        print('{:>8} {:>14.2f} {:>14.2f} {:>14.1f} {:>14.1f}'.format(
+            n_predicates,
+            1e3 * measure(query, debug=True), 1e3 * measure(query),
+            measure_memory(query, debug=True) / 1024, measure_memory(query) / 1024,
+        ))
+
+
+if __name__ == "__main__":
+    main()
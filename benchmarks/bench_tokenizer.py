@@ -0,0 +1,35 @@
+"""Measure how tokenizing scales with the query length.
+
+Usage::
+
+    python benchmarks/bench_tokenizer.py
+
+The time per character should stay roughly constant as the queries grow.
+"""
+from __future__ import print_function, division, absolute_import
+
+import timeit
+
+from framequery.parser import tokenize
+
+
+def make_query(n_items):
+    items = ', '.join(str(i) for i in range(n_items))
+    return 'select a, b -- lookup\n from test where id in ({}) and name = \'foo\'\'s\''.format(items)
+
+
+def main():
+    print('{:>8} {:>10} {:>12} {:>14}'.format('items', 'chars', 'time [ms]', 'time/char [ns]'))
+
+    for n_items in [1000, 2000, 4000, 8000, 16000]:
+        query = make_query(n_items)
+        number = 5
+        elapsed = min(timeit.repeat(lambda: tokenize(query), number=number, repeat=3)) / number
+
+        print('{:>8} {:>10} {:>12.2f} {:>14.1f}'.format(
+            n_items, len(query), 1e3 * elapsed, 1e9 * elapsed / len(query),
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 from __future__ import print_function, division, absolute_import
 
-from .executor import execute, Executor, PandasModel, DaskModel
+from .executor import execute, Executor, PandasModel, DaskModel, Scope
 
-__all__ = ['execute', 'Executor', 'PandasModel', 'DaskModel']
+__all__ = ['execute', 'Executor', 'PandasModel', 'DaskModel', 'Scope']
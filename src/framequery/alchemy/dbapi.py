@@ -1,7 +1,5 @@
 from __future__ import print_function, division, absolute_import
 
-from .. import util
-
 paramstyle = 'pyformat'
 threadsafety = 1
 apilevel = '2.0'
@@ -84,16 +82,26 @@ class Cursor(object):
 
     def execute(self, q, params=None):
         if params:
-            params = util.escape_parameters(params)
-            q = q % params
+            result = self.connection.executor.prepare(q, paramstyle=paramstyle).execute(params)
+
+        else:
+            result = self.connection.executor.execute(q)
+
+        if result is not None:
+            result = self.connection.executor.compute(result)
 
-        self.result = self.connection.executor.execute(q)
+        self._set_result(result)
+
+    def executemany(self, q, parameters):
+        statement = self.connection.executor.prepare(q, paramstyle=paramstyle)
+        self._set_result(statement.executemany(parameters))
+
+    def _set_result(self, result):
+        self.result = result
 
         if self.result is None:
             return
 
-        self.result = self.connection.executor.compute(self.result)
-
         self.description = []
 
         typemap = {
@@ -122,10 +130,6 @@ class Cursor(object):
         self.rownumber = 0
         self.rowcount = self.result.shape[0]
 
-    def executemany(self, q, parameters):
-        for p in parameters:
-            self.execute(q, p)
-
     def fetchone(self):
         if self.rownumber >= self.result.shape[0]:
             return None
@@ -1,8 +1,9 @@
 from __future__ import print_function, division, absolute_import
 
-from ._executor import Executor, execute
+from ._executor import Executor, PreparedStatement, execute
 from ._pandas import PandasModel
 from ._dask import DaskModel
+from ._stats import Scope
 
 
-__all__ = ['Executor', 'execute', 'DaskModel', 'PandasModel']
+__all__ = ['Executor', 'PreparedStatement', 'execute', 'DaskModel', 'PandasModel', 'Scope']
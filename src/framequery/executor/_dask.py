@@ -1,16 +1,25 @@
 from __future__ import print_function, division, absolute_import
 
 import functools as ft
+import logging
+import math
 import os.path
 
+import dask
 import dask.dataframe as dd
+import numpy as np
 import pandas as pd
+from dask import delayed
+from dask.blockwise import Blockwise
+from dask.highlevelgraph import HighLevelGraph
 
 from ._util import all_unique
-from ._pandas import PandasModel
+from ._pandas import PandasModel, apply_bloom_filter, build_bloom_filter, can_bloom_filter
 
 from ..util import dask_add_rowid, dask_offset_limit, dask_sort_values
 
+_logger = logging.getLogger(__name__)
+
 
 class DaskModel(PandasModel):
     """A framequery model for ``dask.dataframe.DataFrame`` objects.
@@ -19,10 +28,55 @@ class DaskModel(PandasModel):
 
     The dask executor supports scopes with both pandas and dask dataframes.
     The former will be converted into later automatically, as needed.
+
+    :param int broadcast_threshold:
+        pandas dataframes with at most this many rows are converted into
+        single partition dataframes. In joins with larger tables, they are
+        merged with each partition of the larger table without any shuffle.
+        Analyzed dask dataframes below the threshold are repartitioned into
+        a single partition.
+
+    :param int partition_size:
+        the target size in bytes of the partitions of analyzed pandas
+        dataframes converted to dask. Without statistics, 20 partitions are
+        used.
+
+    :param Optional[int] materialize_limit:
+        common tables used multiple times in a query are persisted, as long
+        as their total memory usage in bytes stays below this limit. Tables
+        whose estimated size, based on statistics, exceeds the limit are
+        recomputed for each use. Tables without estimates are persisted and
+        count towards the limit. If ``None``, all are persisted.
+
+    :param bool runtime_filters:
+        if True, the ranges of the keys of the table with fewer partitions in
+        equality joins are used to filter the rows of the other table before
+        the merge. The ranges are computed lazily, as part of the query.
+
+    :param bool prune_partitions:
+        if True, runtime filters also drop partitions that cannot match.
+        This requires to persist the table with fewer partitions and to
+        compute the key ranges when the query is built, i.e., part of the
+        query is executed eagerly. Partitions are only dropped if each
+        partition of the other table is computed from a single in-memory
+        partition, e.g., of persisted or pandas tables. The number of dropped
+        partitions is reported by ``explain analyze``.
     """
-    def __init__(self, **kwargs):
+    def __init__(
+        self, broadcast_threshold=100000, materialize_limit=None, partition_size=2 ** 26, runtime_filters=True,
+        prune_partitions=False, **kwargs
+    ):
         super(DaskModel, self).__init__(**kwargs)
 
+        self.broadcast_threshold = broadcast_threshold
+        self.partition_size = partition_size
+        self.materialize_limit = materialize_limit
+        self.runtime_filters = runtime_filters
+        self.prune_partitions = prune_partitions
+
+        # the number of partitions dropped by runtime filters, reset by analyze_table
+        self.pruned_partitions = 0
+
         self.lateral_functions = dict(self.lateral_functions)
 
         self.table_functions = {
@@ -72,19 +126,151 @@ class DaskModel(PandasModel):
 
         return super(DaskModel, self).add_columns(df, columns, name_generator)
 
+    def merge(self, left, right, left_on, right_on, how):
+        # only rows of tables, whose unmatched rows are dropped, can be filtered
+        if how in {'inner', 'left'} and left.npartitions < right.npartitions:
+            left, right = self.filter_join_input(left, left_on, right, right_on)
+
+        elif how in {'inner', 'right'} and right.npartitions < left.npartitions:
+            right, left = self.filter_join_input(right, right_on, left, left_on)
+
+        return left.merge(right, left_on=left_on, right_on=right_on, how=how)
+
+    def filter_join_input(self, build, build_on, probe, probe_on):
+        if self.runtime_filters:
+            build, probe = self.runtime_filter(build, build_on, probe, probe_on)
+
+        if can_bloom_filter(
+            build._meta, build_on, probe._meta, probe_on, self.bloom_filter_selectivity, inspect_values=False,
+        ):
+            probe = self.bloom_filter(build, build_on, probe, probe_on)
+
+        return build, probe
+
+    def bloom_filter(self, build, build_on, probe, probe_on):
+        """Build the Bloom filter of ``build`` once, and decide per partition of ``probe`` whether to apply it."""
+        # NOTE: optimized graphs of to_delayed clash with other uses of the same tables in the query
+        bloom = delayed(build_bloom_filter)(delayed(pd.concat)(build.to_delayed(optimize_graph=False)), build_on)
+        parts = [
+            delayed(apply_bloom_filter)(part, probe_on, bloom, self.bloom_filter_selectivity)
+            for part in probe.to_delayed(optimize_graph=False)
+        ]
+        return dd.from_delayed(parts, meta=probe._meta)
+
+    def runtime_filter(self, build, build_on, probe, probe_on):
+        """Restrict the probe side of a join to the key ranges of the build side.
+
+        :returns:
+            the build side, persisted if partitions are pruned, and the
+            filtered probe side.
+        """
+        keys = [
+            (build_key, probe_key)
+            for build_key, probe_key in zip(build_on, probe_on)
+            if range_kind(build._meta[build_key]) is not None and
+            range_kind(build._meta[build_key]) == range_kind(probe._meta[probe_key])
+        ]
+
+        if not keys:
+            return build, probe
+
+        if self.prune_partitions:
+            build = build.persist()
+
+        bounds = delayed(key_bounds)(
+            [probe_key for _, probe_key in keys],
+            [agg.to_delayed(optimize_graph=False) for key, _ in keys for agg in (build[key].min(), build[key].max())],
+        )
+
+        if self.prune_partitions and is_partitionwise(probe):
+            bounds = bounds.compute()
+            probe = self.prune_key_ranges(probe, bounds)
+
+        probe = probe.map_partitions(filter_key_ranges, bounds, meta=probe._meta)
+        return build, probe
+
+    def prune_key_ranges(self, probe, bounds):
+        """Drop the partitions of ``probe`` without keys within the bounds."""
+        keys = [key for key, _, _ in bounds]
+        ranges = dask.compute(*[
+            delayed(partition_key_ranges)(part, keys) for part in probe.to_delayed(optimize_graph=False)
+        ])
+        keep = [idx for idx, part_ranges in enumerate(ranges) if ranges_overlap(part_ranges, bounds)]
+
+        pruned = probe.npartitions - len(keep)
+        _logger.debug('runtime filter %s drops %d of %d partitions', bounds, pruned, probe.npartitions)
+        self.pruned_partitions += pruned
+
+        if len(keep) == probe.npartitions:
+            return probe
+
+        # keep a single partition to retain the structure, its rows are filtered afterwards
+        parts = probe.to_delayed()
+        return dd.from_delayed([parts[idx] for idx in keep or [0]], meta=probe._meta)
+
+    def band_join(self, left, right, band, name_generator):
+        """Broadcast the table with fewer partitions and band join it to each partition of the other."""
+        name_generator = name_generator.fix(all_unique(band))
+        band_join = delayed(super(DaskModel, self).band_join)
+        meta = pd.concat([left._meta, right._meta], axis=1)
+
+        left_parts = left.to_delayed()
+        right_parts = right.to_delayed()
+
+        if len(right_parts) <= len(left_parts):
+            right = delayed(pd.concat)(right_parts)
+            parts = [band_join(part, right, band, name_generator) for part in left_parts]
+
+        else:
+            left = delayed(pd.concat)(left_parts)
+            parts = [band_join(left, part, band, name_generator) for part in right_parts]
+
+        return dd.from_delayed(parts, meta=meta)
+
+    def semi_join(self, left, right, on, how, null_aware, name_generator):
+        """Build the hash set of ``right`` once and probe it with each partition of ``left``."""
+        name_generator = name_generator.fix(all_unique(on))
+        build = delayed(super(DaskModel, self).build_semi_join_keys)
+        probe = delayed(super(DaskModel, self).probe_semi_join_keys)
+
+        keys = build(delayed(pd.concat)(right.to_delayed()), len(on))
+        parts = [probe(part, keys, on, how, null_aware, name_generator) for part in left.to_delayed()]
+        return dd.from_delayed(parts, meta=left._meta)
+
     def add_rowid(self, table, column, name_generator):
         return dask_add_rowid(table, name_generator.get(column))
 
-    def get_table(self, scope, name, alias=None):
+    def get_table(self, scope, name, alias=None, columns=None):
         if name in self.special_tables:
             return self.get_special_table(scope, name, alias)
 
-        table = super(DaskModel, self).get_table(scope, name, alias)
+        stats = getattr(scope, 'stats', None)
+        stats = stats.get(name, scope[name], lazy=False) if stats is not None else None
+
+        table = super(DaskModel, self).get_table(scope, name, alias, columns=columns)
+
+        # NOTE: dask broadcasts single partition tables in joins
         if isinstance(table, pd.DataFrame):
-            return dd.from_pandas(table, npartitions=20)
+            if len(table) <= self.broadcast_threshold:
+                npartitions = 1
+
+            elif stats is not None:
+                npartitions = int(math.ceil(stats.memory / self.partition_size))
+
+            else:
+                npartitions = 20
+
+            return dd.from_pandas(table, npartitions=max(1, npartitions))
+
+        if stats is not None and stats.rows <= self.broadcast_threshold and table.npartitions > 1:
+            return table.repartition(npartitions=1)
 
         return table
 
+    def from_pandas(self, df):
+        """Convert a small pandas dataframe into a single partition dataframe."""
+        return dd.from_pandas(df, npartitions=1)
+
     def get_special_table(self, scope, name, alias):
         return dd.from_pandas(
             super(DaskModel, self).get_special_table(scope, name, alias),
@@ -142,6 +328,131 @@ class DaskModel(PandasModel):
     def limit_offset(self, table, limit=None, offset=None):
         return dask_offset_limit(table, limit=limit, offset=offset)
 
+    def materialize(self, table, used=0, rows=None):
+        # NOTE: tables over the limit are not persisted, if their size can be estimated beforehand
+        if self.materialize_limit is not None and rows is not None:
+            size = estimate_memory(table._meta, rows)
+
+            if used + size > self.materialize_limit:
+                return table, used
+
+        # NOTE: once computed, tables are kept, otherwise each use would compute them again
+        table = table.persist()
+        return table, used + int(table.memory_usage(deep=True).sum().compute())
+
+    def analyze_table(self, table):
+        tasks = len(table.dask)
+        table = table.persist()
+
+        pruned_partitions, self.pruned_partitions = self.pruned_partitions, 0
+        return table, dict(
+            rows=len(table), partitions=table.npartitions, tasks=tasks, pruned_partitions=pruned_partitions,
+        )
+
+    def top_n(self, table, names, ascending, limit, offset=None):
+        # select the candidates per partition, then the result from their union
+        top_n = super(DaskModel, self).top_n
+        n = limit + (offset or 0)
+
+        table = table.map_partitions(top_n, names, ascending, n, meta=table._meta)
+        table = table.repartition(npartitions=1)
+        return table.map_partitions(top_n, names, ascending, limit, offset, meta=table._meta)
+
+
+#: the assumed size in bytes of a value of an object column, e.g., a short string
+object_value_size = 64
+
+
+def estimate_memory(meta, rows):
+    """Estimate the memory usage in bytes of a table with the given metadata."""
+    row_size = sum(
+        object_value_size if dtype.kind == 'O' else getattr(dtype, 'itemsize', object_value_size)
+        for dtype in meta.dtypes
+    )
+    return int(rows * row_size)
+
+
+def range_kind(values):
+    """Return the kind of values that can be compared by their ranges or ``None``."""
+    kind = values.dtype.kind
+
+    if kind in 'biuf':
+        return 'number'
+
+    return kind if kind in 'mM' else None
+
+
+def is_partitionwise(table):
+    """Check whether each partition is computed only from the same partition of in-memory tables.
+
+    Only the layers of the graph are inspected, their tasks are not materialized.
+    """
+    graph = table.__dask_graph__()
+
+    if not isinstance(graph, HighLevelGraph):
+        return False
+
+    for name, layer in graph.layers.items():
+        if isinstance(layer, Blockwise):
+            if not is_partitionwise_layer(layer):
+                return False
+
+        # other layers are only allowed as sources, e.g., of in-memory tables
+        elif graph.dependencies.get(name):
+            return False
+
+    return True
+
+
+def is_partitionwise_layer(layer):
+    """Check whether a blockwise layer maps partitions one to one, without broadcasting any input."""
+    if layer.new_axes:
+        return False
+
+    numblocks = set()
+
+    for name, indices in layer.indices:
+        if indices is None:
+            continue
+
+        if tuple(indices) != tuple(layer.output_indices):
+            return False
+
+        numblocks.add(tuple(layer.numblocks[name]))
+
+    return len(numblocks) <= 1
+
+
+def key_bounds(keys, values):
+    return [(key, lo, hi) for key, lo, hi in zip(keys, values[::2], values[1::2])]
+
+
+def partition_key_ranges(df, columns):
+    return [(df[col].min(), df[col].max(), bool(df[col].isnull().any())) for col in columns]
+
+
+def ranges_overlap(ranges, bounds):
+    """Check whether a partition may contain rows within the bounds, nulls are kept as in ``merge``."""
+    for (lo, hi, nulls), (_, build_lo, build_hi) in zip(ranges, bounds):
+        if nulls:
+            continue
+
+        if pd.isnull(lo) or pd.isnull(build_lo) or hi < build_lo or lo > build_hi:
+            return False
+
+    return True
+
+
+def filter_key_ranges(df, bounds):
+    sel = np.ones(len(df), dtype=bool)
+
+    for col, lo, hi in bounds:
+        values = df[col]
+        in_range = (values >= lo) & (values <= hi) if not pd.isnull(lo) else False
+        sel &= (in_range | values.isnull()).values
+
+    return df[sel]
+
 
 def to_dd_table_function(pd_func, npartitions=20):
     @ft.wraps(pd_func)
@@ -152,8 +463,9 @@ def to_dd_table_function(pd_func, npartitions=20):
     return impl
 
 
-def copy_from(filename, *args):
+def copy_from(filename, *args, **kwargs):
     options = dict(zip(args[:-1:2], args[1::2]))
+    options.update(kwargs)
 
     format = options.pop('format', 'csv')
 
@@ -10,24 +10,30 @@ The most general query involves the following transformations:
 from __future__ import print_function, division, absolute_import
 
 import inspect
-import itertools as it
 import logging
+import math
 
+import pandas as pd
+
+from ._plan import (
+    PlanContext,
+
+    build_plan,
+    execute_plan,
+    explain_plan,
+    flatten_conjunction,
+    format_plan,
+    optimize,
+)
+from ._stats import Scope, ScopeView, Statistics
 from ._util import (
-    Origin,
-    Unique,
     UniqueNameGenerator,
 
     and_join,
-    column_get_table,
-    determine_origin,
     eval_string_literal,
-    flatten_ands,
-    internal_column,
-    normalize_col_ref,
-    to_internal_col,
 )
-from ..parser import ast as a, parse
+from ..parser import ast as a, bind, parse
+from ..parser._parser import get_parameter
 from ..util import _monadic as m, make_meta
 from ..util._record import walk
 
@@ -39,7 +45,11 @@ class Executor(object):
 
     :param scope:
         a mapping of table-names to dataframes. If not given, an empty scope
-        is created.
+        is created. Tables created by queries are added to this mapping.
+
+    :ivar Statistics stats:
+        the statistics of the tables, see ``analyze <table>``. If the scope is
+        a :class:`framequery.Scope`, its statistics are used.
 
     :param model:
         the model to use, see :func:`framequery.execute`.
@@ -50,20 +60,53 @@ class Executor(object):
     """
     def __init__(self, scope=None, model='pandas', basepath='.'):
         if scope is None:
-            scope = scope
+            scope = {}
 
         self.scope = scope
+        self.stats = scope.stats if isinstance(scope, Scope) else Statistics()
         self.model = get_model(model, basepath)
 
+        # NOTE: the view writes through to the caller's mapping
+        self._tables = ScopeView(self.scope, self.stats)
+
     def execute(self, q, basepath=None):
         if basepath is None:
             basepath = self.model.basepath
 
         with self.model.with_basepath(basepath) as model:
-            return execute(q, self.scope, model=model)
+            return execute(q, self._tables, model=model)
+
+    def explain(self, q):
+        """Describe how a select query is executed.
+
+        :returns:
+            the optimized plan as a string, one operator per line with its
+            inputs indented below it and, if known, the estimated number of
+            rows.
+        """
+        return '\n'.join(explain_statement(parse(q), self._tables, self.model))
+
+    def prepare(self, q, paramstyle='pyformat'):
+        """Parse a query once to execute it repeatedly with different parameters.
+
+        :param str q:
+            the query, parameters are given as ``%(name)s`` or ``%s``.
+
+        :param str paramstyle:
+            the paramstyle of the query, currently only ``'pyformat'`` is
+            supported.
+
+        :returns:
+            a :class:`PreparedStatement`.
+        """
+        return PreparedStatement(self, parse(q, paramstyle=paramstyle))
 
     def update(self, *args, **kwargs):
-        self.scope.update(*args, **kwargs)
+        tables = dict(*args, **kwargs)
+        self.scope.update(tables)
+
+        for name in tables:
+            self.stats.invalidate(name)
 
     def compute(self, val):
         return self.model.compute(val)
@@ -95,309 +138,280 @@ class Executor(object):
             self.model.lateral_meta[name] = make_meta(meta)
 
 
-# TOOD: add option autodetect the required model
-def execute(q, scope=None, model='pandas', basepath='.'):
-    """Execute queries against the provided scope.
+class PreparedStatement(object):
+    """A parsed query of an executor, see :meth:`Executor.prepare`.
 
-    :param dict scope:
+    :ivar ast:
+        the parsed query with :class:`framequery.parser.ast.Placeholder` nodes.
 
-        a mapping of table names to dataframes. If not provided the globals and
-        locals of the calling scope are used.
+    """
+    def __init__(self, executor, ast):
+        self.executor = executor
+        self.ast = ast
 
-    :param Union[str,Model] model:
+    def bind(self, params=None):
+        """Return the ast with the given parameters substituted."""
+        return bind(self.ast, params)
 
-        the datamodel to use. Currently ``"pandas"`` and ``"dask"`` are
-        supported as string values. For better customization create the model
-        instances independently and pass them as arguments.
+    def execute(self, params=None, basepath=None):
+        if basepath is None:
+            basepath = self.executor.model.basepath
 
-        See :class:`framequery.PandasModel` and :class:`framequery.DaskModel`
-        for further information.
+        ast = self.bind(params)
 
-    :param str basepath:
+        with self.executor.model.with_basepath(basepath) as model:
+            return execute_statement(ast, self.executor._tables, model)
 
-        the basepath of ``copy from`` and ``copy to`` operations. This argument
-        is only when constructing the models. For independently constructed
-        models, the basepath can be set via their ``__init__`` arguments.
+    def executemany(self, params_seq, basepath=None):
+        """Execute the statement for each parameter set and concatenate the results.
 
-    """
-    if scope is None:
-        frame = inspect.currentframe()
-        assert frame.f_back is not None
+        If the placeholders are only used in equality conditions of the where
+        clause of a simple select, all parameter sets are evaluated at once by
+        joining the query against a table of parameters. Otherwise, or if the
+        types of the parameters and the compared columns do not match, the
+        statement is executed for each parameter set.
 
-        scope = dict(frame.f_back.f_globals)
-        scope.update(frame.f_back.f_locals)
+        :param Sequence params_seq:
+            a sequence of parameters, see :meth:`execute`.
 
-    model = get_model(model, basepath=basepath)
-    name_generator = UniqueNameGenerator()
+        :returns:
+            the computed results in the order of sequential execution, with a
+            fresh index, or ``None`` if no parameters are given or the
+            statement has no result.
+        """
+        params_seq = list(params_seq)
 
-    ast = parse(q)
-    result = execute_ast(ast, scope, model, name_generator)
+        if not params_seq:
+            return None
 
-    if result is not None:
-        result = model.remove_table_from_columns(result)
+        if basepath is None:
+            basepath = self.executor.model.basepath
 
-    return result
+        batch = prepare_batch(self.ast, params_seq)
 
+        if batch is not None:
+            try:
+                return self._execute_batch(batch, basepath)
 
-class Model(object):
-    pass
+            except ValueError as e:
+                if not is_merge_dtype_error(e):
+                    raise
 
+                _logger.debug('cannot batch statement, execute each parameter set: %s', e)
 
-def get_model(model, basepath='.'):
-    if not isinstance(model, str):
-        return model
+        results = [self.execute(params, basepath=basepath) for params in params_seq]
+        results = [self.executor.compute(result) for result in results if result is not None]
 
-    if model == 'pandas':
-        from ._pandas import PandasModel
-        return PandasModel(basepath=basepath)
+        if not results:
+            return None
 
-    elif model == 'dask':
-        from ._dask import DaskModel
-        return DaskModel(basepath=basepath)
+        return pd.concat(results, ignore_index=True)
 
-    else:
-        raise ValueError('unknown fq model: {}'.format(model))
+    def _execute_batch(self, batch, basepath):
+        ast, params_table = batch
 
+        with self.executor.model.with_basepath(basepath) as model:
+            # NOTE: joins against single partition tables keep the order of dask partitions
+            scope = self.executor._tables.copy()
+            scope[batch_table] = model.from_pandas(params_table)
 
-execute_ast = m.RuleSet(name='execute_ast')
+            result = execute_statement(ast, scope, model)
+            result = model.compute(result)
 
+        # NOTE: a stable sort keeps the order of rows for each parameter set
+        result = result.sort_values(batch_column, kind='mergesort')
+        result = result.drop([col for col in result.columns if is_batch_column(col)], axis=1)
+        return result.reset_index(drop=True)
 
-@execute_ast.rule(m.instanceof(a.Select))
-def execute_ast_select(execute_ast, node, scope, model, name_generator):
-    if node.cte is not None:
-        scope = scope.copy()
 
-        for cte in node.cte:
-            scope[cte.alias] = execute_ast(cte, scope, model, name_generator)
+#: the names of the hidden table and columns used by batched statements
+batch_table = '__params__'
+batch_column = '__batch__'
+batch_param_prefix = '__param_'
 
-    if node.from_clause is None:
-        table = model.dual()
 
-    else:
-        table = execute_from(node, scope, model, name_generator)
+def is_merge_dtype_error(e):
+    """Check whether pandas refused to merge keys of different types, e.g., ints and strings."""
+    return 'You are trying to merge on' in str(e)
 
-    columns = normalize_columns(table.columns, node.columns)
 
-    # hack for non group-by aggregates, introduce an artificial column
-    # TODO: use DataFrame.agg in pandas
-    if any(isinstance(n, a.CallSetFunction) for n in walk(columns)) and not node.group_by_clause:
-        node = node.update(group_by_clause=[a.Bool('true')])
+def is_batch_column(col):
+    return col == batch_column or str(col).startswith(batch_param_prefix)
 
-    if node.where_clause is not None:
-        table = model.filter_table(table, node.where_clause, name_generator)
 
-    if node.group_by_clause is not None:
-        group_by = normalize_group_by(table.columns, columns, node.group_by_clause)
+def prepare_batch(ast, params_seq):
+    """Rewrite a select to evaluate all parameter sets at once.
 
-        split = SplitResult.chain(aggregate_split(col, group_by) for col in columns)
-        post_aggregate, aggregate, pre_aggregate = split.by_levels(2)
+    Each condition ``expr = placeholder`` of the where clause is turned into a
+    join condition against a table with one row per parameter set.
 
-        # chain group-by columns
-        pre_aggregate = pre_aggregate + group_by
+    :returns:
+        a pair of the rewritten ast and the parameter table or ``None`` if the
+        statement cannot be batched.
+    """
+    if not isinstance(ast, a.Select) or ast.where_clause is None:
+        return None
 
-        pre_aggregate = normalize_columns(table.columns, pre_aggregate)
-        table = model.transform(table, pre_aggregate, name_generator)
+    if ast.from_clause is None or len(ast.from_clause.tables) != 1:
+        return None
 
-        aggregate = normalize_columns(table.columns, aggregate)
-        group_by = normalize_columns(table.columns, group_by)
-        table = model.aggregate(table, aggregate, group_by, name_generator)
+    unsupported = [
+        ast.group_by_clause, ast.having_clause, ast.order_by_clause,
+        ast.limit_clause, ast.offset_clause, ast.quantifier,
+    ]
+    if any(clause is not None for clause in unsupported):
+        return None
 
-        post_aggregate = normalize_columns(table.columns, post_aggregate)
-        table = model.transform(table, post_aggregate, name_generator)
+    if any(walk(ast.columns, (a.CallSetFunction, a.CallAnalyticsFunction))):
+        return None
 
-    else:
-        table = model.transform(table, columns, name_generator)
+    conditions = []
+    rest = []
 
-    if node.having_clause is not None:
-        raise NotImplementedError('having is not yet implemented')
+    for op in flatten_conjunction(ast.where_clause):
+        if isinstance(op, a.BinaryOp) and op.op == '=' and isinstance(op.right, a.Placeholder):
+            conditions.append((op.left, op.right.name))
 
-    if node.order_by_clause is not None:
-        table = sort(table, node.order_by_clause, model)
+        elif isinstance(op, a.BinaryOp) and op.op == '=' and isinstance(op.left, a.Placeholder):
+            conditions.append((op.right, op.left.name))
 
-    if node.limit_clause is not None or node.offset_clause is not None:
-        limit = int(node.limit_clause.value) if node.limit_clause is not None else None
-        offset = int(node.offset_clause.value) if node.offset_clause is not None else None
+        else:
+            rest.append(op)
 
-        table = model.limit_offset(table, limit, offset)
+    ast = ast.update(where_clause=and_join(rest))
 
-    if node.quantifier == 'distinct':
-        table = model.drop_duplicates(table)
+    if not conditions or has_placeholders([ast] + [expr for expr, _ in conditions]):
+        return None
 
-    elif node.quantifier is not None and node.quantifier != 'all':
-        raise ValueError('unknown quantifier {!r}'.format(node.quantifier))
+    params_table = pd.DataFrame()
 
-    return table
+    for idx, (_, name) in enumerate(conditions):
+        values = [get_parameter(params, name) for params in params_seq]
 
+        # NOTE: null never compares equal, but pandas joins null values
+        if any(is_null(value) for value in values):
+            return None
 
-def normalize_columns(table_columns, columns):
-    result = []
+        params_table[batch_param_prefix + str(idx)] = values
 
-    for col in columns:
-        # TODO: expand `.*` style columns
-        if isinstance(col, a.WildCard):
-            if col.table is None:
-                result.extend(a.InternalName(c) for c in table_columns)
+    params_table[batch_param_prefix + 'batch__'] = range(len(params_seq))
 
-            else:
-                result.extend(
-                    a.InternalName(c)
-                    for c in table_columns if column_get_table(c) == col.table
-                )
+    on = and_join(
+        a.BinaryOp('=', expr, a.Name('{}.{}{}'.format(batch_table, batch_param_prefix, idx)))
+        for idx, (expr, _) in enumerate(conditions)
+    )
 
-        elif isinstance(col, a.Column):
-            alias = get_alias(col)
-            # make sure a column always has a name
-            result.append(col.update(alias=alias))
+    ast = ast.update(
+        columns=list(ast.columns) + [
+            a.Column(a.Name('{}.{}batch__'.format(batch_table, batch_param_prefix)), batch_column),
+        ],
+        from_clause=a.FromClause([
+            a.Join('inner', ast.from_clause.tables[0], a.TableRef(batch_table), on),
+        ]),
+    )
 
-        else:
-            raise ValueError('cannot normalize {}'.format(col))
+    return ast, params_table
 
-    return result
 
+def is_null(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
 
-def normalize_group_by(table_columns, columns, group_by):
-    """
-    Different cases:
 
-    1. a existing column is selected
-    2. alias of selected expression is used as in group by
-    3. a group by expression is selected verbatim
+def has_placeholders(obj):
+    return any(walk(obj, a.Placeholder))
 
-    The strategy is to transform case 2 into case 3 and then replace all
-    occurrences of the group-by expression by an anonymous alias that is filled
-    while grouping. Also, prefer case 1 over case 2.
-    """
-    if group_by is None:
-        return []
 
-    aliases = {col.alias: col.value for col in columns if col.alias is not None}
+# TOOD: add option autodetect the required model
+def execute(q, scope=None, model='pandas', basepath='.'):
+    """Execute queries against the provided scope.
 
-    # replace integers by the corresponding one-based column
-    group_by = [
-        col if not isinstance(col, a.Integer) else columns[int(col.value) - 1].value
-        for col in group_by
-    ]
+    :param dict scope:
 
-    matcher = m.any(
-        m.map_capture(
-            lambda name: a.Column(a.Name(name), alias=name),
-            m.record(a.Name, m.capture(internal_column(table_columns))),
-        ),
-        m.map_capture(
-            # note call to to_internal_col is required to handle table.column refs
-            lambda name: a.Column(aliases[name], alias=to_internal_col(name)),
-            m.record(a.Name, m.capture(m.verb(*aliases))),
-        ),
-        m.map_capture(
-            lambda value: a.Column(value, alias=Unique()),
-            m.capture(m.pred(lambda obj: type(obj) is not a.Name)),
-        )
-    )
+        a mapping of table names to dataframes. If not provided the globals and
+        locals of the calling scope are used.
+
+    :param Union[str,Model] model:
 
-    normalized = []
-    for expr in group_by:
-        match = m.match(expr, matcher)
+        the datamodel to use. Currently ``"pandas"`` and ``"dask"`` are
+        supported as string values. For better customization create the model
+        instances independently and pass them as arguments.
 
-        if not match:
-            raise ValueError('cannot handle %s', expr)
+        See :class:`framequery.PandasModel` and :class:`framequery.DaskModel`
+        for further information.
 
-        normalized.append(match[0])
+    :param str basepath:
 
-    return normalized
+        the basepath of ``copy from`` and ``copy to`` operations. This argument
+        is only when constructing the models. For independently constructed
+        models, the basepath can be set via their ``__init__`` arguments.
 
+    """
+    if scope is None:
+        frame = inspect.currentframe()
+        assert frame.f_back is not None
 
-def sort(table, values, model):
-    if not m.match(values, m.rep(
-        m.record(
-            a.OrderBy,
-            m.any(
-                m.record(a.Integer, m.wildcard),
-                m.record(a.Name, m.wildcard),
-            ),
-            m.verb('desc', 'asc')
-        )
-    )):
-        raise ValueError('cannot sort by: {}'.format(values))
+        scope = dict(frame.f_back.f_globals)
+        scope.update(frame.f_back.f_locals)
 
-    names = []
-    ascending = []
-    for val in values:
-        if isinstance(val.value, a.Integer):
-            names += [table.columns[int(val.value.value) - 1]]
+    model = get_model(model, basepath=basepath)
+    return execute_statement(parse(q), scope, model)
 
-        else:
-            names += [normalize_col_ref(val.value.name, table.columns)]
 
-        ascending += [val.order == 'asc']
+def execute_statement(ast, scope, model):
+    """Execute an already parsed query."""
+    name_generator = UniqueNameGenerator()
+    result = execute_ast(ast, scope, model, name_generator)
 
-    return model.sort_values(table, names, ascending=ascending)
+    if result is not None:
+        result = model.remove_table_from_columns(result)
 
+    return result
 
-def execute_from(node, scope, model, name_generator):
-    from_clause = node.from_clause
 
-    current = execute_ast(from_clause.tables[0], scope, model, name_generator)
+def explain_statement(ast, scope, model):
+    """Return the optimized plan of a parsed select statement as a list of lines."""
+    if not isinstance(ast, a.Select):
+        raise ValueError('can only explain select statements')
 
-    for other in from_clause.tables[1:]:
-        if isinstance(other, a.Lateral):
-            if not isinstance(other.table, a.TableFunction):
-                raise NotImplementedError('cannot perform lateral joins on %s' % type(node.table))
+    name_generator = UniqueNameGenerator()
+    plan = optimize(build_plan(ast), scope, model, name_generator)
+    return format_plan(plan, name_generator, PlanContext(scope, model, name_generator))
 
-            current = model.lateral(
-                current, name_generator,
-                other.table.func, other.table.args,
-                alias=(
-                    Unique() if other.table.alias is None else other.table.alias
-                ),
-            )
 
-        else:
-            right = execute_ast(other, scope, model, name_generator)
-            cond = (
-                and_join(
-                    op
-                    for op in flatten_ands(node.where_clause)
-                    if determine_origin(op, name_generator, current.columns, right.columns) in {
-                        Origin.left, Origin.right, Origin.ambigious
-                    }
-                )
-                if node.where_clause else a.BinaryOp('=', a.Integer('1'), a.Integer('1'))
-            )
-            current = model.join(current, right, cond, 'inner', name_generator)
-
-    return current
-
-
-@execute_ast.rule(m.instanceof(a.Join))
-def execute_join(execute_ast, node, scope, model, name_generator):
-    left = execute_ast(node.left, scope, model, name_generator)
-    right = execute_ast(node.right, scope, model, name_generator)
-    return model.join(left, right, node.on, node.how, name_generator)
-
-
-@execute_ast.rule(m.instanceof(a.TableRef))
-def execute_ast_table_ref(execute_ast, node, scope, model, name_generator):
-    if node.schema:
-        name = '{}.{}'.format(node.schema, node.name)
+class Model(object):
+    pass
+
+
+def get_model(model, basepath='.'):
+    if not isinstance(model, str):
+        return model
+
+    if model == 'pandas':
+        from ._pandas import PandasModel
+        return PandasModel(basepath=basepath)
+
+    elif model == 'dask':
+        from ._dask import DaskModel
+        return DaskModel(basepath=basepath)
 
     else:
-        name = node.name
+        raise ValueError('unknown fq model: {}'.format(model))
 
-    return model.get_table(scope, name, alias=node.alias)
 
+execute_ast = m.RuleSet(name='execute_ast')
 
-@execute_ast.rule(m.instanceof(a.SubQuery))
-def execute_ast_subquery(execute_ast, node, scope, model, name_generator):
-    if not node.alias:
-        raise RuntimeError('subqueries need to be named')
 
-    table = execute_ast(node.query, scope, model, name_generator)
-    return model.add_table_to_columns(table, node.alias)
+@execute_ast.rule(m.instanceof(a.Select))
+def execute_ast_select(execute_ast, node, scope, model, name_generator):
+    plan = build_plan(node)
+    plan = optimize(plan, scope, model, name_generator)
+    return execute_plan(plan, scope, model, name_generator)
 
 
-@execute_ast.rule(m.instanceof(a.TableFunction))
-def execute_ast_all(excecute_ast, node, scope, model, _):
-    return model.eval_table_valued(node, scope)
+@execute_ast.rule(m.instanceof(a.Explain))
+def execute_explain(_, node, scope, model, name_generator):
+    plan = optimize(build_plan(node.query), scope, model, name_generator)
+    return model.from_pandas(explain_plan(plan, scope, model, name_generator, analyze=node.analyze))
 
 
 @execute_ast.rule(m.instanceof(a.Show))
@@ -423,6 +437,7 @@ def execute_copy_from(_, node, scope, model, name_generator):
     }
 
     model.copy_from(scope, node.name.name, eval_string_literal(node.filename.value), options)
+    invalidate_stats(scope, node.name.name)
 
 
 @execute_ast.rule(m.instanceof(a.CopyTo))
@@ -440,89 +455,29 @@ def execute_copy_to(_, node, scope, model, name_generator):
 def execute_drop_table(_, node, scope, __, ___):
     for name in node.names:
         del scope[name.name]
+        invalidate_stats(scope, name.name)
 
 
 @execute_ast.rule(m.instanceof(a.CreateTableAs))
 def execute_create_table_as(execute_ast, node, scope, model, name_generator):
     _logger.info('create table %s', node.name.name)
     scope[node.name.name] = execute_ast(node.query, scope, model, name_generator)
+    invalidate_stats(scope, node.name.name)
 
 
-@m.RuleSet.make(name='aggregate_split')
-def aggregate_split(aggregate_split, node, group_by):
-    group_by_map = {col.value: a.Name(col.alias) for col in group_by}
-    if node in group_by_map:
-        return SplitResult([(0, group_by_map[node])])
-
-    return aggregate_split.apply_rules(node, group_by)
+@execute_ast.rule(m.instanceof(a.Analyze))
+def execute_analyze(_, node, scope, model, name_generator):
+    stats = getattr(scope, 'stats', None)
 
+    if stats is None:
+        raise ValueError('analyze requires a scope with statistics, e.g., of an executor')
 
-@aggregate_split.rule(m.instanceof(a.Column))
-def aggregate_split_column(aggregate_split, node, group_by):
-    alias = get_alias(node)
-
-    result = aggregate_split(node.value, group_by)
-    post, agg, pre = result.by_levels(2)
-
-    post, = post
-    post = [a.Column(post, alias=alias)]
-    return SplitResult.from_levels(post, agg, pre)
-
-
-@aggregate_split.rule(m.instanceof(a.Name))
-def aggregate_split_name(aggregate_split, node, group_by):
-    return SplitResult([(0, node)])
-
-
-@aggregate_split.rule(m.instanceof(a.CallSetFunction))
-def aggregate_split_call_set_function(aggregate_split, node, group_by):
-    # replace count(*) by count(1)
-    if node.func.lower() == 'count' and node.args == (a.WildCard(),):
-        node = a.CallSetFunction('count', (a.Integer('1'),))
-
-    ids = [Unique() for _ in node.args]
-    self_id = Unique()
-    deferred_args = [a.Name(id) for id in ids]
-
-    result = SplitResult()
-    result.extend((2, a.Column(arg, alias=id)) for arg, id in zip(node.args, ids))
-    result.append((1, a.Column(node.update(args=deferred_args), alias=self_id)))
-    result.append((0, a.Name(self_id)))
-
-    return result
-
-
-class SplitResult(list):
-    @classmethod
-    def from_levels(cls, *levels):
-        return cls(
-            (level, item)
-            for level, items in enumerate(levels)
-            for item in items
-        )
-
-    @classmethod
-    def chain(cls, iterable):
-        return cls(it.chain.from_iterable(iterable))
-
-    def promote(self):
-        return SplitResult((level + 1, obj) for level, obj in self)
-
-    def by_levels(self, maxlevel):
-        r = {}
-
-        for level, obj in self:
-            r.setdefault(level, []).append(obj)
-
-        assert max(r) <= maxlevel
+    for name in node.names:
+        stats.analyze(name.name, scope[name.name])
 
-        return tuple(r.get(level, []) for level in range(maxlevel + 1))
 
+def invalidate_stats(scope, name):
+    stats = getattr(scope, 'stats', None)
 
-def get_alias(col_node):
-    alias, = m.match(col_node, m.any(
-        m.record(a.Column, alias=m.capture(m.ne(None))),
-        m.record(a.Column, value=m.record(a.Name, m.capture(m.wildcard)), alias=m.eq(None)),
-        m.capture(m.lit(Unique())),
-    ))
-    return to_internal_col(alias)
+    if stats is not None:
+        stats.invalidate(name)
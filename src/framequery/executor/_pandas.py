@@ -2,6 +2,7 @@ from __future__ import print_function, division, absolute_import
 
 from ._executor import Model
 from ._util import (
+    Origin,
     Unique,
 
     as_pandas_join_condition,
@@ -10,10 +11,12 @@ from ._util import (
     column_set_table,
     eval_string_literal,
     normalize_col_ref,
+    prepare_band_join,
     prepare_join,
 )
 from ..parser import ast as a
 from ..util import _monadic as m, like, not_like, make_meta
+from ..util._bloom import BloomFilter, hash_rows
 
 from .. import util
 
@@ -39,9 +42,17 @@ class PandasModel(Model):
     :param bool strict:
         if True, mimic SQL behavior in group-by and join.
 
+    :param Optional[float] bloom_filter_selectivity:
+        in equality joins of a table with a much smaller one, a Bloom filter
+        of the keys of the smaller table is used to drop rows of the larger
+        table before the merge, if at most this fraction of a sample of its
+        rows passes the filter. Only integer, boolean, datetime, timedelta
+        and string keys are filtered. If ``None``, no Bloom filters are used.
+
     """
-    def __init__(self, basepath='.', strict=False):
+    def __init__(self, basepath='.', strict=False, bloom_filter_selectivity=0.5):
         self.strict = strict
+        self.bloom_filter_selectivity = bloom_filter_selectivity
         self.eval = eval_pandas
         self.basepath = basepath
 
@@ -90,7 +101,7 @@ class PandasModel(Model):
         """Return an empty single-row dataframe."""
         return pd.DataFrame({}, index=[0])
 
-    def get_table(self, scope, name, alias=None):
+    def get_table(self, scope, name, alias=None, columns=None):
         if name in self.special_tables:
             return self.get_special_table(scope, name, alias)
 
@@ -98,8 +109,16 @@ class PandasModel(Model):
             alias = name
 
         table = scope[name]
+
+        if columns is not None:
+            table = table[list(columns)]
+
         return self.add_table_to_columns(table, alias)
 
+    def from_pandas(self, df):
+        """Convert a small pandas dataframe into a dataframe of this model."""
+        return df
+
     def get_special_table(self, scope, name, alias):
         if alias is None:
             alias = name
@@ -117,6 +136,11 @@ class PandasModel(Model):
 
     def filter_table(self, table, expr, name_generator):
         sel = self.evaluate(table, expr, name_generator)
+
+        # constant conditions, e.g., false
+        if not isinstance(sel, pd.Series):
+            return table if sel else table.iloc[:0]
+
         return table[sel]
 
     @staticmethod
@@ -144,6 +168,9 @@ class PandasModel(Model):
         return pd.DataFrame(result, index=table.index)
 
     def add_columns(self, table, columns, name_generator):
+        # NOTE: do not modify the input, it may be shared, e.g., with the scope
+        table = table.copy(deep=False)
+
         for col in columns:
             alias = name_generator.get(col.alias)
             table[alias] = self.evaluate(table, col.value, name_generator)
@@ -219,7 +246,7 @@ class PandasModel(Model):
         else:
             raise RuntimeError('unknown format %s' % format)
 
-    def eval_table_valued(self, node, scope):
+    def eval_table_valued(self, node, scope, usecols=None):
         # TODO: rename the table
         func = node.func.lower()
         if func not in self.table_functions:
@@ -227,6 +254,10 @@ class PandasModel(Model):
 
         func = self.table_functions[func]
         args = [eval_pandas(arg, None, self, None) for arg in node.args]
+
+        if usecols is not None:
+            return func(*args, usecols=usecols)
+
         return func(*args)
 
     def join(self, left, right, on, how, name_generator):
@@ -261,8 +292,15 @@ class PandasModel(Model):
             left = self.add_rowid(left, left_rowid, name_generator)
             right = self.add_rowid(right, right_rowid, name_generator)
 
-        left_on, right_on = as_pandas_join_condition(left.columns, right.columns, eq, name_generator)
-        result = left.merge(right, left_on=left_on, right_on=right_on, how=how)
+        # NOTE: without equality conditions, avoid a full cross join for range conditions
+        band = prepare_band_join(on, name_generator, left.columns, right.columns) if neq else None
+
+        if band is not None:
+            result = self.band_join(left, right, band, name_generator)
+
+        else:
+            left_on, right_on = as_pandas_join_condition(left.columns, right.columns, eq, name_generator)
+            result = self.merge(left, right, left_on, right_on, how)
 
         if neq and how == 'inner':
             # NOTE: the required cross-join is already implemented in prepare_join(...)
@@ -289,6 +327,126 @@ class PandasModel(Model):
 
         return result[columns]
 
+    def merge(self, left, right, left_on, right_on, how):
+        # only rows of tables, whose unmatched rows are dropped, can be filtered
+        if how in {'inner', 'left'} and len(right) >= bloom_filter_ratio * len(left):
+            right = self.bloom_filter(left, left_on, right, right_on)
+
+        elif how in {'inner', 'right'} and len(left) >= bloom_filter_ratio * len(right):
+            left = self.bloom_filter(right, right_on, left, left_on)
+
+        return left.merge(right, left_on=left_on, right_on=right_on, how=how)
+
+    def bloom_filter(self, build, build_on, probe, probe_on):
+        """Drop the rows of ``probe`` without matching keys in ``build``, if the filter is selective."""
+        if not can_bloom_filter(build, build_on, probe, probe_on, self.bloom_filter_selectivity):
+            return probe
+
+        bloom = build_bloom_filter(build, build_on)
+        return apply_bloom_filter(probe, probe_on, bloom, self.bloom_filter_selectivity)
+
+    def band_join(self, left, right, band, name_generator):
+        """Return the pairs of rows within the bounds of a band join, see ``prepare_band_join``.
+
+        One table is sorted by the key, for each row of the other table the
+        range of matching rows is found by binary search.
+        """
+        origin, key, bounds = band
+        table, probe = (left, right) if origin is Origin.left else (right, left)
+
+        keys = np.asarray(self.evaluate(table, key, name_generator))
+        positions = np.flatnonzero(~pd.isnull(keys))
+        positions = positions[np.argsort(keys[positions], kind='mergesort')]
+        keys = keys[positions]
+
+        lower = np.zeros(len(probe), dtype=np.int64)
+        upper = np.full(len(probe), len(keys), dtype=np.int64)
+
+        for op, expr in bounds:
+            values = np.broadcast_to(np.asarray(self.evaluate(probe, expr, name_generator)), len(probe))
+
+            if op in {'>', '>='}:
+                lower = np.maximum(lower, np.searchsorted(keys, values, side='right' if op == '>' else 'left'))
+
+            else:
+                upper = np.minimum(upper, np.searchsorted(keys, values, side='left' if op == '<' else 'right'))
+
+            upper[pd.isnull(values)] = 0
+
+        counts = np.maximum(upper - lower, 0)
+        probe_idx = np.repeat(np.arange(len(probe)), counts)
+        offsets = np.repeat(lower - (np.cumsum(counts) - counts), counts)
+        table_idx = positions[np.arange(counts.sum()) + offsets]
+
+        left_idx, right_idx = (table_idx, probe_idx) if origin is Origin.left else (probe_idx, table_idx)
+
+        # keep the order of the left table
+        order = np.argsort(left_idx, kind='mergesort')
+        left_idx, right_idx = left_idx[order], right_idx[order]
+
+        return pd.concat([
+            left.iloc[left_idx].reset_index(drop=True),
+            right.iloc[right_idx].reset_index(drop=True),
+        ], axis=1)
+
+    def semi_join(self, left, right, on, how, null_aware, name_generator):
+        """Keep the rows of ``left`` with (``how='semi'``) or without (``how='anti'``) a match in ``right``.
+
+        The distinct rows of ``right`` are collected into a hash set, which is
+        probed with the values of the ``on`` expressions.
+        """
+        keys = self.build_semi_join_keys(right, len(on))
+        return self.probe_semi_join_keys(left, keys, on, how, null_aware, name_generator)
+
+    def build_semi_join_keys(self, table, width):
+        """Return the distinct non-null rows of a table as an index, the number of rows, and whether any is null."""
+        if not width:
+            return None, len(table), False
+
+        if table.shape[1] != width:
+            raise ValueError('expected {} columns in subquery, got {}'.format(width, table.shape[1]))
+
+        non_null = table.dropna()
+        columns = [non_null.iloc[:, idx].values for idx in range(width)]
+        index = pd.Index(pd.unique(columns[0])) if width == 1 else pd.MultiIndex.from_arrays(columns).unique()
+        return index, len(table), len(non_null) != len(table)
+
+    def probe_semi_join_keys(self, table, keys, on, how, null_aware, name_generator):
+        # NOTE: the dask model calls this method per partition, do not dispatch to other model methods
+        index, rows, has_nulls = keys
+
+        if on:
+            values = [self.evaluate(table, expr, name_generator) for expr in on]
+            values = [
+                value if isinstance(value, pd.Series) else pd.Series(value, index=table.index)
+                for value in values
+            ]
+            not_null = np.logical_and.reduce([value.notnull().values for value in values])
+
+            if len(values) == 1:
+                found = values[0].isin(index).values
+
+            else:
+                found = pd.MultiIndex.from_arrays([value.values for value in values]).isin(index)
+
+            found = found & not_null
+
+        else:
+            not_null = np.ones(len(table), dtype=bool)
+            found = not_null & (rows > 0)
+
+        if how == 'semi':
+            return table[found]
+
+        if how != 'anti':
+            raise ValueError('unknown semi join {!r}'.format(how))
+
+        # x not in (...) is null, i.e., false, if x or any value of the subquery is null
+        if null_aware and rows:
+            return table.iloc[:0] if has_nulls else table[~found & not_null]
+
+        return table[~found]
+
     def lateral(self, table, name_generator, func, args, alias):
         if func not in self.lateral_functions:
             raise ValueError('unknown lateral function %s' % func)
@@ -333,9 +491,107 @@ class PandasModel(Model):
 
         return table.iloc[offset:offset + limit]
 
+    def top_n(self, table, names, ascending, limit, offset=None):
+        """Sort a table and apply a limit, without sorting all of its rows.
+
+        The rows up to the n-th value of the first sort column are selected
+        with a partial sort, only these candidates are sorted completely.
+        """
+        offset = offset or 0
+        n = limit + offset
+        values = table[names[0]]
+
+        if 0 < n < len(table) and values.dtype.kind in 'biufmM' and values.count() >= n:
+            if ascending[0]:
+                table = table[values <= values.nsmallest(n).iloc[-1]]
+
+            else:
+                table = table[values >= values.nlargest(n).iloc[-1]]
+
+        # NOTE: the dask model calls this method per partition, do not dispatch to other model methods
+        return table.sort_values(names, ascending=ascending).iloc[offset:n]
+
     def drop_duplicates(self, tables):
         return tables.drop_duplicates()
 
+    def materialize(self, table, used=0, rows=None):
+        """Evaluate a common table used multiple times once.
+
+        :param int used:
+            the memory in bytes already used by materialized tables of the
+            current query.
+
+        :param Optional[float] rows:
+            the estimated number of rows of the table, if known.
+
+        :returns:
+            the table to use and the updated memory usage.
+        """
+        return table, used
+
+    def analyze_table(self, table):
+        """Materialize an intermediate result for ``explain analyze``, return it and its statistics."""
+        return table, dict(rows=len(table))
+
+
+#: Bloom filters are only considered if the filtered table is this many times larger
+bloom_filter_ratio = 10
+
+#: the number of rows sampled to estimate the selectivity of Bloom filters
+bloom_filter_sample_size = 1024
+
+#: dtype kinds, whose hashes agree whenever values compare equal
+bloom_filter_dtype_kinds = 'biuMm'
+
+
+def can_bloom_filter(build, build_on, probe, probe_on, selectivity, inspect_values=True):
+    """Whether keys that compare equal in a merge are guaranteed to have equal hashes.
+
+    Merges also match, e.g., ints and floats, or ``1`` and ``1.0`` in object
+    columns, whereas their hashes differ. Therefore, only identical dtypes of
+    exactly hashed kinds are accepted, and object columns only if they contain
+    strings. With ``inspect_values=False``, e.g., for dask metadata, object
+    columns are never accepted.
+    """
+    return selectivity is not None and all(
+        can_bloom_filter_column(build[build_key], probe[probe_key], inspect_values)
+        for build_key, probe_key in zip(build_on, probe_on)
+    )
+
+
+def can_bloom_filter_column(build, probe, inspect_values):
+    if build.dtype != probe.dtype:
+        return False
+
+    if build.dtype.kind in bloom_filter_dtype_kinds:
+        return True
+
+    return (
+        inspect_values and build.dtype.kind == 'O' and
+        is_string_column(build) and is_string_column(probe)
+    )
+
+
+def is_string_column(s):
+    return pd.api.types.infer_dtype(s, skipna=False) == 'string'
+
+
+def build_bloom_filter(table, columns):
+    return BloomFilter.from_hashes(hash_rows(table, columns))
+
+
+def apply_bloom_filter(table, columns, bloom, selectivity):
+    """Filter the rows of a table with a Bloom filter, if at most ``selectivity`` of a sample pass it."""
+    if len(table) < bloom_filter_sample_size:
+        return table
+
+    sample = table.iloc[::len(table) // bloom_filter_sample_size]
+
+    if bloom.contains(hash_rows(sample, columns)).mean() > selectivity:
+        return table
+
+    return table[bloom.contains(hash_rows(table, columns))]
+
 
 eval_pandas = m.RuleSet(name='eval_pandas')
 
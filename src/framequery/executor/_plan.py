@@ -0,0 +1,2472 @@
+"""Logical query plans.
+
+Select statements are translated into a tree of logical operators by
+:data:`build_plan`, rewritten by :func:`optimize`, and executed by
+:data:`execute_plan` in terms of the model methods.
+
+Column lists and expressions are kept as ast nodes. Wildcards and group-by
+expressions are resolved against the columns of the input tables during
+execution, :data:`plan_columns` infers the columns ahead of execution if
+possible.
+"""
+from __future__ import print_function, division, absolute_import
+
+import itertools as it
+import time
+
+import pandas as pd
+
+from ._simplify import is_true, simplify
+from ._util import (
+    Origin,
+    Unique,
+
+    _flipped_comparisons,
+    and_join,
+    column_from_parts,
+    column_get_column,
+    column_get_table,
+    column_set_table,
+    determine_origin,
+    internal_column,
+    normalize_col_ref,
+    split_quoted_name,
+    to_internal_col,
+)
+from ..parser import ast as a
+from ..util import _monadic as m
+from ..util._record import Record, rewrite, walk
+
+
+class Plan(Record):
+    """Base class of logical operators.
+
+    ``__inputs__`` lists the fields that hold input plans.
+    """
+    __inputs__ = ()
+
+    def inputs(self):
+        return [getattr(self, name) for name in self.__inputs__]
+
+    def map_inputs(self, func):
+        """Apply ``func`` to all inputs, return the plan itself if no input changed."""
+        changes = {}
+
+        for name in self.__inputs__:
+            old = getattr(self, name)
+            new = func(old)
+
+            if new is not old:
+                changes[name] = new
+
+        return self.update(**changes) if changes else self
+
+
+class Scan(Plan):
+    """Read a table of the scope, if given, only the listed ``columns``."""
+    __fields__ = ['name', 'alias', 'columns']
+    __types__ = [None, None, tuple]
+
+
+class Dual(Plan):
+    """A table with a single row and no columns."""
+    pass
+
+
+class TableFunction(Plan):
+    """Call a table valued function, if given, only read the listed ``columns``."""
+    __fields__ = ['func', 'args', 'alias', 'columns']
+    __types__ = [str, tuple, str, tuple]
+
+
+class Alias(Plan):
+    """Set the table of all columns, e.g., for subqueries and CTEs."""
+    __fields__ = ['input', 'alias']
+    __inputs__ = ('input',)
+
+
+class Filter(Plan):
+    __fields__ = ['input', 'condition']
+    __inputs__ = ('input',)
+
+
+class Project(Plan):
+    __fields__ = ['input', 'columns']
+    __types__ = [None, tuple]
+    __inputs__ = ('input',)
+
+
+class Aggregate(Plan):
+    """Group the input and evaluate the columns, which contain aggregates."""
+    __fields__ = ['input', 'columns', 'group_by']
+    __types__ = [None, tuple, tuple]
+    __inputs__ = ('input',)
+
+
+class Join(Plan):
+    """Join two inputs, if ``on`` is ``None``, the join is a cross join."""
+    __fields__ = ['left', 'right', 'how', 'on']
+    __inputs__ = ('left', 'right')
+
+
+class SemiJoin(Plan):
+    """Keep the rows of ``left`` with a matching row in ``right``, for ``how='anti'`` those without.
+
+    The values of the ``on`` expressions, evaluated for ``left``, are compared
+    to the columns of ``right``. Without expressions, all rows match if
+    ``right`` is not empty. ``null_aware`` anti joins implement ``not in``:
+    if ``right`` contains nulls, no row is kept.
+    """
+    __fields__ = ['left', 'right', 'how', 'on', 'null_aware']
+    __types__ = [None, None, str, tuple, None]
+    __inputs__ = ('left', 'right')
+
+
+class Lateral(Plan):
+    __fields__ = ['input', 'func', 'args', 'alias']
+    __types__ = [None, str, tuple, None]
+    __inputs__ = ('input',)
+
+
+class Sort(Plan):
+    __fields__ = ['input', 'values']
+    __types__ = [None, tuple]
+    __inputs__ = ('input',)
+
+
+class Limit(Plan):
+    __fields__ = ['input', 'limit', 'offset']
+    __inputs__ = ('input',)
+
+
+class TopN(Plan):
+    """Sort the input and only keep the rows selected by ``limit`` and ``offset``."""
+    __fields__ = ['input', 'values', 'limit', 'offset']
+    __types__ = [None, tuple, None, None]
+    __inputs__ = ('input',)
+
+
+class Distinct(Plan):
+    __fields__ = ['input']
+    __inputs__ = ('input',)
+
+
+class Retain(Plan):
+    """Only keep the given columns of the input."""
+    __fields__ = ['input', 'columns']
+    __types__ = [None, tuple]
+    __inputs__ = ('input',)
+
+
+class AddColumns(Plan):
+    """Append computed columns to the input, e.g., common sub-expressions."""
+    __fields__ = ['input', 'columns']
+    __types__ = [None, tuple]
+    __inputs__ = ('input',)
+
+
+class With(Plan):
+    """Evaluate common tables, given as :class:`Alias` plans, before the input."""
+    __fields__ = ['input', 'ctes']
+    __types__ = [None, tuple]
+    __inputs__ = ('input',)
+
+
+build_plan = m.RuleSet(name='build_plan')
+
+
+@build_plan.rule(m.instanceof(a.Select))
+def build_plan_select(build_plan, node):
+    if node.having_clause is not None:
+        raise NotImplementedError('having is not yet implemented')
+
+    if node.quantifier is not None and node.quantifier not in {'distinct', 'all'}:
+        raise ValueError('unknown quantifier {!r}'.format(node.quantifier))
+
+    if node.from_clause is None:
+        plan = Dual()
+
+    else:
+        plan = build_from(node.from_clause)
+
+    if node.where_clause is not None:
+        predicates, conditions = partition(flatten_conjunction(node.where_clause), is_subquery_predicate)
+        reject_subqueries(conditions, 'nested')
+
+        if not predicates:
+            plan = Filter(plan, node.where_clause)
+
+        else:
+            plan = apply_filter(plan, conditions)
+
+            for predicate in predicates:
+                plan = build_semi_join(plan, predicate)
+
+    reject_subqueries(node.columns, 'scalar')
+    reject_subqueries([node.group_by_clause, node.order_by_clause], 'scalar')
+
+    # NOTE: assign aliases once, to keep the names of unnamed columns stable
+    columns = [
+        col.update(alias=get_alias(col)) if isinstance(col, a.Column) else col
+        for col in node.columns
+    ]
+
+    if node.group_by_clause is not None or any(walk(columns, a.CallSetFunction)):
+        # non group-by aggregates use an artificial group-by column
+        group_by = node.group_by_clause if node.group_by_clause else [a.Bool('true')]
+        plan = Aggregate(plan, columns, group_by)
+
+    else:
+        plan = Project(plan, columns)
+
+    if node.order_by_clause is not None:
+        plan = Sort(plan, node.order_by_clause)
+
+    if node.limit_clause is not None or node.offset_clause is not None:
+        plan = Limit(
+            plan,
+            int(node.limit_clause.value) if node.limit_clause is not None else None,
+            int(node.offset_clause.value) if node.offset_clause is not None else None,
+        )
+
+    if node.quantifier == 'distinct':
+        plan = Distinct(plan)
+
+    if node.cte is not None:
+        plan = With(plan, [build_plan(cte) for cte in node.cte])
+
+    return plan
+
+
+def build_from(from_clause):
+    plan = build_plan(from_clause.tables[0])
+
+    for other in from_clause.tables[1:]:
+        if isinstance(other, a.Lateral):
+            if not isinstance(other.table, a.TableFunction):
+                raise NotImplementedError('cannot perform lateral joins on %s' % type(other.table))
+
+            alias = Unique() if other.table.alias is None else other.table.alias
+            plan = Lateral(plan, other.table.func, other.table.args, alias)
+
+        else:
+            # the join condition is taken from the where clause, see fold_join_conditions
+            plan = Join(plan, build_plan(other), 'inner', None)
+
+    return plan
+
+
+def reject_subqueries(exprs, kind):
+    if any(walk(exprs, (a.SubQuery, a.Exists))):
+        raise NotImplementedError(
+            '{} subqueries are not supported, subqueries are only supported as top-level conjuncts'.format(kind)
+        )
+
+
+def is_subquery_predicate(expr):
+    if isinstance(expr, a.UnaryOp) and expr.op == 'not':
+        expr = expr.arg
+
+    if isinstance(expr, a.Exists):
+        return True
+
+    return isinstance(expr, a.BinaryOp) and expr.op in {'in', 'not in'} and isinstance(expr.right, a.SubQuery)
+
+
+def build_semi_join(plan, predicate):
+    """Translate an ``in`` or ``exists`` subquery predicate into a :class:`SemiJoin`.
+
+    Subqueries are decorrelated: equality conditions in their where clause
+    between the outer query and the subquery become keys of the join. Outer
+    columns need to be qualified with their table.
+    """
+    negated = isinstance(predicate, a.UnaryOp)
+
+    if negated:
+        predicate = predicate.arg
+
+    if isinstance(predicate, a.Exists):
+        query = predicate.query
+        how = 'anti' if negated else 'semi'
+        null_aware = False
+        on, values = [], []
+
+    else:
+        query = predicate.right.query
+
+        if len(query.columns) != 1 or not isinstance(query.columns[0], a.Column):
+            raise ValueError('subqueries of in predicates need to select a single column')
+
+        how = 'anti' if negated != (predicate.op == 'not in') else 'semi'
+        null_aware = how == 'anti'
+        on, values = [predicate.left], [query.columns[0].value]
+
+    correlated, conditions = split_correlated_conditions(query)
+
+    if correlated:
+        if any(clause is not None for clause in (
+            query.group_by_clause, query.having_clause, query.limit_clause, query.offset_clause,
+        )) or any(walk(query.columns, a.CallSetFunction)):
+            raise NotImplementedError('correlated subqueries with aggregates or limits are not supported')
+
+        if null_aware:
+            raise NotImplementedError('correlated not in subqueries are not supported')
+
+        on = on + [outer for outer, _ in correlated]
+        values = values + [inner for _, inner in correlated]
+
+        # NOTE: the order of the rows does not matter for semi joins
+        query = query.update(
+            columns=[a.Column(value, Unique()) for value in values],
+            where_clause=and_join(conditions),
+            order_by_clause=None,
+        )
+
+    return SemiJoin(plan, build_plan(query), how, on, null_aware)
+
+
+def split_correlated_conditions(query):
+    """Split the where clause of a subquery into correlated and other conditions.
+
+    Correlated conditions are returned as pairs of the outer and inner
+    expressions compared for equality.
+    """
+    if query.where_clause is None:
+        return [], []
+
+    inner_tables = visible_tables(query.from_clause) if query.from_clause is not None else set()
+
+    def is_outer(expr):
+        return any(
+            len(parts) == 2 and parts[0] not in inner_tables
+            for parts in (split_quoted_name(name.name)[-2:] for name in walk(expr, a.Name))
+        )
+
+    correlated = []
+    conditions = []
+
+    for condition in flatten_conjunction(query.where_clause):
+        if not is_outer(condition):
+            conditions.append(condition)
+            continue
+
+        if isinstance(condition, a.BinaryOp) and condition.op == '=':
+            left_outer = is_outer(condition.left)
+            right_outer = is_outer(condition.right)
+
+            if left_outer and not right_outer and any(walk(condition.right, a.Name)):
+                correlated.append((condition.left, condition.right))
+                continue
+
+            if right_outer and not left_outer and any(walk(condition.left, a.Name)):
+                correlated.append((condition.right, condition.left))
+                continue
+
+        raise NotImplementedError('only equality conditions can refer to the outer query in subqueries')
+
+    return correlated, conditions
+
+
+def visible_tables(node):
+    """Return the names of the tables of a from clause, as used to qualify columns."""
+    if isinstance(node, a.FromClause):
+        return set().union(*[visible_tables(table) for table in node.tables])
+
+    if isinstance(node, a.Join):
+        return visible_tables(node.left) | visible_tables(node.right)
+
+    if isinstance(node, a.Lateral):
+        return visible_tables(node.table)
+
+    if isinstance(node, a.TableRef):
+        return {node.alias or node.name}
+
+    return {node.alias}
+
+
+@build_plan.rule(m.instanceof(a.Join))
+def build_plan_join(build_plan, node):
+    return Join(build_plan(node.left), build_plan(node.right), node.how, node.on)
+
+
+@build_plan.rule(m.instanceof(a.TableRef))
+def build_plan_table_ref(build_plan, node):
+    name = node.name if not node.schema else '{}.{}'.format(node.schema, node.name)
+    return Scan(name, node.alias)
+
+
+@build_plan.rule(m.instanceof(a.SubQuery))
+def build_plan_subquery(build_plan, node):
+    if not node.alias:
+        raise RuntimeError('subqueries need to be named')
+
+    return Alias(build_plan(node.query), node.alias)
+
+
+@build_plan.rule(m.instanceof(a.TableFunction))
+def build_plan_table_function(build_plan, node):
+    return TableFunction(node.func, node.args, node.alias)
+
+
+execute_plan = m.RuleSet(name='execute_plan')
+
+
+@execute_plan.rule(m.instanceof(Scan))
+def execute_scan(execute_plan, node, scope, model, name_generator):
+    return model.get_table(scope, node.name, alias=node.alias, columns=node.columns)
+
+
+@execute_plan.rule(m.instanceof(Dual))
+def execute_dual(execute_plan, node, scope, model, name_generator):
+    return model.dual()
+
+
+@execute_plan.rule(m.instanceof(TableFunction))
+def execute_table_function(execute_plan, node, scope, model, name_generator):
+    usecols = None if node.columns is None else frozenset(node.columns).__contains__
+    return model.eval_table_valued(a.TableFunction(node.func, node.args, node.alias), scope, usecols=usecols)
+
+
+@execute_plan.rule(m.instanceof(Alias))
+def execute_alias(execute_plan, node, scope, model, name_generator):
+    table = execute_plan(node.input, scope, model, name_generator)
+    return model.add_table_to_columns(table, node.alias)
+
+
+@execute_plan.rule(m.instanceof(Filter))
+def execute_filter(execute_plan, node, scope, model, name_generator):
+    table = execute_plan(node.input, scope, model, name_generator)
+    return model.filter_table(table, node.condition, name_generator)
+
+
+@execute_plan.rule(m.instanceof(Project))
+def execute_project(execute_plan, node, scope, model, name_generator):
+    table = execute_plan(node.input, scope, model, name_generator)
+    columns = normalize_columns(table.columns, node.columns)
+    return model.transform(table, columns, name_generator)
+
+
+@execute_plan.rule(m.instanceof(Aggregate))
+def execute_aggregate(execute_plan, node, scope, model, name_generator):
+    table = execute_plan(node.input, scope, model, name_generator)
+    columns = normalize_columns(table.columns, node.columns)
+    group_by = normalize_group_by(table.columns, columns, node.group_by)
+
+    split = SplitResult.chain(aggregate_split(col, group_by) for col in columns)
+    post_aggregate, aggregate, pre_aggregate = split.by_levels(2)
+
+    # chain group-by columns
+    pre_aggregate = pre_aggregate + group_by
+
+    pre_aggregate = normalize_columns(table.columns, pre_aggregate)
+    table = model.transform(table, pre_aggregate, name_generator)
+
+    aggregate = normalize_columns(table.columns, aggregate)
+    group_by = normalize_columns(table.columns, group_by)
+    table = model.aggregate(table, aggregate, group_by, name_generator)
+
+    post_aggregate = normalize_columns(table.columns, post_aggregate)
+    return model.transform(table, post_aggregate, name_generator)
+
+
+@execute_plan.rule(m.instanceof(Join))
+def execute_join(execute_plan, node, scope, model, name_generator):
+    left = execute_plan(node.left, scope, model, name_generator)
+    right = execute_plan(node.right, scope, model, name_generator)
+    on = node.on if node.on is not None else a.BinaryOp('=', a.Integer('1'), a.Integer('1'))
+    return model.join(left, right, on, node.how, name_generator)
+
+
+@execute_plan.rule(m.instanceof(SemiJoin))
+def execute_semi_join(execute_plan, node, scope, model, name_generator):
+    left = execute_plan(node.left, scope, model, name_generator)
+    right = execute_plan(node.right, scope, model, name_generator)
+    return model.semi_join(left, right, node.on, node.how, node.null_aware, name_generator)
+
+
+@execute_plan.rule(m.instanceof(Lateral))
+def execute_lateral(execute_plan, node, scope, model, name_generator):
+    table = execute_plan(node.input, scope, model, name_generator)
+    return model.lateral(table, name_generator, node.func, node.args, alias=node.alias)
+
+
+@execute_plan.rule(m.instanceof(Sort))
+def execute_sort(execute_plan, node, scope, model, name_generator):
+    table = execute_plan(node.input, scope, model, name_generator)
+    return sort(table, node.values, model)
+
+
+@execute_plan.rule(m.instanceof(Limit))
+def execute_limit(execute_plan, node, scope, model, name_generator):
+    table = execute_plan(node.input, scope, model, name_generator)
+    return model.limit_offset(table, node.limit, node.offset)
+
+
+@execute_plan.rule(m.instanceof(TopN))
+def execute_top_n(execute_plan, node, scope, model, name_generator):
+    table = execute_plan(node.input, scope, model, name_generator)
+    names, ascending = sort_keys(table, node.values)
+    return model.top_n(table, names, ascending, node.limit, node.offset)
+
+
+@execute_plan.rule(m.instanceof(Distinct))
+def execute_distinct(execute_plan, node, scope, model, name_generator):
+    table = execute_plan(node.input, scope, model, name_generator)
+    return model.drop_duplicates(table)
+
+
+@execute_plan.rule(m.instanceof(Retain))
+def execute_retain(execute_plan, node, scope, model, name_generator):
+    table = execute_plan(node.input, scope, model, name_generator)
+    return model.transform(table, [a.InternalName(col) for col in node.columns], name_generator)
+
+
+@execute_plan.rule(m.instanceof(AddColumns))
+def execute_add_columns(execute_plan, node, scope, model, name_generator):
+    table = execute_plan(node.input, scope, model, name_generator)
+    return model.add_columns(table, node.columns, name_generator)
+
+
+@execute_plan.rule(m.instanceof(With))
+def execute_with(execute_plan, node, scope, model, name_generator):
+    scope = scope.copy()
+    used = 0
+
+    # NOTE: common tables used once are inlined during optimization
+    for cte in node.ctes:
+        rows = estimate_rows(cte, PlanContext(scope, model, name_generator))
+        table = execute_plan(cte, scope, model, name_generator)
+        scope[cte.alias], used = model.materialize(table, used, rows=rows)
+
+    return execute_plan(node.input, scope, model, name_generator)
+
+
+#: infer the columns of a plan, return ``None`` if they cannot be determined
+plan_columns = m.RuleSet(name='plan_columns')
+
+
+@plan_columns.rule(m.instanceof(Scan))
+def plan_columns_scan(plan_columns, node, scope, model, name_generator):
+    alias = node.alias if node.alias is not None else node.name
+
+    if node.name in getattr(model, 'special_tables', ()):
+        return list(model.get_special_table(scope, node.name, alias).columns)
+
+    table = scope.get(node.name)
+
+    if node.columns is not None:
+        columns = node.columns
+
+    elif isinstance(table, CommonTable):
+        columns = plan_columns(table.plan, table.scope, model, name_generator)
+
+    else:
+        columns = getattr(table, 'columns', None)
+
+    if columns is None:
+        return None
+
+    return [column_set_table(col, alias) for col in columns]
+
+
+@plan_columns.rule(m.instanceof(Dual))
+def plan_columns_dual(plan_columns, node, scope, model, name_generator):
+    return []
+
+
+@plan_columns.rule(m.instanceof(TableFunction))
+def plan_columns_table_function(plan_columns, node, scope, model, name_generator):
+    return None
+
+
+@plan_columns.rule(m.instanceof(Alias))
+def plan_columns_alias(plan_columns, node, scope, model, name_generator):
+    columns = plan_columns(node.input, scope, model, name_generator)
+    return None if columns is None else [column_set_table(col, node.alias) for col in columns]
+
+
+@plan_columns.rule(m.instanceof((Filter, Sort, Limit, TopN, Distinct)))
+def plan_columns_passthrough(plan_columns, node, scope, model, name_generator):
+    return plan_columns(node.input, scope, model, name_generator)
+
+
+@plan_columns.rule(m.instanceof((Project, Aggregate)))
+def plan_columns_project(plan_columns, node, scope, model, name_generator):
+    result = []
+    input_columns = None
+
+    for col in node.columns:
+        if isinstance(col, a.WildCard):
+            if input_columns is None:
+                input_columns = plan_columns(node.input, scope, model, name_generator)
+
+            if input_columns is None:
+                return None
+
+            result.extend(
+                c for c in input_columns if col.table is None or column_get_table(c) == col.table
+            )
+
+        else:
+            result.append(name_generator.get(col.alias))
+
+    return result
+
+
+@plan_columns.rule(m.instanceof(Join))
+def plan_columns_join(plan_columns, node, scope, model, name_generator):
+    left = plan_columns(node.left, scope, model, name_generator)
+    right = plan_columns(node.right, scope, model, name_generator)
+    return None if left is None or right is None else left + right
+
+
+@plan_columns.rule(m.instanceof(SemiJoin))
+def plan_columns_semi_join(plan_columns, node, scope, model, name_generator):
+    return plan_columns(node.left, scope, model, name_generator)
+
+
+@plan_columns.rule(m.instanceof(Lateral))
+def plan_columns_lateral(plan_columns, node, scope, model, name_generator):
+    columns = plan_columns(node.input, scope, model, name_generator)
+    meta = getattr(model, 'lateral_meta', {}).get(node.func.lower())
+
+    if columns is None or meta is None:
+        return None
+
+    alias = name_generator.get(node.alias)
+    return columns + [column_set_table(col, alias) for col in meta.columns]
+
+
+@plan_columns.rule(m.instanceof(Retain))
+def plan_columns_retain(plan_columns, node, scope, model, name_generator):
+    return list(node.columns)
+
+
+@plan_columns.rule(m.instanceof(AddColumns))
+def plan_columns_add_columns(plan_columns, node, scope, model, name_generator):
+    columns = plan_columns(node.input, scope, model, name_generator)
+    return None if columns is None else columns + [name_generator.get(col.alias) for col in node.columns]
+
+
+@plan_columns.rule(m.instanceof(With))
+def plan_columns_with(plan_columns, node, scope, model, name_generator):
+    return plan_columns(node.input, bind_common_tables(scope, node.ctes), model, name_generator)
+
+
+class CommonTable(object):
+    """A common table in the scope used during planning.
+
+    The scope is the one of the definition, the common table itself and any
+    later common tables are not visible inside its plan.
+    """
+    def __init__(self, plan, scope):
+        self.plan = plan
+        self.scope = scope
+
+
+def bind_common_tables(scope, ctes):
+    """Add common tables, given as :class:`Alias` plans, to a planning scope."""
+    scope = dict(scope)
+
+    for cte in ctes:
+        scope[cte.alias] = CommonTable(cte, scope.copy())
+
+    return scope
+
+
+class PlanContext(object):
+    """The information available to rewrite rules."""
+    def __init__(self, scope, model, name_generator):
+        self.scope = scope
+        self.model = model
+        self.name_generator = name_generator
+
+    def columns(self, plan):
+        return plan_columns(plan, self.scope, self.model, self.name_generator)
+
+    def with_scope(self, scope):
+        return PlanContext(scope, self.model, self.name_generator)
+
+    def table_stats(self, name):
+        """Return the statistics of a table in the scope or ``None``, see :class:`Scope`."""
+        stats = getattr(self.scope, 'stats', None)
+        table = self.scope.get(name)
+
+        if stats is None or table is None or isinstance(table, CommonTable):
+            return None
+
+        return stats.get(name, table)
+
+
+def optimize(plan, scope, model, name_generator, rules=None, plan_rules=None):
+    """Apply the rewrite rules to all operators of a plan, from the bottom up.
+
+    :param Optional[Sequence[callable]] rules:
+        the rules to apply, each is called with the plan and a
+        :class:`PlanContext` and returns the rewritten plan. If not given,
+        :data:`rewrite_rules` are used.
+
+    :param Optional[Sequence[callable]] plan_rules:
+        rules applied once to the whole plan afterwards, with the same
+        signature. If not given, :data:`whole_plan_rules` are used.
+    """
+    if rules is None:
+        rules = rewrite_rules
+
+    if plan_rules is None:
+        plan_rules = whole_plan_rules
+
+    context = PlanContext(scope, model, name_generator)
+    plan = _optimize(plan, context, rules)
+
+    for rule in plan_rules:
+        plan = rule(plan, context)
+
+    return plan
+
+
+def _optimize(plan, context, rules):
+    if isinstance(plan, With):
+        scope = context.scope
+        ctes = []
+
+        for cte in plan.ctes:
+            cte = _optimize(cte, context.with_scope(scope), rules)
+            scope = bind_common_tables(scope, [cte])
+            ctes.append(cte)
+
+        # NOTE: the rules of the with plan itself see the outer scope
+        plan = plan.update(ctes=ctes, input=_optimize(plan.input, context.with_scope(scope), rules))
+
+    else:
+        plan = plan.map_inputs(lambda child: _optimize(child, context, rules))
+
+    for rule in rules:
+        plan = rule(plan, context)
+
+    return plan
+
+
+def simplify_expressions(plan, context):
+    """Fold constants and simplify the expressions of an operator.
+
+    Filters that are always true are removed.
+    """
+    def simplify_columns(columns):
+        return [
+            col.update(value=simplify(col.value, context.model)) if isinstance(col, a.Column) else col
+            for col in columns
+        ]
+
+    if isinstance(plan, Filter):
+        condition = simplify(plan.condition, context.model)
+        return plan.input if is_true(condition) else plan.update(condition=condition)
+
+    if isinstance(plan, Project):
+        return plan.update(columns=simplify_columns(plan.columns))
+
+    if isinstance(plan, Aggregate):
+        group_by = [simplify(expr, context.model) for expr in plan.group_by]
+
+        # NOTE: integers in group-by clauses refer to columns by position
+        if any(isinstance(new, a.Integer) and new != old for new, old in zip(group_by, plan.group_by)):
+            return plan
+
+        return plan.update(columns=simplify_columns(plan.columns), group_by=group_by)
+
+    if isinstance(plan, Join) and plan.on is not None:
+        on = simplify(plan.on, context.model)
+
+        if is_true(on):
+            return plan.update(on=None)
+
+        # prepare_join only supports binary operators
+        return plan.update(on=on) if isinstance(on, a.BinaryOp) else plan
+
+    if isinstance(plan, Lateral):
+        return plan.update(args=[simplify(arg, context.model) for arg in plan.args])
+
+    return plan
+
+
+def push_down_filters(plan, context):
+    """Move the conditions of a filter as close to the scanned tables as possible.
+
+    See :data:`push_filter` for the operators filters are pushed through.
+    """
+    if not isinstance(plan, Filter):
+        return plan
+
+    return push_filter(plan.input, flatten_conjunction(plan.condition), context)
+
+
+#: apply a list of conditions to a plan, pushing them into its inputs if possible
+push_filter = m.RuleSet(name='push_filter')
+
+
+@push_filter.rule(m.instanceof(Filter))
+def push_filter_filter(push_filter, plan, conditions, context):
+    return push_filter(plan.input, flatten_conjunction(plan.condition) + list(conditions), context)
+
+
+@push_filter.rule(m.instanceof((Sort, Distinct)))
+def push_filter_passthrough(push_filter, plan, conditions, context):
+    return plan.update(input=push_filter(plan.input, conditions, context))
+
+
+@push_filter.rule(m.instanceof(Join))
+def push_filter_join(push_filter, plan, conditions, context):
+    left = context.columns(plan.left)
+    right = context.columns(plan.right)
+
+    if left is None or right is None:
+        return apply_filter(plan, conditions)
+
+    left_conditions = []
+    right_conditions = []
+    join_conditions = []
+    remaining = []
+
+    for condition in conditions:
+        if not refers_only_to(condition, left + right, context.name_generator):
+            remaining.append(condition)
+
+        elif plan.how in {'inner', 'left'} and refers_only_to(condition, left, context.name_generator):
+            left_conditions.append(condition)
+
+        elif plan.how in {'inner', 'right'} and refers_only_to(condition, right, context.name_generator):
+            right_conditions.append(condition)
+
+        elif plan.how == 'inner' and is_join_condition(condition, left, right, context.name_generator):
+            join_conditions.append(condition)
+
+        else:
+            remaining.append(condition)
+
+    plan = plan.update(
+        left=push_filter(plan.left, left_conditions, context),
+        right=push_filter(plan.right, right_conditions, context),
+    )
+
+    if join_conditions:
+        on = flatten_conjunction(plan.on) if plan.on is not None else []
+        plan = plan.update(on=and_join(on + join_conditions))
+
+    return apply_filter(plan, remaining)
+
+
+@push_filter.rule(m.instanceof(SemiJoin))
+def push_filter_semi_join(push_filter, plan, conditions, context):
+    # semi joins only remove rows of their left input
+    return plan.update(left=push_filter(plan.left, conditions, context))
+
+
+@push_filter.rule(m.instanceof((Lateral, AddColumns)))
+def push_filter_added_columns(push_filter, plan, conditions, context):
+    columns = context.columns(plan)
+    input_columns = context.columns(plan.input)
+
+    if columns is None or input_columns is None:
+        return apply_filter(plan, conditions)
+
+    pushed, remaining = partition(
+        conditions,
+        lambda condition: (
+            refers_only_to(condition, columns, context.name_generator) and
+            refers_only_to(condition, input_columns, context.name_generator)
+        ),
+    )
+
+    plan = plan.update(input=push_filter(plan.input, pushed, context))
+    return apply_filter(plan, remaining)
+
+
+@push_filter.rule(m.instanceof(Alias))
+def push_filter_alias(push_filter, plan, conditions, context):
+    columns = context.columns(plan)
+
+    if columns is None:
+        return apply_filter(plan, conditions)
+
+    pushed, remaining = partition(
+        conditions,
+        lambda condition: refers_only_to(condition, columns, context.name_generator),
+    )
+
+    pushed = [strip_qualifiers(condition, columns, context.name_generator) for condition in pushed]
+    plan = plan.update(input=push_filter(plan.input, pushed, context))
+    return apply_filter(plan, remaining)
+
+
+@push_filter.rule(m.instanceof(Project))
+def push_filter_project(push_filter, plan, conditions, context):
+    columns = context.columns(plan)
+    input_columns = context.columns(plan.input)
+
+    if columns is None or input_columns is None:
+        return apply_filter(plan, conditions)
+
+    values = {
+        context.name_generator.get(col.alias): col.value
+        for col in plan.columns if isinstance(col, a.Column)
+    }
+    return _push_filter_substituted(plan, conditions, values, columns, input_columns, context)
+
+
+@push_filter.rule(m.instanceof(Aggregate))
+def push_filter_aggregate(push_filter, plan, conditions, context):
+    columns = context.columns(plan)
+    input_columns = context.columns(plan.input)
+
+    if columns is None or input_columns is None:
+        return apply_filter(plan, conditions)
+
+    if any(isinstance(col, a.WildCard) for col in plan.columns):
+        return apply_filter(plan, conditions)
+
+    # only conditions on the group-by keys can be evaluated before aggregating
+    keys = group_by_keys(plan, input_columns, context.name_generator)
+    values = {
+        context.name_generator.get(col.alias): col.value if col.value in keys else None
+        for col in plan.columns
+    }
+    return _push_filter_substituted(plan, conditions, values, columns, input_columns, context)
+
+
+@push_filter.rule(m.wildcard)
+def push_filter_default(push_filter, plan, conditions, context):
+    return apply_filter(plan, conditions)
+
+
+def _push_filter_substituted(plan, conditions, values, columns, input_columns, context):
+    """Push conditions below an operator that computes its columns from ``values``."""
+    pushed = []
+    remaining = []
+
+    for condition in conditions:
+        substituted = None
+
+        if refers_only_to(condition, columns, context.name_generator):
+            substituted = substitute_columns(condition, values, columns, input_columns, context.name_generator)
+
+        if substituted is not None and refers_only_to(substituted, input_columns, context.name_generator):
+            pushed.append(substituted)
+
+        else:
+            remaining.append(condition)
+
+    plan = plan.update(input=push_filter(plan.input, pushed, context))
+    return apply_filter(plan, remaining)
+
+
+def push_down_into_common_tables(plan, context):
+    """Move filters on common tables that are used only once into their definition."""
+    if not isinstance(plan, With):
+        return plan
+
+    ctes = list(plan.ctes)
+    body = plan.input
+
+    for idx, cte in enumerate(ctes):
+        consumers = [body] + ctes[idx + 1:]
+
+        # the name may be shadowed by nested common tables
+        if any(inner.alias == cte.alias for nested in walk(consumers, With) for inner in nested.ctes):
+            continue
+
+        scans = [scan for scan in walk(consumers, Scan) if scan.name == cte.alias]
+        if len(scans) != 1:
+            continue
+
+        filters = [node for node in walk(consumers, Filter) if node.input == scans[0]]
+        if len(filters) != 1:
+            continue
+
+        target, = filters
+
+        columns = context.with_scope(bind_common_tables(context.scope, ctes[:idx + 1])).columns(target.input)
+        if columns is None:
+            continue
+
+        pushed, remaining = partition(
+            flatten_conjunction(target.condition),
+            lambda condition: refers_only_to(condition, columns, context.name_generator),
+        )
+
+        if not pushed:
+            continue
+
+        pushed = [strip_qualifiers(condition, columns, context.name_generator) for condition in pushed]
+
+        cte_context = context.with_scope(bind_common_tables(context.scope, ctes[:idx]))
+        ctes[idx] = cte.update(input=push_filter(cte.input, pushed, cte_context))
+
+        def replace(node, target=target, remaining=remaining):
+            return apply_filter(node.input, remaining) if node == target else node
+
+        body = rewrite(body, replace)
+        ctes[idx + 1:] = [rewrite(other, replace) for other in ctes[idx + 1:]]
+
+    return plan.update(input=body, ctes=ctes)
+
+
+def inline_common_tables(plan, context):
+    """Remove unused common tables and replace common tables used once by their plan.
+
+    Only common tables used multiple times are evaluated before the input of
+    the with plan. Common tables are not inlined if the tables they read
+    would be shadowed at the point of use.
+    """
+    if not isinstance(plan, With):
+        return plan
+
+    ctes = list(plan.ctes)
+    body = plan.input
+
+    # NOTE: later common tables are handled first, they may use earlier ones
+    for idx in reversed(range(len(ctes))):
+        cte = ctes[idx]
+        consumers = [body] + ctes[idx + 1:]
+
+        shadowed = {inner.alias for nested in walk(consumers, With) for inner in nested.ctes}
+        shadowed.update(other.alias for other in ctes[idx + 1:])
+
+        if cte.alias in shadowed:
+            continue
+
+        scans = [scan for scan in walk(consumers, Scan) if scan.name == cte.alias]
+
+        if len(scans) > 1:
+            continue
+
+        if scans and (scans[0].columns is not None or any(scan.name in shadowed for scan in walk(cte, Scan))):
+            continue
+
+        def replace(node, cte=cte):
+            if not isinstance(node, Scan) or node.name != cte.alias:
+                return node
+
+            return cte if node.alias is None else cte.update(alias=node.alias)
+
+        body = rewrite(body, replace)
+        ctes[idx + 1:] = [rewrite(other, replace) for other in ctes[idx + 1:]]
+        del ctes[idx]
+
+    if not ctes:
+        return body
+
+    return plan.update(input=body, ctes=ctes)
+
+
+def eliminate_common_subexpressions(plan, context):
+    """Compute expressions used multiple times by a projection or aggregation only once.
+
+    Repeated sub-expressions of the columns, the group-by clause, and the
+    condition of a filter directly below are computed by an
+    :class:`AddColumns` operator into a hidden column and replaced by
+    references to this column. Expressions used by the filter are computed
+    before filtering, all others afterwards.
+    """
+    if not isinstance(plan, (Project, Aggregate)):
+        return plan
+
+    # hidden columns would be selected by wildcards
+    if any(isinstance(col, a.WildCard) and col.table is None for col in plan.columns):
+        return plan
+
+    target = plan.input if isinstance(plan.input, Filter) else None
+    condition = target.condition if target is not None else None
+    columns = list(plan.columns)
+    group_by = list(plan.group_by) if isinstance(plan, Aggregate) else []
+    before, after = [], []
+
+    while True:
+        common = common_subexpression([condition, before], [columns, group_by, after])
+
+        if common is None:
+            break
+
+        expr, used_by_filter = common
+        name = context.name_generator.get(Unique())
+
+        def replace(obj, expr=expr, name=name):
+            return rewrite(obj, lambda node: a.Name(name) if node == expr else node)
+
+        condition, columns, group_by = replace(condition), replace(columns), replace(group_by)
+        before, after = replace(before), replace(after)
+        (before if used_by_filter else after).append(a.Column(expr, name))
+
+    if not before and not after:
+        return plan
+
+    # NOTE: later hidden columns are sub-expressions of earlier ones
+    input = plan.input
+
+    if target is not None:
+        input = target.input
+        input = AddColumns(input, before[::-1]) if before else input
+        input = target.update(input=input, condition=condition)
+
+    input = AddColumns(input, after[::-1]) if after else input
+
+    if isinstance(plan, Aggregate):
+        return plan.update(input=input, columns=columns, group_by=group_by)
+
+    return plan.update(input=input, columns=columns)
+
+
+def common_subexpression(filtered, unfiltered):
+    """Find the largest expression that is evaluated at least twice.
+
+    Returns ``None`` or a pair of the expression and whether it is used by
+    the ``filtered`` objects.
+    """
+    candidates = []
+
+    for used_by_filter, objs in [(True, filtered), (False, unfiltered)]:
+        for expr in unconditional_subexpressions(objs):
+            if not is_shareable_expression(expr):
+                continue
+
+            for candidate in candidates:
+                if candidate[0] == expr:
+                    candidate[1] += 1
+                    candidate[2] = candidate[2] or used_by_filter
+                    break
+
+            else:
+                candidates.append([expr, 1, used_by_filter])
+
+    candidates = [candidate for candidate in candidates if candidate[1] > 1]
+
+    if not candidates:
+        return None
+
+    expr, _, used_by_filter = max(candidates, key=lambda candidate: sum(1 for _ in walk(candidate[0], Record)))
+    return expr, used_by_filter
+
+
+def unconditional_subexpressions(obj):
+    """Yield the expressions evaluated for all rows, i.e., not inside case expressions."""
+    stack = [obj]
+
+    while stack:
+        obj = stack.pop()
+
+        if isinstance(obj, (list, tuple)):
+            stack.extend(reversed(obj))
+
+        elif isinstance(obj, Record):
+            yield obj
+
+            if not isinstance(obj, a.CaseExpression):
+                stack.extend(reversed(obj.key()))
+
+
+def is_shareable_expression(expr):
+    if not isinstance(expr, shareable_expression_types):
+        return False
+
+    if any(True for _ in walk(expr, non_shareable_types)):
+        return False
+
+    # constant expressions are folded
+    return any(True for _ in walk(expr, a.Name))
+
+
+shareable_expression_types = (a.BinaryOp, a.UnaryOp, a.Call, a.Cast, a.CaseExpression)
+non_shareable_types = (
+    a.CallSetFunction, a.CallAnalyticsFunction, a.WildCard, a.Placeholder, a.Select, a.SubQuery,
+)
+
+
+def apply_filter(plan, conditions):
+    condition = and_join(conditions)
+    return plan if condition is None else Filter(plan, condition)
+
+
+def partition(items, pred):
+    true = []
+    false = []
+
+    for item in items:
+        (true if pred(item) else false).append(item)
+
+    return true, false
+
+
+def refers_only_to(expr, columns, name_generator):
+    """Check whether an expression refers to at least one and only to the given columns.
+
+    All references have to be unambiguous.
+    """
+    names = list(walk(expr, a.Name))
+
+    if not names:
+        return False
+
+    return all(
+        normalize_col_ref(name_generator.get(name.name), columns, optional=True) is not None
+        for name in names
+    )
+
+
+def is_join_condition(expr, left, right, name_generator):
+    """Check whether :func:`prepare_join` can use an expression as a join condition."""
+    try:
+        if isinstance(expr, a.BinaryOp) and expr.op == '=':
+            origins = [
+                determine_origin(expr.left, name_generator, left, right),
+                determine_origin(expr.right, name_generator, left, right),
+            ]
+            return Origin.ambigious not in origins
+
+        determine_origin(expr, name_generator, left, right)
+        return True
+
+    except NotImplementedError:
+        return False
+
+
+def strip_qualifiers(expr, columns, name_generator):
+    """Remove the table from all column references, e.g., when pushing into a subquery."""
+    def strip(node):
+        if not isinstance(node, a.Name):
+            return node
+
+        column = normalize_col_ref(name_generator.get(node.name), columns)
+        return a.Name(column_get_column(column))
+
+    return rewrite(expr, strip)
+
+
+def substitute_columns(expr, values, columns, input_columns, name_generator):
+    """Replace references to computed columns by their definition.
+
+    ``values`` maps the computed columns to their definition, or to ``None`` if
+    the column cannot be substituted. References to columns that are passed
+    through unchanged are kept. If any reference cannot be translated, ``None``
+    is returned.
+    """
+    failed = []
+
+    def substitute(node):
+        if not isinstance(node, a.Name):
+            return node
+
+        name = name_generator.get(node.name)
+        column = normalize_col_ref(name, columns)
+
+        if values.get(column) is not None:
+            return values[column]
+
+        if column not in values and normalize_col_ref(name, input_columns, optional=True) == column:
+            return node
+
+        failed.append(node)
+        return node
+
+    expr = rewrite(expr, substitute)
+    return expr if not failed else None
+
+
+def group_by_keys(plan, input_columns, name_generator):
+    """Return the group-by expressions of an aggregate, see :func:`normalize_group_by`."""
+    aliases = {
+        name_generator.get(col.alias): col.value
+        for col in plan.columns if isinstance(col, a.Column)
+    }
+
+    keys = []
+    for expr in plan.group_by:
+        if isinstance(expr, a.Integer):
+            expr = plan.columns[int(expr.value) - 1].value
+
+        elif (
+            isinstance(expr, a.Name) and
+            normalize_col_ref(name_generator.get(expr.name), input_columns, optional=True) is None
+        ):
+            expr = aliases.get(expr.name, expr)
+
+        keys.append(expr)
+
+    return [key for key in keys if not any(walk(key, a.CallSetFunction))]
+
+
+def combine_sort_and_limit(plan, context):
+    """Replace a sort followed by a limit by a single top-n operator.
+
+    Only the first rows need to be sorted, instead of the whole input.
+    """
+    if not isinstance(plan, Limit) or plan.limit is None or not isinstance(plan.input, Sort):
+        return plan
+
+    return TopN(plan.input.input, plan.input.values, plan.limit, plan.offset)
+
+
+def prune_columns(plan, context):
+    """Only read and keep the columns that are required to compute the result."""
+    return prune(plan, None, context)
+
+
+#: remove unused columns from a plan given the set of required output columns.
+#: If the columns of a plan are not known, the required columns are given
+#: without their table. ``None`` requires all columns.
+prune = m.RuleSet(name='prune')
+
+
+@prune.rule(m.instanceof(Scan))
+def prune_scan(prune, plan, required, context):
+    columns = context.columns(plan)
+    source = scan_source_columns(plan, context)
+
+    if required is None or columns is None or source is None:
+        return plan
+
+    # NOTE: keep a single column to retain the number of rows
+    keep = [src for src, col in zip(source, columns) if col in required] or source[:1]
+    return plan.update(columns=keep) if len(keep) != len(source) else plan
+
+
+@prune.rule(m.instanceof(TableFunction))
+def prune_table_function(prune, plan, required, context):
+    if not required or plan.func.lower() not in usecols_table_functions:
+        return plan
+
+    return plan.update(columns=sorted(required))
+
+
+@prune.rule(m.instanceof(Filter))
+def prune_filter(prune, plan, required, context):
+    references = referenced_columns(plan.condition, context.columns(plan.input), context.name_generator)
+    return plan.update(input=prune(plan.input, union(required, references), context))
+
+
+@prune.rule(m.instanceof((Sort, TopN)))
+def prune_sort(prune, plan, required, context):
+    # sorting by position requires all columns
+    if any(isinstance(value.value, a.Integer) for value in plan.values):
+        return plan.update(input=prune(plan.input, None, context))
+
+    references = referenced_columns(plan.values, context.columns(plan.input), context.name_generator)
+    return plan.update(input=prune(plan.input, union(required, references), context))
+
+
+@prune.rule(m.instanceof(Limit))
+def prune_limit(prune, plan, required, context):
+    return plan.update(input=prune(plan.input, required, context))
+
+
+@prune.rule(m.instanceof(Retain))
+def prune_retain(prune, plan, required, context):
+    columns = list(plan.columns)
+
+    if required is not None:
+        columns = [col for col in columns if col in required] or columns[:1]
+
+    input = prune(plan.input, set(columns), context)
+    return input if context.columns(input) == columns else plan.update(input=input, columns=columns)
+
+
+@prune.rule(m.instanceof(Project))
+def prune_project(prune, plan, required, context):
+    input_columns = context.columns(plan.input)
+    columns = list(plan.columns)
+
+    if required is not None:
+        columns = [
+            col for col in columns
+            if not isinstance(col, a.Column) or context.name_generator.get(col.alias) in required
+        ] or columns[:1]
+
+    references = referenced_columns(
+        [col.value for col in columns if isinstance(col, a.Column)],
+        input_columns, context.name_generator,
+    )
+
+    for col in columns:
+        if not isinstance(col, a.WildCard):
+            continue
+
+        if required is None or input_columns is None:
+            references = None
+            break
+
+        references = union(references, {
+            c for c in input_columns
+            if c in required and (col.table is None or column_get_table(c) == col.table)
+        })
+
+    return plan.update(input=prune(plan.input, references, context), columns=columns)
+
+
+@prune.rule(m.instanceof(Aggregate))
+def prune_aggregate(prune, plan, required, context):
+    input_columns = context.columns(plan.input)
+
+    if any(isinstance(col, a.WildCard) for col in plan.columns):
+        return plan.update(input=prune(plan.input, None, context))
+
+    if input_columns is not None:
+        keys = group_by_keys(plan, input_columns, context.name_generator)
+
+    else:
+        keys = plan.group_by
+
+    references = referenced_columns(
+        [col.value for col in plan.columns] + list(keys), input_columns, context.name_generator,
+    )
+    return plan.update(input=prune(plan.input, references, context))
+
+
+@prune.rule(m.instanceof(Alias))
+def prune_alias(prune, plan, required, context):
+    columns = context.columns(plan)
+    input_columns = context.columns(plan.input)
+
+    if required is not None and columns is not None and input_columns is not None:
+        required = {inner for outer, inner in zip(columns, input_columns) if outer in required}
+
+    elif columns is not None:
+        required = None
+
+    return plan.update(input=prune(plan.input, required, context))
+
+
+@prune.rule(m.instanceof(Join))
+def prune_join(prune, plan, required, context):
+    left = context.columns(plan.left)
+    right = context.columns(plan.right)
+
+    if left is None or right is None:
+        return plan.map_inputs(lambda child: prune(child, None, context))
+
+    references = union(required, referenced_columns(plan.on, left + right, context.name_generator))
+
+    return plan.update(
+        left=_prune_join_input(plan.left, left, references, context),
+        right=_prune_join_input(plan.right, right, references, context),
+    )
+
+
+def _prune_join_input(plan, columns, required, context):
+    if required is None:
+        return prune(plan, None, context)
+
+    required = {col for col in columns if col in required}
+    plan = prune(plan, required, context)
+
+    if isinstance(plan, Scan):
+        return plan
+
+    # drop intermediate columns, e.g., the keys of joins or filters, before joining
+    columns = context.columns(plan)
+    keep = [col for col in columns if col in required] or columns[:1]
+    return Retain(plan, keep) if len(keep) != len(columns) else plan
+
+
+@prune.rule(m.instanceof(SemiJoin))
+def prune_semi_join(prune, plan, required, context):
+    references = referenced_columns(plan.on, context.columns(plan.left), context.name_generator)
+    return plan.update(
+        left=prune(plan.left, union(required, references), context),
+        right=prune(plan.right, None, context),
+    )
+
+
+@prune.rule(m.instanceof(Lateral))
+def prune_lateral(prune, plan, required, context):
+    columns = context.columns(plan)
+    input_columns = context.columns(plan.input)
+
+    if required is None or columns is None or input_columns is None:
+        return plan.update(input=prune(plan.input, None, context))
+
+    references = referenced_columns(plan.args, input_columns, context.name_generator)
+    references = union({col for col in input_columns if col in required}, references)
+    return plan.update(input=prune(plan.input, references, context))
+
+
+@prune.rule(m.instanceof(AddColumns))
+def prune_add_columns(prune, plan, required, context):
+    input_columns = context.columns(plan.input)
+
+    if required is None or input_columns is None:
+        return plan.update(input=prune(plan.input, None, context))
+
+    # later columns may use earlier ones
+    columns = []
+
+    for col in reversed(plan.columns):
+        if context.name_generator.get(col.alias) not in required:
+            continue
+
+        references = referenced_columns(col.value, input_columns, context.name_generator)
+
+        if references is None:
+            return plan.update(input=prune(plan.input, None, context))
+
+        columns.insert(0, col)
+        required = union(required, references)
+
+    input = prune(plan.input, {col for col in required if col in input_columns}, context)
+    return plan.update(input=input, columns=columns) if columns else input
+
+
+@prune.rule(m.instanceof(With))
+def prune_with(prune, plan, required, context):
+    ctes = list(plan.ctes)
+    body = prune(plan.input, required, context.with_scope(bind_common_tables(context.scope, ctes)))
+
+    # later common tables may only use earlier ones
+    for idx in reversed(range(len(ctes))):
+        cte = ctes[idx]
+        consumers = [body] + ctes[idx + 1:]
+        scans = [scan for scan in walk(consumers, Scan) if scan.name == cte.alias]
+
+        if any(inner.alias == cte.alias for nested in walk(consumers, With) for inner in nested.ctes):
+            cte_required = None
+
+        elif any(scan.columns is None for scan in scans):
+            cte_required = None
+
+        else:
+            cte_required = {col for scan in scans for col in scan.columns}
+
+        ctes[idx] = prune(cte, cte_required, context.with_scope(bind_common_tables(context.scope, ctes[:idx])))
+
+    return plan.update(input=body, ctes=ctes)
+
+
+@prune.rule(m.wildcard)
+def prune_default(prune, plan, required, context):
+    return plan.map_inputs(lambda child: prune(child, None, context))
+
+
+def scan_source_columns(plan, context):
+    """Return the columns of a scanned table, before setting the table, or ``None``."""
+    if plan.name in getattr(context.model, 'special_tables', ()):
+        return None
+
+    table = context.scope.get(plan.name)
+
+    if isinstance(table, CommonTable):
+        return plan_columns(table.plan, table.scope, context.model, context.name_generator)
+
+    columns = getattr(table, 'columns', None)
+    return None if columns is None else list(columns)
+
+
+def referenced_columns(exprs, columns, name_generator):
+    """Return the columns referenced in expressions or ``None`` if unknown.
+
+    If ``columns`` is ``None``, the names are returned without their table.
+    """
+    result = set()
+
+    for name in walk(exprs, a.Name):
+        name = name_generator.get(name.name)
+
+        if columns is None:
+            result.add(column_get_column(to_internal_col(name)))
+            continue
+
+        column = normalize_col_ref(name, columns, optional=True)
+
+        if column is None:
+            return None
+
+        result.add(column)
+
+    return result
+
+
+def union(*sets):
+    if any(s is None for s in sets):
+        return None
+
+    return set().union(*sets)
+
+
+#: table functions that support reading only a subset of columns via ``usecols``
+usecols_table_functions = {'copy_from'}
+
+
+def flatten_conjunction(expr):
+    if isinstance(expr, a.BinaryOp) and expr.op == 'and':
+        return flatten_conjunction(expr.left) + flatten_conjunction(expr.right)
+
+    return [expr]
+
+
+#: estimate the number of rows of a plan, returns ``None`` if unknown
+estimate_rows = m.RuleSet(name='estimate_rows')
+
+
+@estimate_rows.rule(m.instanceof(Scan))
+def estimate_rows_scan(estimate_rows, plan, context):
+    if plan.name in getattr(context.model, 'special_tables', ()):
+        return None
+
+    table = context.scope.get(plan.name)
+
+    if isinstance(table, CommonTable):
+        return estimate_rows(table.plan, context.with_scope(table.scope))
+
+    # NOTE: the length of dask dataframes is only known after analyzing them
+    stats = context.table_stats(plan.name)
+
+    if stats is not None:
+        return float(stats.rows)
+
+    if isinstance(table, pd.DataFrame):
+        return float(len(table))
+
+    return None
+
+
+@estimate_rows.rule(m.instanceof(Dual))
+def estimate_rows_dual(estimate_rows, plan, context):
+    return 1.0
+
+
+@estimate_rows.rule(m.instanceof(Filter))
+def estimate_rows_filter(estimate_rows, plan, context):
+    rows = estimate_rows(plan.input, context)
+
+    if rows is None:
+        return None
+
+    stats = column_stats(plan.input, context)
+    return rows * estimate_selectivity(flatten_conjunction(plan.condition), stats, context.name_generator)
+
+
+@estimate_rows.rule(m.instanceof((Alias, Project, Sort, Distinct, Retain, AddColumns)))
+def estimate_rows_passthrough(estimate_rows, plan, context):
+    return estimate_rows(plan.input, context)
+
+
+@estimate_rows.rule(m.instanceof(Aggregate))
+def estimate_rows_aggregate(estimate_rows, plan, context):
+    if all(isinstance(expr, a.Bool) for expr in plan.group_by):
+        return 1.0
+
+    rows = estimate_rows(plan.input, context)
+    return None if rows is None else max(1.0, rows * default_selectivity['group-by'])
+
+
+@estimate_rows.rule(m.instanceof((Limit, TopN)))
+def estimate_rows_limit(estimate_rows, plan, context):
+    rows = estimate_rows(plan.input, context)
+
+    if plan.limit is None:
+        return rows
+
+    return float(plan.limit) if rows is None else min(rows, float(plan.limit))
+
+
+@estimate_rows.rule(m.instanceof(Join))
+def estimate_rows_join(estimate_rows, plan, context):
+    left = estimate_rows(plan.left, context)
+    right = estimate_rows(plan.right, context)
+
+    if left is None or right is None:
+        return None
+
+    conditions = flatten_conjunction(plan.on) if plan.on is not None else []
+    stats = column_stats(plan, context)
+    rows = estimate_join_rows(left, right, conditions, stats, context.name_generator)
+
+    # outer joins keep all rows of the outer side
+    if plan.how in {'left', 'outer'}:
+        rows = max(rows, left)
+
+    if plan.how in {'right', 'outer'}:
+        rows = max(rows, right)
+
+    return rows
+
+
+@estimate_rows.rule(m.instanceof(SemiJoin))
+def estimate_rows_semi_join(estimate_rows, plan, context):
+    rows = estimate_rows(plan.left, context)
+    return None if rows is None else rows * default_selectivity['semi-join']
+
+
+@estimate_rows.rule(m.instanceof(With))
+def estimate_rows_with(estimate_rows, plan, context):
+    return estimate_rows(plan.input, context.with_scope(bind_common_tables(context.scope, plan.ctes)))
+
+
+@estimate_rows.rule(m.wildcard)
+def estimate_rows_default(estimate_rows, plan, context):
+    return None
+
+
+#: the statistics of the columns of a plan, as a mapping of internal column names to ``ColumnStats``
+column_stats = m.RuleSet(name='column_stats')
+
+
+@column_stats.rule(m.instanceof(Scan))
+def column_stats_scan(column_stats, plan, context):
+    table = context.scope.get(plan.name)
+
+    if isinstance(table, CommonTable):
+        return column_stats(table.plan, context.with_scope(table.scope))
+
+    stats = context.table_stats(plan.name)
+
+    if stats is None:
+        return {}
+
+    alias = plan.alias if plan.alias is not None else plan.name
+    return {column_from_parts(alias, name): column for name, column in stats.columns.items()}
+
+
+@column_stats.rule(m.instanceof((Filter, Sort, Limit, TopN, Distinct, Retain, AddColumns, Lateral)))
+def column_stats_passthrough(column_stats, plan, context):
+    return column_stats(plan.input, context)
+
+
+@column_stats.rule(m.instanceof(SemiJoin))
+def column_stats_semi_join(column_stats, plan, context):
+    return column_stats(plan.left, context)
+
+
+@column_stats.rule(m.instanceof(Alias))
+def column_stats_alias(column_stats, plan, context):
+    return {
+        column_set_table(name, plan.alias): column
+        for name, column in column_stats(plan.input, context).items()
+    }
+
+
+@column_stats.rule(m.instanceof((Project, Aggregate)))
+def column_stats_project(column_stats, plan, context):
+    stats = column_stats(plan.input, context)
+    result = {}
+
+    for col in plan.columns:
+        column = lookup_column_stats(getattr(col, 'value', None), stats, context.name_generator)
+
+        if column is not None and col.alias is not None:
+            result[context.name_generator.get(col.alias)] = column
+
+    return result
+
+
+@column_stats.rule(m.instanceof(Join))
+def column_stats_join(column_stats, plan, context):
+    result = dict(column_stats(plan.left, context))
+    result.update(column_stats(plan.right, context))
+    return result
+
+
+@column_stats.rule(m.instanceof(With))
+def column_stats_with(column_stats, plan, context):
+    return column_stats(plan.input, context.with_scope(bind_common_tables(context.scope, plan.ctes)))
+
+
+@column_stats.rule(m.wildcard)
+def column_stats_default(column_stats, plan, context):
+    return {}
+
+
+def estimate_selectivity(conditions, stats=None, name_generator=None):
+    """Estimate the fraction of rows that satisfy all conditions.
+
+    :param Optional[Mapping[str,ColumnStats]] stats:
+        the statistics of the columns, see :data:`column_stats`. If given,
+        comparisons of columns with literals are estimated from the number of
+        distinct values and the value ranges.
+    """
+    result = 1.0
+
+    for condition in conditions:
+        selectivity = None
+
+        if stats:
+            selectivity = estimate_comparison_selectivity(condition, stats, name_generator)
+
+        if selectivity is None:
+            op = condition.op if isinstance(condition, (a.BinaryOp, a.UnaryOp)) else None
+            selectivity = default_selectivity.get(op, default_selectivity['other'])
+
+        result *= selectivity
+
+    return result
+
+
+def estimate_comparison_selectivity(condition, stats, name_generator):
+    if not isinstance(condition, a.BinaryOp) or condition.op not in default_selectivity:
+        return None
+
+    op, column, literal = condition.op, condition.left, condition.right
+
+    if isinstance(literal, a.Name):
+        op, column, literal = _flipped_comparisons.get(op, op), literal, column
+
+    column = lookup_column_stats(column, stats, name_generator)
+
+    if column is None or not isinstance(literal, (a.Integer, a.Float, a.String, a.Bool)):
+        return None
+
+    non_null = 1.0 - column.null_fraction
+    distinct = max(1.0, column.distinct)
+
+    if op == '=':
+        return non_null / distinct
+
+    if op in {'!=', '<>'}:
+        return non_null * (1.0 - 1.0 / distinct)
+
+    if not isinstance(literal, (a.Integer, a.Float)):
+        return None
+
+    try:
+        low, high, value = float(column.min), float(column.max), float(literal.value)
+
+    except (TypeError, ValueError):
+        return None
+
+    if high <= low:
+        return None
+
+    below = min(1.0, max(0.0, (value - low) / (high - low)))
+    return non_null * (below if op in {'<', '<='} else 1.0 - below)
+
+
+def lookup_column_stats(expr, stats, name_generator):
+    """Return the statistics of a column reference or ``None``."""
+    if not isinstance(expr, a.Name) or not stats:
+        return None
+
+    name = name_generator.get(expr.name) if name_generator is not None else expr.name
+    name = normalize_col_ref(name, list(stats), optional=True)
+    return stats[name] if name is not None else None
+
+
+def estimate_join_rows(left, right, conditions, stats=None, name_generator=None):
+    """Estimate the size of an inner join.
+
+    Equality conditions between both sides are assumed to join a foreign key
+    with a primary key, unless the number of distinct values of the columns
+    is known from their statistics.
+    """
+    equalities = [
+        condition for condition in conditions
+        if isinstance(condition, a.BinaryOp) and condition.op == '=' and
+        isinstance(condition.left, a.Name) and isinstance(condition.right, a.Name)
+    ]
+    others = [condition for condition in conditions if condition not in equalities]
+
+    if not equalities:
+        return left * right * estimate_selectivity(others, stats, name_generator)
+
+    estimates = []
+
+    for condition in equalities:
+        columns = [lookup_column_stats(expr, stats, name_generator) for expr in (condition.left, condition.right)]
+
+        if all(column is not None for column in columns):
+            estimates.append(left * right / max([1.0] + [column.distinct for column in columns]))
+
+    rows = min(estimates) if estimates else max(left, right)
+    return rows * estimate_selectivity(others, stats, name_generator)
+
+
+#: the assumed fraction of rows that satisfy a condition, per operator
+default_selectivity = {
+    '=': 0.1,
+    '!=': 0.9,
+    '<>': 0.9,
+    '<': 1 / 3,
+    '<=': 1 / 3,
+    '>': 1 / 3,
+    '>=': 1 / 3,
+    'group-by': 0.1,
+    'semi-join': 0.5,
+    'other': 0.5,
+}
+
+
+def reorder_joins(plan, context):
+    """Reorder chains of inner joins by the estimated sizes of their results.
+
+    The tables are joined greedily, starting with the smallest one and always
+    adding the table that results in the smallest intermediate result. Tables
+    connected by a join condition are preferred to avoid cross products. The
+    original column order is restored by a :class:`Retain` operator.
+    """
+    if isinstance(plan, With):
+        scope = context.scope
+        ctes = []
+
+        for cte in plan.ctes:
+            cte = reorder_joins(cte, context.with_scope(scope))
+            scope = bind_common_tables(scope, [cte])
+            ctes.append(cte)
+
+        return plan.update(ctes=ctes, input=reorder_joins(plan.input, context.with_scope(scope)))
+
+    if not is_inner_join(plan):
+        return plan.map_inputs(lambda child: reorder_joins(child, context))
+
+    plan = map_inner_join_inputs(plan, lambda child: reorder_joins(child, context))
+    inputs, conditions = inner_join_inputs(plan)
+    references = join_references(inputs, conditions, context)
+
+    if len(inputs) < 3 or references is None:
+        return plan
+
+    order = join_order(inputs, conditions, references, context)
+
+    if order == list(range(len(inputs))):
+        return plan
+
+    pending = list(range(len(conditions)))
+    joined = {order[0]}
+    result = inputs[order[0]]
+
+    for idx in order[1:]:
+        joined.add(idx)
+        current, pending = partition(pending, lambda k: references[k] <= joined)
+        result = Join(result, inputs[idx], 'inner', and_join(conditions[k] for k in current))
+
+    columns = [context.columns(input) for input in inputs]
+    return Retain(result, [col for cols in columns for col in cols])
+
+
+def is_inner_join(plan):
+    return isinstance(plan, Join) and plan.how == 'inner'
+
+
+def map_inner_join_inputs(plan, func):
+    """Apply ``func`` to the inputs of a tree of inner joins."""
+    if not is_inner_join(plan):
+        return func(plan)
+
+    return plan.map_inputs(lambda child: map_inner_join_inputs(child, func))
+
+
+def inner_join_inputs(plan):
+    """Return the inputs of a tree of inner joins and the conjuncts of their conditions."""
+    inputs = []
+    conditions = []
+
+    def collect(plan):
+        if not is_inner_join(plan):
+            inputs.append(plan)
+            return
+
+        collect(plan.left)
+        collect(plan.right)
+
+        if plan.on is not None:
+            conditions.extend(flatten_conjunction(plan.on))
+
+    collect(plan)
+    return inputs, conditions
+
+
+def join_references(inputs, conditions, context):
+    """Return the set of inputs referenced by each condition or ``None`` if unknown."""
+    columns = [context.columns(input) for input in inputs]
+
+    if any(cols is None for cols in columns):
+        return None
+
+    all_columns = [col for cols in columns for col in cols]
+
+    if len(set(all_columns)) != len(all_columns):
+        return None
+
+    owner = {col: idx for idx, cols in enumerate(columns) for col in cols}
+    references = []
+
+    for condition in conditions:
+        referenced = referenced_columns(condition, all_columns, context.name_generator)
+
+        if referenced is None:
+            return None
+
+        references.append({owner[col] for col in referenced})
+
+    return references
+
+
+def join_order(inputs, conditions, references, context):
+    """Determine the order of joining the inputs given the conditions and the inputs they reference."""
+    # unknown sizes are assumed to be as large as the largest known table
+    rows = [estimate_rows(input, context) for input in inputs]
+    known = [r for r in rows if r is not None]
+    rows = [r if r is not None else max(known or [1.0]) for r in rows]
+
+    stats = {}
+    for input in inputs:
+        stats.update(column_stats(input, context))
+
+    start = min(range(len(inputs)), key=lambda idx: rows[idx])
+    order = [start]
+    joined = {start}
+    current_rows = rows[start]
+
+    while len(order) < len(inputs):
+        best = None
+
+        for idx in range(len(inputs)):
+            if idx in joined:
+                continue
+
+            applicable = [
+                k for k, referenced in enumerate(references)
+                if idx in referenced and referenced <= joined | {idx}
+            ]
+            connected = any(len(references[k]) > 1 for k in applicable)
+            estimate = estimate_join_rows(
+                current_rows, rows[idx], [conditions[k] for k in applicable], stats, context.name_generator,
+            )
+            key = (not connected, estimate)
+
+            if best is None or key < best[0]:
+                best = key, idx
+
+        (_, current_rows), idx = best
+        order.append(idx)
+        joined.add(idx)
+
+    return order
+
+
+#: the rules applied by :func:`optimize` per default
+rewrite_rules = [
+    simplify_expressions,
+    push_down_filters,
+    push_down_into_common_tables,
+    inline_common_tables,
+    eliminate_common_subexpressions,
+    combine_sort_and_limit,
+]
+
+#: the rules applied by :func:`optimize` to the whole plan per default
+whole_plan_rules = [reorder_joins, prune_columns]
+
+
+def format_plan(plan, name_generator=None, context=None):
+    """Format a plan as a list of lines, inputs are indented below their operator.
+
+    :param Optional[PlanContext] context:
+        if given, the estimated number of rows is added to each operator.
+    """
+    lines = []
+
+    for depth, node, node_context in iter_plan(plan, context):
+        details = format_details(node, name_generator)
+        rows = estimate_rows(node, node_context) if node_context is not None else None
+
+        if rows is not None:
+            details.append('rows={:.0f}'.format(rows))
+
+        lines.append('{}{}({})'.format('  ' * depth, type(node).__name__, ', '.join(details)))
+
+    return lines
+
+
+def iter_plan(plan, context=None, depth=0):
+    """Iterate over the operators of a plan as ``(depth, operator, context)``, operators first.
+
+    The context of the operators inside a :class:`With` plan contains the
+    common tables visible to them.
+    """
+    yield depth, plan, context
+
+    if isinstance(plan, With):
+        for idx, cte in enumerate(plan.ctes):
+            cte_context = None
+
+            if context is not None:
+                cte_context = context.with_scope(bind_common_tables(context.scope, plan.ctes[:idx]))
+
+            for item in iter_plan(cte, cte_context, depth + 1):
+                yield item
+
+        if context is not None:
+            context = context.with_scope(bind_common_tables(context.scope, plan.ctes))
+
+    for child in plan.inputs():
+        for item in iter_plan(child, context, depth + 1):
+            yield item
+
+
+def format_details(plan, name_generator=None):
+    return [
+        '{}={}'.format(key, format_value(value, name_generator))
+        for key, value in plan.items()
+        if key not in plan.__inputs__ and value is not None
+    ]
+
+
+#: the model methods used to execute the operators, as reported by :func:`explain_plan`
+operator_methods = {
+    Scan: 'get_table',
+    Dual: 'dual',
+    TableFunction: 'eval_table_valued',
+    Alias: 'add_table_to_columns',
+    Filter: 'filter_table',
+    Project: 'transform',
+    Aggregate: 'transform, aggregate, transform',
+    Join: 'join',
+    SemiJoin: 'semi_join',
+    Lateral: 'lateral',
+    Sort: 'sort_values',
+    Limit: 'limit_offset',
+    TopN: 'top_n',
+    Distinct: 'drop_duplicates',
+    Retain: 'transform',
+    AddColumns: 'add_columns',
+}
+
+
+def explain_plan(plan, scope, model, name_generator, analyze=False):
+    """Describe the operators of a plan as a pandas dataframe, one row per operator.
+
+    The operators are listed as formatted by :func:`format_plan`, with the
+    model methods used to execute them and their estimated number of rows.
+
+    :param bool analyze:
+        if True, execute the plan and add the number of input and output rows
+        and the wall time in seconds of each operator, excluding its inputs.
+        The result of each operator is materialized with
+        ``model.analyze_table``, which may report further columns, e.g., the
+        number of partitions and tasks for dask.
+    """
+    stats = {}
+
+    if analyze:
+        def analyze_root(execute_plan, node, scope, model, name_generator):
+            start = time.time()
+            table = execute_plan.apply_rules(node, scope, model, name_generator)
+            table, info = model.analyze_table(table)
+            info['time'] = time.time() - start
+
+            stats[id(node)] = info
+            return table
+
+        analyze_plan = m.RuleSet(rules=execute_plan.rules, name='analyze_plan', root=analyze_root)
+        analyze_plan(plan, scope, model, name_generator)
+
+    columns = ['operator', 'method', 'estimated_rows']
+    rows = []
+
+    for depth, node, context in iter_plan(plan, PlanContext(scope, model, name_generator)):
+        children = [stats.get(id(child), {}) for child in node.inputs()]
+
+        if isinstance(node, With):
+            children += [stats.get(id(cte), {}) for cte in node.ctes]
+
+        details = ', '.join(format_details(node, name_generator))
+
+        row = {
+            'operator': '{}{}({})'.format('  ' * depth, type(node).__name__, details),
+            'method': operator_methods.get(type(node)),
+            'estimated_rows': estimate_rows(node, context),
+        }
+
+        if analyze:
+            info = dict(stats.get(id(node), {}))
+            row['rows_in'] = sum(child.get('rows', 0) for child in children)
+            row['rows_out'] = info.pop('rows', None)
+            row['time'] = info.pop('time', 0.0) - sum(child.get('time', 0.0) for child in children)
+            row.update(info)
+
+            columns += [key for key in ['rows_in', 'rows_out', 'time'] + sorted(info) if key not in columns]
+
+        rows.append(row)
+
+    return pd.DataFrame(rows, columns=columns)
+
+
+def format_value(value, name_generator=None):
+    if isinstance(value, Plan):
+        return type(value).__name__
+
+    if isinstance(value, (list, tuple)):
+        return '[{}]'.format(', '.join(format_value(item, name_generator) for item in value))
+
+    if isinstance(value, Unique):
+        return name_generator.get(value) if name_generator is not None else '<unique>'
+
+    if isinstance(value, Record):
+        return format_expr(value, name_generator)
+
+    return str(value)
+
+
+format_expr = m.RuleSet(name='format_expr')
+
+
+@format_expr.rule(m.instanceof(a.Name))
+def format_name(format_expr, node, name_generator):
+    return format_value(node.name, name_generator)
+
+
+@format_expr.rule(m.instanceof(a.InternalName))
+def format_internal_name(format_expr, node, name_generator):
+    return format_value(node.name, name_generator)
+
+
+@format_expr.rule(m.instanceof((a.Integer, a.Float, a.String, a.Bool)))
+def format_literal(format_expr, node, name_generator):
+    return node.value
+
+
+@format_expr.rule(m.instanceof(a.Null))
+def format_null(format_expr, node, name_generator):
+    return 'null'
+
+
+@format_expr.rule(m.instanceof(a.WildCard))
+def format_wildcard(format_expr, node, name_generator):
+    return '*' if node.table is None else '{}.*'.format(node.table)
+
+
+@format_expr.rule(m.instanceof(a.Column))
+def format_column(format_expr, node, name_generator):
+    value = format_expr(node.value, name_generator)
+    alias = format_value(node.alias, name_generator)
+    return value if value == alias else '{} as {}'.format(value, alias)
+
+
+@format_expr.rule(m.instanceof(a.BinaryOp))
+def format_binary_op(format_expr, node, name_generator):
+    return '({} {} {})'.format(
+        format_expr(node.left, name_generator), node.op, format_expr(node.right, name_generator),
+    )
+
+
+@format_expr.rule(m.instanceof(a.UnaryOp))
+def format_unary_op(format_expr, node, name_generator):
+    sep = ' ' if node.op == 'not' else ''
+    return '({}{}{})'.format(node.op, sep, format_expr(node.arg, name_generator))
+
+
+@format_expr.rule(m.instanceof((a.Call, a.CallSetFunction)))
+def format_call(format_expr, node, name_generator):
+    return '{}({})'.format(node.func, ', '.join(format_expr(arg, name_generator) for arg in node.args))
+
+
+@format_expr.rule(m.instanceof(a.CaseExpression))
+def format_case_expression(format_expr, node, name_generator):
+    parts = ['case']
+
+    for case in node.cases:
+        parts.extend([
+            'when', format_expr(case.condition, name_generator),
+            'then', format_expr(case.result, name_generator),
+        ])
+
+    if node.else_ is not None:
+        parts.extend(['else', format_expr(node.else_, name_generator)])
+
+    parts.append('end')
+    return ' '.join(parts)
+
+
+@format_expr.rule(m.instanceof(a.OrderBy))
+def format_order_by(format_expr, node, name_generator):
+    return '{} {}'.format(format_expr(node.value, name_generator), node.order)
+
+
+@format_expr.rule(m.wildcard)
+def format_other(format_expr, node, name_generator):
+    return repr(node)
+
+
+def normalize_columns(table_columns, columns):
+    result = []
+
+    for col in columns:
+        # TODO: expand `.*` style columns
+        if isinstance(col, a.WildCard):
+            if col.table is None:
+                result.extend(a.InternalName(c) for c in table_columns)
+
+            else:
+                result.extend(
+                    a.InternalName(c)
+                    for c in table_columns if column_get_table(c) == col.table
+                )
+
+        elif isinstance(col, a.Column):
+            alias = get_alias(col)
+            # make sure a column always has a name
+            result.append(col.update(alias=alias))
+
+        else:
+            raise ValueError('cannot normalize {}'.format(col))
+
+    return result
+
+
+def normalize_group_by(table_columns, columns, group_by):
+    """
+    Different cases:
+
+    1. a existing column is selected
+    2. alias of selected expression is used as in group by
+    3. a group by expression is selected verbatim
+
+    The strategy is to transform case 2 into case 3 and then replace all
+    occurrences of the group-by expression by an anonymous alias that is filled
+    while grouping. Also, prefer case 1 over case 2.
+    """
+    if group_by is None:
+        return []
+
+    aliases = {col.alias: col.value for col in columns if col.alias is not None}
+
+    # replace integers by the corresponding one-based column
+    group_by = [
+        col if not isinstance(col, a.Integer) else columns[int(col.value) - 1].value
+        for col in group_by
+    ]
+
+    matcher = m.any(
+        m.map_capture(
+            lambda name: a.Column(a.Name(name), alias=name),
+            m.record(a.Name, m.capture(internal_column(table_columns))),
+        ),
+        m.map_capture(
+            # note call to to_internal_col is required to handle table.column refs
+            lambda name: a.Column(aliases[name], alias=to_internal_col(name)),
+            m.record(a.Name, m.capture(m.verb(*aliases))),
+        ),
+        m.map_capture(
+            lambda value: a.Column(value, alias=Unique()),
+            m.capture(m.pred(lambda obj: type(obj) is not a.Name)),
+        )
+    )
+
+    normalized = []
+    for expr in group_by:
+        match = m.match(expr, matcher)
+
+        if not match:
+            raise ValueError('cannot handle %s', expr)
+
+        normalized.append(match[0])
+
+    return normalized
+
+
+def sort(table, values, model):
+    names, ascending = sort_keys(table, values)
+    return model.sort_values(table, names, ascending=ascending)
+
+
+def sort_keys(table, values):
+    """Resolve the values of an order-by clause into column names and directions."""
+    if not m.match(values, m.rep(
+        m.record(
+            a.OrderBy,
+            m.any(
+                m.record(a.Integer, m.wildcard),
+                m.record(a.Name, m.wildcard),
+            ),
+            m.verb('desc', 'asc')
+        )
+    )):
+        raise ValueError('cannot sort by: {}'.format(values))
+
+    names = []
+    ascending = []
+    for val in values:
+        if isinstance(val.value, a.Integer):
+            names += [table.columns[int(val.value.value) - 1]]
+
+        else:
+            names += [normalize_col_ref(val.value.name, table.columns)]
+
+        ascending += [val.order == 'asc']
+
+    return names, ascending
+
+
+@m.RuleSet.make(name='aggregate_split')
+def aggregate_split(aggregate_split, node, group_by):
+    group_by_map = {col.value: a.Name(col.alias) for col in group_by}
+    if node in group_by_map:
+        return SplitResult([(0, group_by_map[node])])
+
+    return aggregate_split.apply_rules(node, group_by)
+
+
+@aggregate_split.rule(m.instanceof(a.Column))
+def aggregate_split_column(aggregate_split, node, group_by):
+    alias = get_alias(node)
+
+    result = aggregate_split(node.value, group_by)
+    post, agg, pre = result.by_levels(2)
+
+    post, = post
+    post = [a.Column(post, alias=alias)]
+    return SplitResult.from_levels(post, agg, pre)
+
+
+@aggregate_split.rule(m.instanceof(a.Name))
+def aggregate_split_name(aggregate_split, node, group_by):
+    return SplitResult([(0, node)])
+
+
+@aggregate_split.rule(m.instanceof(a.CallSetFunction))
+def aggregate_split_call_set_function(aggregate_split, node, group_by):
+    # replace count(*) by count(1)
+    if node.func.lower() == 'count' and node.args == (a.WildCard(),):
+        node = a.CallSetFunction('count', (a.Integer('1'),))
+
+    ids = [Unique() for _ in node.args]
+    self_id = Unique()
+    deferred_args = [a.Name(id) for id in ids]
+
+    result = SplitResult()
+    result.extend((2, a.Column(arg, alias=id)) for arg, id in zip(node.args, ids))
+    result.append((1, a.Column(node.update(args=deferred_args), alias=self_id)))
+    result.append((0, a.Name(self_id)))
+
+    return result
+
+
+class SplitResult(list):
+    @classmethod
+    def from_levels(cls, *levels):
+        return cls(
+            (level, item)
+            for level, items in enumerate(levels)
+            for item in items
+        )
+
+    @classmethod
+    def chain(cls, iterable):
+        return cls(it.chain.from_iterable(iterable))
+
+    def promote(self):
+        return SplitResult((level + 1, obj) for level, obj in self)
+
+    def by_levels(self, maxlevel):
+        r = {}
+
+        for level, obj in self:
+            r.setdefault(level, []).append(obj)
+
+        assert max(r) <= maxlevel
+
+        return tuple(r.get(level, []) for level in range(maxlevel + 1))
+
+
+def get_alias(col_node):
+    alias, = m.match(col_node, m.any(
+        m.record(a.Column, alias=m.capture(m.ne(None))),
+        m.record(a.Column, value=m.record(a.Name, m.capture(m.wildcard)), alias=m.eq(None)),
+        m.capture(m.lit(Unique())),
+    ))
+    return to_internal_col(alias)
@@ -0,0 +1,151 @@
+"""Constant folding and simplification of expressions.
+
+Constant sub-expressions are evaluated once with the model, so the result is
+the same as when evaluating them during execution.
+"""
+from __future__ import print_function, division, absolute_import
+
+from ..parser import ast as a
+from ..parser._parser import literal
+from ..util import _monadic as m
+
+literal_types = (a.Integer, a.Float, a.String, a.Bool, a.Null)
+
+
+#: simplify an expression, the model is used to evaluate constant expressions
+simplify = m.RuleSet(name='simplify')
+
+
+@simplify.rule(m.instanceof(a.BinaryOp))
+def simplify_binary_op(simplify, expr, model):
+    left = simplify(expr.left, model)
+    right = simplify(expr.right, model)
+
+    if expr.op in {'and', 'or'}:
+        # true is the identity of and, false of or
+        identity = expr.op == 'and'
+
+        if is_bool(left):
+            return right if is_bool(left, identity) else left
+
+        if is_bool(right):
+            return left if is_bool(right, identity) else right
+
+    expr = _update(expr, left=left, right=right)
+
+    if is_literal(left) and is_literal(right):
+        return fold(expr, model)
+
+    return expr
+
+
+@simplify.rule(m.instanceof(a.UnaryOp))
+def simplify_unary_op(simplify, expr, model):
+    arg = simplify(expr.arg, model)
+
+    # double negation
+    if expr.op in {'not', '-', '~'} and isinstance(arg, a.UnaryOp) and arg.op == expr.op:
+        return arg.arg
+
+    if expr.op == 'not':
+        # NOTE: do not fold, python's ~ does not negate bools
+        if is_bool(arg):
+            return a.Bool('false' if is_bool(arg, True) else 'true')
+
+        if isinstance(arg, a.Null):
+            return arg
+
+    elif is_literal(arg):
+        return fold(_update(expr, arg=arg), model)
+
+    return _update(expr, arg=arg)
+
+
+@simplify.rule(m.instanceof(a.Call))
+def simplify_call(simplify, expr, model):
+    args = tuple(simplify(arg, model) for arg in expr.args)
+    expr = _update(expr, args=args)
+
+    if expr.func.lower() in model.functions and all(is_literal(arg) for arg in args):
+        return fold(expr, model)
+
+    return expr
+
+
+@simplify.rule(m.instanceof(a.Cast))
+def simplify_cast(simplify, expr, model):
+    value = simplify(expr.value, model)
+    expr = _update(expr, value=value)
+    return fold(expr, model) if is_literal(value) else expr
+
+
+@simplify.rule(m.instanceof(a.CaseExpression))
+def simplify_case_expression(simplify, expr, model):
+    cases = []
+    else_ = simplify(expr.else_, model) if expr.else_ is not None else None
+
+    for case in expr.cases:
+        condition = simplify(case.condition, model)
+        result = simplify(case.result, model)
+
+        # branches that never match
+        if is_bool(condition, False) or isinstance(condition, a.Null):
+            continue
+
+        # branches that always match replace all later branches
+        if is_bool(condition, True):
+            else_ = result
+            break
+
+        cases.append(_update(case, condition=condition, result=result))
+
+    if not cases:
+        return else_ if else_ is not None else a.Null()
+
+    if len(cases) == len(expr.cases) and all(new is old for new, old in zip(cases, expr.cases)):
+        cases = expr.cases
+
+    return _update(expr, cases=cases, else_=else_)
+
+
+@simplify.rule(m.wildcard)
+def simplify_other(simplify, expr, model):
+    return expr
+
+
+def fold(expr, model):
+    """Replace a constant expression by its value.
+
+    If the expression cannot be evaluated or the result cannot be expressed
+    as a literal, the expression is returned unchanged and any errors are
+    raised during execution.
+    """
+    try:
+        return literal(model.eval(expr, None, model, None))
+
+    except Exception:
+        return expr
+
+
+def is_literal(expr):
+    return isinstance(expr, literal_types)
+
+
+def is_bool(expr, value=None):
+    """Check whether an expression is a boolean literal, optionally with the given value."""
+    if not isinstance(expr, a.Bool):
+        return False
+
+    return value is None or (expr.value.lower() == 'true') == value
+
+
+def is_true(expr):
+    return is_bool(expr, True)
+
+
+def _update(expr, **kwargs):
+    """Only copy an expression if any of its fields changed."""
+    if all(getattr(expr, key) is value for key, value in kwargs.items()):
+        return expr
+
+    return expr.update(**kwargs)
@@ -0,0 +1,249 @@
+"""Statistics of the tables in a scope, used by the optimizer.
+
+Statistics are collected per partition and merged. The number of distinct
+values is estimated with a k-minimum-values sketch of the hashed values,
+which can be merged without access to the values themselves.
+"""
+from __future__ import print_function, division, absolute_import
+
+import weakref
+
+try:
+    from collections.abc import MutableMapping
+
+except ImportError:
+    from collections import MutableMapping
+
+import dask
+import dask.dataframe as dd
+import numpy as np
+import pandas as pd
+
+#: the number of hashes kept per column to estimate the number of distinct values
+sketch_size = 1024
+
+
+class Scope(dict):
+    """A mapping of table names to dataframes with statistics of the tables.
+
+    :ivar Statistics stats:
+        the statistics of the tables in this scope. Copies of the scope share
+        their statistics.
+    """
+    def __init__(self, *args, **kwargs):
+        super(Scope, self).__init__(*args, **kwargs)
+        self.stats = Statistics()
+
+    def copy(self):
+        result = Scope(self)
+        result.stats = self.stats
+        return result
+
+
+class ScopeView(MutableMapping):
+    """A scope with statistics, that reads and writes the tables of another mapping.
+
+    Executors use it to keep the tables in the mapping passed by the caller.
+    Copies are :class:`Scope` objects sharing the statistics.
+    """
+    def __init__(self, tables, stats):
+        self.tables = tables
+        self.stats = stats
+
+    def __getitem__(self, name):
+        return self.tables[name]
+
+    def __setitem__(self, name, table):
+        self.tables[name] = table
+
+    def __delitem__(self, name):
+        del self.tables[name]
+
+    def __iter__(self):
+        return iter(self.tables)
+
+    def __len__(self):
+        return len(self.tables)
+
+    def copy(self):
+        result = Scope(self.tables)
+        result.stats = self.stats
+        return result
+
+
+class Statistics(object):
+    """The statistics of tables, see :class:`TableStats`.
+
+    Statistics are only returned for the same table object they were
+    collected for, replaced tables need to be analyzed again.
+    """
+    def __init__(self):
+        self.tables = {}
+
+    def analyze(self, name, table):
+        """Collect and store the statistics of a table."""
+        stats = collect_stats(table)
+        self.tables[name] = weakref.ref(table), stats
+        return stats
+
+    def get(self, name, table, lazy=True):
+        """Return the statistics of a table or ``None``.
+
+        :param bool lazy:
+            if True, the statistics of pandas dataframes are collected, if
+            unknown. The statistics of dask dataframes are only collected by
+            :meth:`analyze`.
+        """
+        ref, stats = self.tables.get(name, (None, None))
+
+        if ref is not None and ref() is table:
+            return stats
+
+        if lazy and isinstance(table, pd.DataFrame):
+            return self.analyze(name, table)
+
+        return None
+
+    def invalidate(self, name):
+        self.tables.pop(name, None)
+
+
+class TableStats(object):
+    """The statistics of a table.
+
+    :ivar int rows:
+        the number of rows.
+
+    :ivar int memory:
+        the memory usage in bytes.
+
+    :ivar Mapping[str,ColumnStats] columns:
+        the statistics per column.
+    """
+    def __init__(self, rows, memory, columns):
+        self.rows = rows
+        self.memory = memory
+        self.columns = columns
+
+    def __repr__(self):
+        return 'TableStats(rows={!r}, memory={!r}, columns={!r})'.format(self.rows, self.memory, self.columns)
+
+
+class ColumnStats(object):
+    """The statistics of a column.
+
+    :ivar int rows:
+        the number of rows, including nulls.
+
+    :ivar int nulls:
+        the number of null values.
+
+    :ivar min:
+        the smallest value, ``None`` if unknown or not orderable.
+
+    :ivar max:
+        the largest value, ``None`` if unknown or not orderable.
+
+    :ivar sketch:
+        the smallest hashes of the non-null values, see :func:`distinct_sketch`.
+    """
+    def __init__(self, rows, nulls, min, max, sketch):
+        self.rows = rows
+        self.nulls = nulls
+        self.min = min
+        self.max = max
+        self.sketch = sketch
+
+    @property
+    def distinct(self):
+        """The estimated number of distinct non-null values."""
+        return estimate_distinct(self.sketch)
+
+    @property
+    def null_fraction(self):
+        return self.nulls / self.rows if self.rows else 0.0
+
+    def __repr__(self):
+        return 'ColumnStats(rows={!r}, nulls={!r}, min={!r}, max={!r}, distinct={:.0f})'.format(
+            self.rows, self.nulls, self.min, self.max, self.distinct,
+        )
+
+
+def collect_stats(table):
+    """Collect the statistics of a pandas or dask dataframe."""
+    if isinstance(table, dd.DataFrame):
+        parts = dask.compute(*[dask.delayed(partition_stats)(part) for part in table.to_delayed()])
+        return merge_stats(parts)
+
+    return partition_stats(table)
+
+
+def partition_stats(df):
+    columns = {}
+
+    for name in df.columns:
+        values = df[name]
+        non_null = values.dropna()
+        orderable = values.dtype.kind in 'biufmM' and len(non_null)
+
+        columns[name] = ColumnStats(
+            rows=len(values),
+            nulls=len(values) - len(non_null),
+            min=non_null.min() if orderable else None,
+            max=non_null.max() if orderable else None,
+            sketch=distinct_sketch(non_null.values),
+        )
+
+    return TableStats(len(df), int(df.memory_usage(deep=True).sum()), columns)
+
+
+def merge_stats(parts):
+    """Merge the statistics of the partitions of a table."""
+    parts = list(parts)
+    columns = {}
+
+    for name in parts[0].columns:
+        column_parts = [part.columns[name] for part in parts]
+        mins = [part.min for part in column_parts if part.min is not None]
+        maxs = [part.max for part in column_parts if part.max is not None]
+
+        columns[name] = ColumnStats(
+            rows=sum(part.rows for part in column_parts),
+            nulls=sum(part.nulls for part in column_parts),
+            min=min(mins) if mins else None,
+            max=max(maxs) if maxs else None,
+            sketch=merge_sketches([part.sketch for part in column_parts]),
+        )
+
+    return TableStats(sum(part.rows for part in parts), sum(part.memory for part in parts), columns)
+
+
+def distinct_sketch(values, k=None):
+    """Return the ``k`` smallest distinct hashes of the values, in ascending order."""
+    if k is None:
+        k = sketch_size
+
+    return np.unique(pd.util.hash_array(np.asarray(values)))[:k]
+
+
+def merge_sketches(sketches, k=None):
+    if k is None:
+        k = sketch_size
+
+    return np.unique(np.concatenate(sketches))[:k]
+
+
+def estimate_distinct(sketch, k=None):
+    """Estimate the number of distinct values from a sketch.
+
+    If the sketch is full, the number is estimated from the largest kept
+    hash: for ``n`` uniform hashes, the k-th smallest one is expected at
+    ``k / n`` of the hash range.
+    """
+    if k is None:
+        k = sketch_size
+
+    if len(sketch) < k:
+        return float(len(sketch))
+
+    return (k - 1) / (float(sketch[k - 1]) / 2.0 ** 64)
@@ -179,7 +179,7 @@ class Unique(object):
 
 
 def all_unique(obj):
-    return [child for child in walk(obj) if isinstance(child, Unique)]
+    return list(walk(obj, Unique))
 
 
 class UniqueNameGenerator(object):
@@ -261,10 +261,10 @@ def _flatten_join_condition(condition, name_generator):
     if not isinstance(condition, a.BinaryOp):
         raise ValueError("can only handle equality joins")
 
-    if condition.op == 'AND':
+    if condition.op == 'and':
         return it.chain(
-            _flatten_join_condition(condition.left),
-            _flatten_join_condition(condition.right),
+            _flatten_join_condition(condition.left, name_generator),
+            _flatten_join_condition(condition.right, name_generator),
         )
 
     elif condition.op == '=':
@@ -358,6 +358,69 @@ def prepare_join(op, name_generator, left_columns, right_columns):
     )
 
 
+def prepare_band_join(op, name_generator, left_columns, right_columns):
+    """Prepare a join on inequality conditions, e.g., range or interval joins.
+
+    Return ``None`` if the tables can be joined by equality conditions or if no
+    condition compares expressions of the two tables with ``<``, ``<=``,
+    ``>``, or ``>=``. Otherwise, return a tuple of
+
+    - ``origin``: the table to sort, either ``Origin.left`` or ``Origin.right``
+    - ``key``: the expression of the sorted table to sort by
+    - ``bounds``: a list of pairs ``(op, expr)``, with expressions of the other
+      table, such that matching rows satisfy ``key op expr``
+
+    The expression bounded by most conditions, ideally from both sides, is used
+    as the key. The join condition itself still needs to be applied to the
+    candidate rows.
+    """
+    candidates = []
+
+    for op in flatten_ands(op):
+        if not isinstance(op, a.BinaryOp) or op.op not in {'=', '<', '<=', '>', '>='}:
+            continue
+
+        try:
+            left_origin = determine_origin(op.left, name_generator, left_columns, right_columns)
+            right_origin = determine_origin(op.right, name_generator, left_columns, right_columns)
+
+        except NotImplementedError:
+            continue
+
+        if {left_origin, right_origin} != {Origin.left, Origin.right}:
+            continue
+
+        if op.op == '=':
+            return None
+
+        candidates.append((left_origin, op.left, op.op, op.right))
+        candidates.append((right_origin, op.right, _flipped_comparisons[op.op], op.left))
+
+    # group the bounds by the bounded expression
+    keys = []
+
+    for origin, key, op, expr in candidates:
+        for group in keys:
+            if group[0] == origin and group[1] == key:
+                group[2].append((op, expr))
+                break
+
+        else:
+            keys.append((origin, key, [(op, expr)]))
+
+    if not keys:
+        return None
+
+    def score(group):
+        ops = {op[:1] for op, _ in group[2]}
+        return len(ops), len(group[2])
+
+    return max(keys, key=score)
+
+
+_flipped_comparisons = {'<': '>', '<=': '>=', '>': '<', '>=': '<='}
+
+
 def by_origin(origin, left, right):
     if origin is Origin.left:
         return left
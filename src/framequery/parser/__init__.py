@@ -1,7 +1,7 @@
 from __future__ import print_function, division, absolute_import
 
-from ._parser import tokenize, parse
+from ._parser import bind, tokenize, parse, parse_cache
 from . import ast
 
 
-__all__ = ['ast', 'parse', 'tokenize']
+__all__ = ['ast', 'bind', 'parse', 'parse_cache', 'tokenize']
@@ -4,39 +4,189 @@ import re
 import string as _string
 
 from framequery.util import _monadic as m
+from framequery.util._cache import LRUCache
+from framequery.util._funcs import escape
+from framequery.util._record import rewrite
 from . import ast as a
 
+#: the cache of parsed queries used by :func:`parse`, keyed by parser, query
+#: text, and paramstyle
+parse_cache = LRUCache(maxsize=512)
 
-def tokenize(query):
-    """Tokenize the query string."""
-    parts, rest, d = splitter(query)
+paramstyles = {None, 'pyformat'}
 
-    if rest != '':
-        raise ValueError('extra tokens: {!r}, {}'.format(rest, d))
 
-    return parts
+def tokenize(query, paramstyle=None):
+    """Tokenize the query string.
 
+    :param Optional[str] paramstyle:
+        if ``'pyformat'``, ``%(name)s`` and ``%s`` are tokenized as bind
+        parameters and ``%%`` as ``%``, also inside strings. Positional
+        parameters are numbered in order of appearance, i.e., as ``%0s``,
+        ``%1s``, ...
+    """
+    return [token for token, _ in iter_tokens(query, paramstyle)]
+
+
+def iter_tokens(query, paramstyle=None):
+    """Iterate over the tokens of the query as ``(token, offset)`` pairs.
+
+    Comments and whitespace are skipped, keywords are lower cased. The
+    ``offset`` is the position of the token in the query string.
+    """
+    if paramstyle not in paramstyles:
+        raise ValueError('unsupported paramstyle: {!r}'.format(paramstyle))
+
+    pos = 0
+    end = len(query)
+    n_positional = 0
+
+    while pos < end:
+        if paramstyle == 'pyformat' and query[pos] == '%':
+            match = _pyformat_pattern.match(query, pos)
+
+            if match is None:
+                raise ValueError('invalid parameter: {!r}, at offset {}'.format(query[pos:], pos))
+
+            token = match.group(0)
+
+            if token == '%%':
+                token = '%'
+
+            elif token == '%s':
+                token = '%{}s'.format(n_positional)
+                n_positional += 1
+
+            yield token, pos
+            pos = match.end()
+            continue
+
+        if query[pos] in _quotes:
+            token_end = _scan_string(query, pos)
+
+            if token_end < 0:
+                raise ValueError('unterminated string: {!r}, at offset {}'.format(query[pos:], pos))
+
+            token = query[pos:token_end]
+
+            if paramstyle == 'pyformat':
+                token = token.replace('%%', '%')
+
+            yield token, pos
+            pos = token_end
+            continue
+
+        match = _token_pattern.match(query, pos)
+
+        if match is None:
+            raise ValueError('extra tokens: {!r}, at offset {}'.format(query[pos:], pos))
+
+        kind = match.lastgroup
+        token = match.group(kind)
+
+        if kind == 'name':
+            # keywords end at the first non-ascii character
+            word = _ascii_word_pattern.match(token).group(0)
+
+            if word.lower() in keywords:
+                token = word.lower()
 
-def parse(query, what=None):
+            yield token, pos
+            pos += len(token)
+            continue
+
+        if kind in _tokens_kinds:
+            yield token, pos
+
+        pos = match.end()
+
+
+def _scan_string(query, pos):
+    """Return the end of the sql-escaped string starting at pos or -1.
+
+    Quotes are escaped by repeating them.
+    """
+    quote = query[pos]
+    idx = pos
+
+    while True:
+        idx = query.find(quote, idx + 1)
+
+        if idx < 0:
+            return -1
+
+        # if the next char is another quote, this is an escape quote
+        if query[idx + 1:idx + 2] == quote:
+            idx += 1
+
+        else:
+            return idx + 1
+
+
+def parse(query, what=None, cache=True, packrat=False, debug=False, paramstyle=None):
     """Parse a query into an ``framequery.ast`` object.
 
+    Parsed queries are kept in :data:`parse_cache`, repeated calls with the same
+    query text return the same AST object without tokenizing or parsing again.
+    AST objects are shared between callers and must not be modified.
+
     :param str query:
         the query to parse
 
+    :param bool cache:
+        if False, bypass the cache.
+
+    :param bool packrat:
+        if True, memoize intermediate results while parsing. This guarantees
+        linear parse times for deeply nested expressions, but increases the
+        memory usage while parsing.
+
+    :param bool debug:
+        if True, collect debug information while parsing. By default, queries
+        are parsed without debug information and the parser is only re-run
+        with debug information to report errors.
+
+    :param Optional[str] paramstyle:
+        if ``'pyformat'``, parse ``%(name)s`` and ``%s`` as
+        :class:`framequery.parser.ast.Placeholder` nodes, see :func:`bind`.
+
     :returns:
         an AST object or raises an exception if the query could not be parsed.
     """
+    if not cache:
+        return _parse(query, what, packrat, debug, paramstyle)
+
+    return parse_cache.get(
+        (what, query, paramstyle),
+        lambda: _parse(query, what, packrat, debug, paramstyle),
+    )
+
+
+def _parse(query, what=None, packrat=False, debug=False, paramstyle=None):
+    if packrat:
+        with m.packrat():
+            return _parse(query, what, debug=debug, paramstyle=paramstyle)
+
     if what is not None:
         used_parser = constructors[what] if what in constructors else what
 
     else:
         used_parser = parser
 
-    tokens = tokenize(query)
-    ast, rest, debug = used_parser(tokens)
+    tokens = tokenize(query, paramstyle)
+
+    if not debug:
+        ast, rest, _ = m.fast(used_parser)(tokens)
+
+        if ast is None or rest:
+            # re-run with debug information to build the error message
+            return _parse(query, what, debug=True, paramstyle=paramstyle)
+
+    else:
+        ast, rest, debug_info = used_parser(tokens)
 
-    if rest:
-        raise ValueError('extra tokens: {}\n{}'.format(tokens, '\n'.join(m.format_debug(debug))))
+        if rest:
+            raise ValueError('extra tokens: {}\n{}'.format(tokens, '\n'.join(m.format_debug(debug_info))))
 
     if len(ast) != 1:
         raise RuntimeError('internal parser error')
@@ -44,6 +194,59 @@ def parse(query, what=None):
     return ast[0]
 
 
+def bind(ast, params=None):
+    """Replace the placeholders of a parsed query by literals.
+
+    :param ast:
+        the ast with :class:`framequery.parser.ast.Placeholder` nodes, see
+        :func:`parse`.
+
+    :param Union[Mapping,Sequence] params:
+        the values of named parameters as a mapping or the values of positional
+        parameters as a sequence. Supported values are ``None``, strings,
+        bools, ints, and floats.
+
+    :returns:
+        the ast with all placeholders replaced.
+    """
+    def bind_placeholder(node):
+        if not isinstance(node, a.Placeholder):
+            return node
+
+        return literal(get_parameter(params, node.name))
+
+    return rewrite(ast, bind_placeholder)
+
+
+def get_parameter(params, name):
+    try:
+        return params[name]
+
+    except (KeyError, IndexError, TypeError):
+        raise ValueError('missing parameter {!r}'.format(name))
+
+
+def literal(val):
+    """Build the ast node of a python value."""
+    if val is None:
+        return a.Null()
+
+    elif isinstance(val, str):
+        return a.String(escape(val))
+
+    elif isinstance(val, bool):
+        return a.Bool('true' if val else 'false')
+
+    elif isinstance(val, int):
+        return a.Integer(str(val))
+
+    elif isinstance(val, float):
+        return a.Float(repr(val))
+
+    else:
+        raise NotImplementedError('cannot bind parameter of type %s' % type(val))
+
+
 def verbatim_token(*p):
     return m.one(m.verbatim(*p))
 
@@ -56,21 +259,9 @@ def svtok(*p):
     return m.ignore(m.one(m.verbatim(*p)))
 
 
-def full_word(matcher):
-    non_terminating = (
-        _string.ascii_letters +
-        _string.digits +
-        '_'
-    )
-
-    @m._delegate(matcher, where='full_word')
-    def full_word_impl(matches, s, d, seq):
-        if not s or s[0] not in non_terminating:
-            return matches, s, d
-
-        return None, seq, dict(d, status=m.Status.failure)
-
-    return full_word_impl
+def nonreserved_token(*p):
+    """Match non-reserved keywords, which the tokenizer does not lower case."""
+    return m.pred(lambda v: v.lower() in p)
 
 
 def base_string(quote="'"):
@@ -85,22 +276,14 @@ def base_string(quote="'"):
 
         return [s], seq[1:], m.Status.succeed()
 
-    return base_string_impl
-
-
-def build_binary_tree(seq):
-    "transform `[[a, b, c, d, e]]` -> `[BinaryOp(b, a, BinaryOp(d, c, e))]`"
-    def _impl(seq):
-        assert len(seq) % 2 == 1
+    def base_string_fast(seq):
+        if not seq or seq[0][0] != quote or seq[0][-1] != quote:
+            return None, seq, None
 
-        if len(seq) == 1:
-            return seq[0]
+        return [seq[0]], seq[1:], None
 
-        else:
-            return a.BinaryOp(seq[1], seq[0], _impl(seq[2:]))
-
-    assert len(seq) == 1
-    return [_impl(seq[0])]
+    base_string_impl.fast = base_string_fast
+    return base_string_impl
 
 
 def build_joins(seq):
@@ -119,22 +302,127 @@ def build_joins(seq):
     return [current]
 
 
-def binary_op(value, *ops):
-    return m.transform(build_binary_tree, m.list_of(verbatim_token(*ops), value))
+def operator_precedence(operand, prefix_operators, infix_operators):
+    """Parse operator expressions by precedence climbing.
 
+    :param operand:
+        the parser for the operands, i.e., the expressions without operators.
 
-def unary_op(value, *ops):
-    return m.any(
-        m.construct(a.UnaryOp, m.keyword(op=verbatim_token(*ops)), m.keyword(arg=value)),
-        value,
-    )
+    :param prefix_operators:
+        a mapping of unary operators to their binding power.
 
+    :param infix_operators:
+        a mapping of binary operators to their binding power. Operators
+        consisting of two tokens, e.g., ``'not like'``, are given with a space.
 
-def compound_token(*parts):
-    return m.transform(
-        lambda s: [' '.join(s)],
-        m.sequence(*[verbatim_token(p) for p in parts]),
-    )
+    Higher binding powers bind tighter, binary operators are left associative.
+    Chains of operators with the same binding power are parsed iteratively.
+    """
+    def parse_infix(seq):
+        if not seq:
+            return None, 0
+
+        op = seq[0]
+
+        if op == 'not' and len(seq) > 1:
+            op = 'not ' + seq[1]
+            return (op, 2) if op in infix_operators else (None, 0)
+
+        return (op, 1) if op in infix_operators else (None, 0)
+
+    def build_parse_expression(operand):
+        def parse_expression(seq, min_power):
+            op = seq[0] if seq else None
+
+            if op in prefix_operators and prefix_operators[op] >= min_power:
+                arg, seq, d = parse_expression(seq[1:], prefix_operators[op] + 1)
+
+                if arg is None:
+                    return None, seq, d
+
+                left = a.UnaryOp(op, arg)
+
+            else:
+                left, seq, d = operand(seq)
+
+                if left is None:
+                    return None, seq, d
+
+                left, = left
+
+            while True:
+                op, n_tokens = parse_infix(seq)
+
+                if op is None or infix_operators[op] < min_power:
+                    break
+
+                if op in between_operators:
+                    bounds, rest = parse_between(seq[n_tokens:], infix_operators[op] + 1)
+
+                    if bounds is None:
+                        break
+
+                    left, seq = between(op, left, *bounds), rest
+                    continue
+
+                right, rest, _ = parse_expression(seq[n_tokens:], infix_operators[op] + 1)
+
+                # leave the operator unconsumed, if its argument cannot be parsed
+                if right is None:
+                    break
+
+                left, seq = a.BinaryOp(op, left, right), rest
+
+            return left, seq, d
+
+        def parse_between(seq, min_power):
+            low, rest, _ = parse_expression(seq, min_power)
+
+            if low is None or rest[:1] != ['and']:
+                return None, seq
+
+            high, rest, _ = parse_expression(rest[1:], min_power)
+
+            if high is None:
+                return None, seq
+
+            return (low, high), rest
+
+        return parse_expression
+
+    parse_expression = build_parse_expression(operand)
+    parse_expression_fast = build_parse_expression(m.fast(operand))
+
+    def operator_precedence_impl(seq):
+        result, rest, d = parse_expression(seq, 0)
+
+        if result is None:
+            return None, seq, m.Status.fail(children=[d], where='operator_precedence')
+
+        return [result], rest, m.Status.succeed(children=[d], where='operator_precedence')
+
+    def operator_precedence_fast(seq):
+        result, rest, _ = parse_expression_fast(seq, 0)
+
+        if result is None:
+            return None, seq, None
+
+        return [result], rest, None
+
+    operator_precedence_impl.fast = operator_precedence_fast
+    return operator_precedence_impl
+
+
+#: ternary operators of the form ``x between low and high``
+between_operators = {'between', 'not between'}
+
+
+def between(op, value, low, high):
+    """Express a between operator by comparisons."""
+    if op == 'between':
+        return a.BinaryOp('and', a.BinaryOp('>=', value, low), a.BinaryOp('<=', value, high))
+
+    return a.BinaryOp('or', a.BinaryOp('<', value, low), a.BinaryOp('>', value, high))
 
 
 def make_special_call(name, *args):
@@ -154,6 +442,7 @@ keywords = {
     'and',
     'all',
     'as',
+    'between',
     'both',
     'by',
     'case',
@@ -216,6 +505,11 @@ bool_ = m.construct(a.Bool, m.keyword(value=verbatim_token('true', 'false')))
 
 string = m.construct(a.String, m.keyword(value=base_string()))
 
+placeholder = m.map(
+    lambda token: a.Placeholder(int(token[1:-1]) if token[1:-1].isdigit() else token[2:-2]),
+    m.pred(lambda v: v[:1] == '%' and len(v) > 1),
+)
+
 base_name = m.any(
     m.pred(lambda v: v not in keywords and re.match(name_format, v)),
     base_string('"'),
@@ -231,17 +525,108 @@ name = m.transform(
 )
 
 
+#: binding powers of unary operators, higher values bind tighter
+prefix_operators = {
+    'not': 3,
+    '~': 6,
+    '+': 12, '-': 12,
+}
+
+#: binding powers of binary operators, higher values bind tighter
+infix_operators = {
+    'or': 1,
+    'and': 2,
+    '=': 4, '!=': 4, '>': 4, '<': 4, '>=': 4, '<=': 4, '<>': 4, '!>': 4, '!<': 4,
+    'like': 5, 'not like': 5, 'in': 5, 'not in': 5, 'between': 5, 'not between': 5,
+    '#': 7, '<<': 7, '>>': 7,
+    '+': 8, '-': 8, '&': 8, '|': 8,
+    '||': 9,
+    '*': 10, '/': 10, '%': 10,
+    '^': 11,
+}
+
+
+def operand_kind(seq):
+    """Classify the first tokens of an operand to select the candidate parsers."""
+    token = seq[0]
+
+    if token in {'(', 'case', 'cast', 'null', 'true', 'false'}:
+        return token
+
+    # exists is not reserved, it is only a keyword before a subquery
+    if token.lower() == 'exists' and seq[1:2] == ['(']:
+        return 'exists'
+
+    if token[:1] == "'":
+        return 'string'
+
+    if token[:1] == '%' and len(token) > 1:
+        return 'placeholder'
+
+    if token[:1] in _number_start:
+        return 'number'
+
+    # all function calls require an opening parenthesis after the name
+    if seq[1:2] != ['(']:
+        return 'name'
+
+    return None
+
+
+_number_start = set(_string.digits + '.')
+
+
+def dispatch(kind, alternatives, default):
+    """Only try the alternatives registered for the kind of the input.
+
+    Within each kind, the alternatives are tried in order, as in ``m.any``.
+    """
+    alternatives = {k: m.any(*v) for k, v in alternatives.items()}
+    default = m.any(*default)
+
+    def dispatch_impl(seq):
+        if not seq:
+            return default(seq)
+
+        return alternatives.get(kind(seq), default)(seq)
+
+    fast_alternatives = {k: m.fast(v) for k, v in alternatives.items()}
+    fast_default = m.fast(default)
+
+    def dispatch_fast(seq):
+        if not seq:
+            return fast_default(seq)
+
+        return fast_alternatives.get(kind(seq), fast_default)(seq)
+
+    dispatch_impl.fast = dispatch_fast
+    return dispatch_impl
+
+
 @m.define
 def value(value):
-    value = m.any(
-        m.sequence(svtok('('), value, svtok(')')),
-        case_expression, simplified_case_expression,
-        cast_expression, count_all, call_analytics_function, call_set_function,
-        special_calls, call,
-        null, integer, string, bool_, name, float_
-    )
-
-    value = m.any(
+    value = m.memo(dispatch(
+        operand_kind,
+        {
+            '(': [
+                m.construct(a.SubQuery, svtok('('), m.keyword(query=select), svtok(')')),
+                m.sequence(svtok('('), value, svtok(')')),
+            ],
+            'case': [case_expression, simplified_case_expression],
+            'cast': [cast_expression],
+            'exists': [m.construct(a.Exists, m.ignore(nonreserved_token('exists')), svtok('('), m.keyword(query=select), svtok(')'))],
+            'null': [null],
+            'true': [bool_],
+            'false': [bool_],
+            'string': [string],
+            'number': [integer, float_],
+            'name': [name],
+            'placeholder': [placeholder],
+        },
+        [count_all, call_analytics_function, call_set_function, special_calls, call, name],
+    ))
+
+    value = m.memo(m.any(
         m.construct(
             a.Cast,
             m.keyword(value=value),
@@ -249,32 +634,9 @@ def value(value):
             m.keyword(type=value),
         ),
         value,
-    )
+    ))
 
-    value = unary_op(value, '+', '-')
-    value = binary_op(value, '^')
-    value = binary_op(value, '*', '/', '%')
-    value = binary_op(value, '||')
-    value = binary_op(value, '+', '-', '&', '|')
-    value = binary_op(value, '#', '<<', '>>')
-    value = unary_op(value, '~')
-    value = binary_op(value, '=', '!=', '>', '<', '>=', '<=', '<>', '!>', '!<')
-    value = unary_op(value, 'not')
-    value = binary_op(value, 'and')
-
-    value = m.transform(
-        build_binary_tree,
-        m.list_of(
-            m.any(
-                compound_token('not', 'like'),
-                compound_token('not', 'in'),
-                verbatim_token('in', 'or', 'like'),
-            ),
-            value
-        )
-    )
-
-    return value
+    return operator_precedence(value, prefix_operators, infix_operators)
 
 
 case_expression = m.construct(
@@ -487,10 +849,10 @@ base_select = m.sequence(
         svtok('order'), svtok('by'), m.list_of(svtok(','), order_by_item),
     ))),
     m.optional(m.keyword(limit_clause=m.sequence(
-        svtok('limit'), m.any(integer, m.lit('all')),
+        svtok('limit'), m.any(integer, placeholder, m.lit('all')),
     ))),
     m.optional(m.keyword(offset_clause=m.sequence(
-        svtok('offset'), integer
+        svtok('offset'), m.any(integer, placeholder)
     )))
 )
 
@@ -547,6 +909,19 @@ create_table_as = m.construct(
     m.keyword(query=select),
 )
 
+analyze = m.construct(
+    a.Analyze,
+    m.ignore(nonreserved_token('analyze')),
+    m.keyword(names=m.list_of(svtok(','), name)),
+)
+
+explain = m.construct(
+    lambda query, analyze=None: a.Explain(query, analyze is not None),
+    m.ignore(nonreserved_token('explain')),
+    m.optional(m.keyword(analyze=nonreserved_token('analyze'))),
+    m.keyword(query=select),
+)
+
 
 def show_option(seq):
     if seq[:1] != ['show']:
@@ -561,6 +936,8 @@ parser = m.any(
     copy_to,
     drop_tabe,
     create_table_as,
+    explain,
+    analyze,
     show_option,
 )
 
@@ -575,18 +952,20 @@ constructors[a.Name] = name
 constructors[a.String] = string
 constructors['value'] = value
 
-splitter = m.repeat(
-    m.any(
-        # strip any comments
-        m.ignore(m.regex(r'--.*\n')),
-        # NOTE: do not use str.lower, due to py2 compat
-        m.regex(float_format),
-        m.regex(integer_format),
-        full_word(m.map_verbatim(lambda s: s.lower(), *keywords)),
-        m.map_verbatim(lambda s: s.lower(), *operators),
-        m.regex(name_format),
-        m.ignore(m.regex(r'\s+')),
-        m.string("'"),
-        m.string('"'),
-    )
-)
+# NOTE: the order of the alternatives decides between overlapping tokens,
+# strings are handled separately by _scan_string
+_token_pattern = re.compile('|'.join([
+    r'(?P<comment>--.*\n)',
+    r'(?P<float>{})'.format(float_format),
+    r'(?P<integer>{})'.format(integer_format),
+    r'(?P<name>{})'.format(name_format),
+    r'(?P<operator>{})'.format('|'.join(
+        re.escape(op) for op in sorted(operators, key=len, reverse=True)
+    )),
+    r'(?P<whitespace>\s+)',
+]))
+
+_ascii_word_pattern = re.compile(r'[a-zA-Z0-9_]*')
+_tokens_kinds = {'float', 'integer', 'operator'}
+_quotes = {"'", '"'}
+_pyformat_pattern = re.compile(r'%(\([^)]*\))?s|%%')
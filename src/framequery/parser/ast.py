@@ -90,6 +90,15 @@ class UnaryOp(Record):
     __fields__ = ['op', 'arg']
 
 
+class Exists(Record):
+    """An ``exists (select ...)`` predicate.
+
+    Subqueries in ``in`` predicates are represented as :class:`SubQuery`
+    nodes without alias.
+    """
+    __fields__ = ['query']
+
+
 class Call(Record):
     __fields__ = ['func', 'args']
     __types__ = [str, tuple]
@@ -117,6 +126,23 @@ class Show(Record):
     __types__ = [tuple]
 
 
+class Analyze(Record):
+    """An analyze statement, collecting the statistics of the given tables."""
+    __fields__ = ['names']
+
+
+class Explain(Record):
+    """An explain statement.
+
+    :ivar Select query:
+        the explained query.
+
+    :ivar bool analyze:
+        if True, the query is executed to measure its operators.
+    """
+    __fields__ = ['query', 'analyze']
+
+
 class Cast(Record):
     __fields__ = ['value', 'type']
 
@@ -141,6 +167,16 @@ class Null(Record):
     pass
 
 
+class Placeholder(Record):
+    """A bind parameter of a prepared statement.
+
+    :ivar Union[str,int] name:
+        the key of named parameters or the position of positional parameters.
+
+    """
+    __fields__ = ['name']
+
+
 class Join(Record):
     __fields__ = ['how', 'left', 'right', 'on']
 
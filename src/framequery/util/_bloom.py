@@ -0,0 +1,77 @@
+"""A Bloom filter of 64 bit hashes, e.g., computed with ``pd.util.hash_array``."""
+from __future__ import print_function, division, absolute_import
+
+import math
+
+import numpy as np
+import pandas as pd
+
+
+class BloomFilter(object):
+    """A set of hashes, that may report false positives, but no false negatives.
+
+    The bits are stored packed in a numpy array, whose size is a power of
+    two. The positions of each hash are derived from its lower and upper 32
+    bits by double hashing.
+
+    :param int capacity:
+        the expected number of distinct hashes.
+
+    :param float error_rate:
+        the false positive rate at capacity.
+    """
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(1, int(capacity))
+        size = -capacity * math.log(error_rate) / math.log(2) ** 2
+
+        self.size = 2 ** max(6, int(math.ceil(math.log(size, 2))))
+        self.hashes = max(1, int(round(size / capacity * math.log(2))))
+        self.bits = np.zeros(self.size // 8, dtype=np.uint8)
+
+    @classmethod
+    def from_hashes(cls, hashes, error_rate=0.01):
+        hashes = np.unique(np.asarray(hashes, dtype=np.uint64))
+
+        result = cls(len(hashes), error_rate=error_rate)
+        result.add(hashes)
+        return result
+
+    def add(self, hashes):
+        lower, upper = _split_hashes(hashes)
+        bits = np.unpackbits(self.bits).astype(bool)
+
+        for idx in range(self.hashes):
+            bits[self._position(lower, upper, idx)] = True
+
+        self.bits = np.packbits(bits)
+
+    def contains(self, hashes):
+        """Return a boolean array, whether each hash may be contained in the filter."""
+        lower, upper = _split_hashes(hashes)
+        bits = np.unpackbits(self.bits).astype(bool)
+
+        # only test the remaining candidates for each further position
+        candidates = np.arange(len(lower))
+
+        for idx in range(self.hashes):
+            candidates = candidates[bits[self._position(lower[candidates], upper[candidates], idx)]]
+
+        result = np.zeros(len(lower), dtype=bool)
+        result[candidates] = True
+        return result
+
+    def _position(self, lower, upper, idx):
+        return (lower + np.uint64(idx) * upper) & np.uint64(self.size - 1)
+
+
+def _split_hashes(hashes):
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    return hashes & np.uint64(0xffffffff), (hashes >> np.uint64(32)) | np.uint64(1)
+
+
+def hash_rows(df, columns):
+    """Hash the values of the given columns per row, independent of the column names."""
+    if len(columns) == 1:
+        return pd.util.hash_array(np.asarray(df[columns[0]]))
+
+    return pd.util.hash_pandas_object(df[list(columns)], index=False).values
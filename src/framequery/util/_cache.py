@@ -0,0 +1,81 @@
+"""A small, thread-safe LRU cache."""
+from __future__ import print_function, division, absolute_import
+
+import collections
+import threading
+
+CacheInfo = collections.namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+class LRUCache(object):
+    """A bounded mapping that evicts the least recently used entries.
+
+    :param int maxsize:
+        the maximum number of entries. If zero, nothing is cached.
+
+    """
+    def __init__(self, maxsize=128):
+        self._lock = threading.RLock()
+        self._data = collections.OrderedDict()
+        self._maxsize = int(maxsize)
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def maxsize(self):
+        return self._maxsize
+
+    @maxsize.setter
+    def maxsize(self, maxsize):
+        with self._lock:
+            self._maxsize = int(maxsize)
+            self._evict()
+
+    def get(self, key, factory):
+        """Return the value stored for ``key``, call ``factory()`` on misses.
+
+        The factory is called without holding the lock, concurrent misses of the
+        same key may therefore compute the value multiple times. Exceptions
+        raised by the factory are not cached.
+        """
+        with self._lock:
+            try:
+                # NOTE: re-insert to mark as recently used (no move_to_end in py27)
+                value = self._data.pop(key)
+
+            except KeyError:
+                self.misses += 1
+
+            else:
+                self._data[key] = value
+                self.hits += 1
+                return value
+
+        value = factory()
+
+        with self._lock:
+            self._data[key] = value
+            self._evict()
+
+        return value
+
+    def clear(self):
+        """Remove all entries and reset the hit / miss counters."""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self._maxsize, len(self._data))
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def _evict(self):
+        while len(self._data) > max(self._maxsize, 0):
+            self._data.popitem(last=False)
@@ -114,8 +114,9 @@ def cast_json(obj):
     return json.loads(obj)
 
 
-def copy_from(filename, *args):
+def copy_from(filename, *args, **kwargs):
     options = dict(zip(args[:-1:2], args[1::2]))
+    options.update(kwargs)
 
     format = options.pop('format', 'csv')
 
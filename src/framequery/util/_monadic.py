@@ -6,11 +6,15 @@ This mechanism is used in three ways inside framequery:
 - parse sequences into object trees (parsing)
 - extract parts of an object tree (matching)
 
+Each parser returns a tuple ``(matches, rest, debug)``. Most parsers carry a
+debug-free variant as their ``fast`` attribute, see :func:`fast`.
 """
 from __future__ import print_function, division, absolute_import
 
+import contextlib
 import logging
 import re
+import threading
 
 _logger = logging.getLogger(__name__)
 
@@ -93,7 +97,13 @@ class MatchResult(object):
 
 
 class RuleSet(object):
-    """A dispatcher based on matching rules"""
+    """A dispatcher based on matching rules
+
+    Rules are tried in the order they were added. For each type of object, the
+    rules that can match it are computed once: rules with ``instanceof``
+    matchers are selected by type without calling the matcher, all other rules
+    are matched as usual.
+    """
     @classmethod
     def make(cls, name=None, rules=()):
         def impl(root):
@@ -107,6 +117,7 @@ class RuleSet(object):
 
         self.name = name
         self.rules = []
+        self._dispatch = {}
 
         for m, t in rules:
             self.add(m, t)
@@ -118,8 +129,8 @@ class RuleSet(object):
         return rule_impl
 
     def add(self, matcher, transform):
-        # TODO: precompute dispatcher table based on matcher class
         self.rules.append((matcher, transform))
+        self._dispatch = {}
 
     def __call__(self, obj, *args):
         return self.root(self, obj, *args)
@@ -128,12 +139,32 @@ class RuleSet(object):
         return self.apply_rules(obj, *args)
 
     def apply_rules(self, obj, *args):
-        for m, t in self.rules:
-            if match(obj, m):
+        try:
+            candidates = self._dispatch[type(obj)]
+
+        except KeyError:
+            candidates = self._dispatch[type(obj)] = self._get_candidates(type(obj))
+
+        for m, t, type_only in candidates:
+            if type_only or match(obj, m):
                 return t(self, obj, *args)
 
         raise ValueError('not support, no rule matches {}'.format(obj))
 
+    def _get_candidates(self, obj_type):
+        candidates = []
+
+        for m, t in self.rules:
+            cls = getattr(m, 'instanceof', None)
+
+            if cls is None:
+                candidates.append((m, t, False))
+
+            elif issubclass(obj_type, cls):
+                candidates.append((m, t, True))
+
+        return candidates
+
     def __repr__(self):
         if self.name is not None:
             return 'RuleSet(name={}, ...)'.format(self.name)
@@ -173,6 +204,21 @@ class Status(object):
         return dict(status=s, **kwargs)
 
 
+def fast(matcher):
+    """Return the debug-free variant of a parser.
+
+    Debug-free parsers return ``None`` instead of debug information and do not
+    allocate any debug structures. For parsers without a dedicated variant, the
+    parser itself is returned.
+    """
+    return getattr(matcher, 'fast', matcher)
+
+
+def _with_fast(impl, fast_impl):
+    impl.fast = fast_impl
+    return impl
+
+
 def capture(matcher, group=0):
     @_delegate(matcher, where='capture')
     def capture_impl(m, r, d, seq):
@@ -198,7 +244,17 @@ def _delegate(matcher, func=None, **kwargs):
 
             return func(m, r, Status.succeed(children=[d], **kwargs), seq)
 
-        return delegated
+        fast_matcher = fast(matcher)
+
+        def delegated_fast(seq):
+            m, r, _ = fast_matcher(seq)
+
+            if m is None:
+                return None, seq, None
+
+            return func(m, r, None, seq)
+
+        return _with_fast(delegated, delegated_fast)
 
     return delegate_impl if func is None else delegate_impl(func)
 
@@ -229,10 +285,79 @@ class define(object):
 
         return self._parser(seq)
 
+    def fast(self, seq):
+        if self._parser is None:
+            self._parser = self.factory(self)
+
+        return fast(self._parser)(seq)
+
+
+_packrat_state = threading.local()
+
+
+@contextlib.contextmanager
+def packrat():
+    """Memoize the results of :func:`memo` parsers while inside this context.
+
+    The memo table is keyed by the parser and the position in the input. The
+    position is given by the length of the remaining sequence, therefore all
+    memoized parsers must be applied to suffixes of the same sequence. The
+    table is local to the current thread and discarded when leaving the context.
+    """
+    old_table = getattr(_packrat_state, 'table', None)
+    _packrat_state.table = {}
+
+    try:
+        yield
+
+    finally:
+        _packrat_state.table = old_table
+
+
+def memo(matcher):
+    """Mark a parser for memoization inside :func:`packrat` contexts.
+
+    Outside of packrat contexts the parser is called directly.
+    """
+    def memo_impl(seq):
+        table = getattr(_packrat_state, 'table', None)
+
+        if table is None:
+            return matcher(seq)
+
+        key = memo_impl, len(seq)
+        result = table.get(key)
+
+        if result is None:
+            result = table[key] = matcher(seq)
+
+        return result
+
+    fast_matcher = fast(matcher)
+
+    def memo_fast(seq):
+        table = getattr(_packrat_state, 'table', None)
+
+        if table is None:
+            return fast_matcher(seq)
+
+        key = memo_fast, len(seq)
+        result = table.get(key)
+
+        if result is None:
+            result = table[key] = fast_matcher(seq)
+
+        return result
+
+    return _with_fast(memo_impl, memo_fast)
+
 
 def literal(*vals):
     """Insert values into the result list"""
-    return lambda seq: (list(vals), seq, Status.succeed(where='insert'))
+    return _with_fast(
+        lambda seq: (list(vals), seq, Status.succeed(where='insert')),
+        lambda seq: (list(vals), seq, None),
+    )
 
 
 def optional(matcher):
@@ -244,7 +369,17 @@ def optional(matcher):
 
         return m, s, Status.succeed(children=[d], where='optional')
 
-    return optional_impl
+    fast_matcher = fast(matcher)
+
+    def optional_fast(seq):
+        m, s, _ = fast_matcher(seq)
+
+        if m is None:
+            return [], seq, None
+
+        return m, s, None
+
+    return _with_fast(optional_impl, optional_fast)
 
 
 def sequence(*matchers):
@@ -264,7 +399,23 @@ def sequence(*matchers):
 
         return result, s, Status.succeed(children=children, where='sequence')
 
-    return sequence_impl
+    fast_matchers = [fast(matcher) for matcher in matchers]
+
+    def sequence_fast(seq):
+        result = []
+        s = seq
+
+        for matcher in fast_matchers:
+            m, s, _ = matcher(s)
+
+            if m is None:
+                return None, seq, None
+
+            result += m
+
+        return result, s, None
+
+    return _with_fast(sequence_impl, sequence_fast)
 
 
 def repeat(matcher):
@@ -283,7 +434,22 @@ def repeat(matcher):
 
         return parts, seq, Status.succeed(children=children, where='repeat')
 
-    return repeat_impl
+    fast_matcher = fast(matcher)
+
+    def repeat_fast(seq):
+        parts = []
+
+        while True:
+            p, seq, _ = fast_matcher(seq)
+
+            if p is None:
+                break
+
+            parts += p
+
+        return parts, seq, None
+
+    return _with_fast(repeat_impl, repeat_fast)
 
 
 def any(*matchers):
@@ -298,7 +464,18 @@ def any(*matchers):
 
         return None, s, Status.fail(consumed=0, children=children, where='any')
 
-    return any_impl
+    fast_matchers = [fast(matcher) for matcher in matchers]
+
+    def any_fast(s):
+        for matcher in fast_matchers:
+            m, r, _ = matcher(s)
+
+            if m is not None:
+                return m, r, None
+
+        return None, s, None
+
+    return _with_fast(any_impl, any_fast)
 
 
 def one(matcher):
@@ -316,12 +493,28 @@ def one(matcher):
 
         return m, seq[1:], Status.succeed(where='one', children=[d])
 
-    return one_impl
+    fast_matcher = fast(matcher)
+
+    def one_fast(seq):
+        if not seq:
+            return None, seq, None
+
+        m, r, _ = fast_matcher(seq[0])
+
+        if m is None or r:
+            return None, seq, None
+
+        return m, seq[1:], None
+
+    return _with_fast(one_impl, one_fast)
 
 
 def lit(val):
     """Accept a single item and return the given value."""
-    return lambda seq: ([val], seq[1:], Status.succeed(where='lit'))
+    return _with_fast(
+        lambda seq: ([val], seq[1:], Status.succeed(where='lit')),
+        lambda seq: ([val], seq[1:], None),
+    )
 
 
 def rep(matcher):
@@ -393,7 +586,15 @@ def map_verbatim(f, *p):
             where='map_verbatim',
         )
 
-    return impl
+    def impl_fast(s):
+        for n, c in by_length:
+            r = f(s[:n])
+            if r in c:
+                return [r], s[n:], None
+
+        return None, s, None
+
+    return _with_fast(impl, impl_fast)
 
 
 # ************************************************
@@ -418,7 +619,16 @@ def regex(p):
         r = m.group(0)
         return [r], s[len(r):], Status.succeed(consumed=len(r))
 
-    return impl
+    def impl_fast(s):
+        m = p.match(s)
+
+        if m is None:
+            return None, s, None
+
+        r = m.group(0)
+        return [r], s[len(r):], None
+
+    return _with_fast(impl, impl_fast)
 
 
 # NOTE: do not use str.find to avoid py2 incompatibility
@@ -447,13 +657,17 @@ def string(quote='\'', find=lambda s, n, i: s.find(n, i)):
 
         return [s[:idx + 1]], s[idx + 1:], Status.succeed(consumed=idx + 1)
 
-    return impl
+    def impl_fast(s):
+        m, r, _ = impl(s)
+        return m, r, None
+
+    return _with_fast(impl, impl_fast)
 
 
 def pred(func):
     def pred_impl(obj):
         if not obj:
-            return [], obj, Status.fail(where='pred<%s>' % func, message='no input')
+            return None, obj, Status.fail(where='pred<%s>' % func, message='no input')
 
         if not func(obj[0]):
             return None, obj, Status.fail(
@@ -463,7 +677,13 @@ def pred(func):
 
         return [obj[0]], obj[1:], Status.succeed(where='pred<%s>' % func)
 
-    return pred_impl
+    def pred_fast(obj):
+        if not obj or not func(obj[0]):
+            return None, obj, None
+
+        return [obj[0]], obj[1:], None
+
+    return _with_fast(pred_impl, pred_fast)
 
 
 def eq(val):
@@ -475,7 +695,11 @@ def ne(val):
 
 
 def instanceof(cls):
-    return pred(lambda obj: isinstance(obj, cls))
+    impl = pred(lambda obj: isinstance(obj, cls))
+
+    # NOTE: used by RuleSet to dispatch on the type without calling the matcher
+    impl.instanceof = cls
+    return impl
 
 
 wildcard = pred(lambda _: True)
@@ -494,11 +718,23 @@ class construct(object):
         else:
             self.matcher = matcher
 
+        self._fast_matcher = fast(self.matcher)
+
     def __call__(self, seq):
         matches, rest, debug = self.matcher(seq)
         if matches is None:
             return None, seq, Status.fail(children=[debug], where='construct %s' % self.cls)
 
+        return [self._build(matches)], rest, Status.succeed(children=[debug], where='construct %s' % self.cls)
+
+    def fast(self, seq):
+        matches, rest, _ = self._fast_matcher(seq)
+        if matches is None:
+            return None, seq, None
+
+        return [self._build(matches)], rest, None
+
+    def _build(self, matches):
         kw = {}
         for d in matches:
             duplicates = set(kw) & set(d)
@@ -508,13 +744,11 @@ class construct(object):
             kw.update(d)
 
         try:
-            res = self.cls(**kw)
+            return self.cls(**kw)
 
         except Exception as exc:
             raise RuntimeError('error constructing %s: %s' % (self.cls, exc))
 
-        return [res], rest, Status.succeed(children=[debug], where='construct %s' % self.cls)
-
     def __repr__(self):
         return 'construct(%r, ...)' % self.cls
 
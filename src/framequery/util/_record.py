@@ -1,11 +1,64 @@
 from __future__ import print_function, division, absolute_import
 
-import collections
 import itertools as it
+import operator
 
+try:
+    from collections.abc import Mapping, Sequence
 
-class Record(object):
-    """Class to simplify creating typed nodes in ASTs, etc.."""
+except ImportError:
+    from collections import Mapping, Sequence
+
+
+class RecordMeta(type):
+    """Generate ``__slots__`` and field accessors for record classes."""
+    def __new__(mcls, name, bases, ns):
+        fields = tuple(ns.get('__fields__', _inherited(bases, '__fields__', ())))
+        types = tuple(ns.get('__types__', _inherited(bases, '__types__', ())))
+
+        if '__slots__' not in ns:
+            base_slots = {
+                slot for base in bases for cls in base.__mro__ for slot in cls.__dict__.get('__slots__', ())
+            }
+            ns['__slots__'] = tuple(field for field in fields if field not in base_slots)
+
+        ns['_types'] = tuple(
+            (field, type) for field, type in zip(fields, types) if type is not None
+        )
+        ns['_key'] = staticmethod(_make_key(fields))
+
+        return super(RecordMeta, mcls).__new__(mcls, name, bases, ns)
+
+
+def _inherited(bases, name, default):
+    for base in bases:
+        if hasattr(base, name):
+            return getattr(base, name)
+
+    return default
+
+
+def _make_key(fields):
+    if not fields:
+        return lambda obj: ()
+
+    if len(fields) == 1:
+        field, = fields
+        return lambda obj: (getattr(obj, field),)
+
+    return operator.attrgetter(*fields)
+
+
+# NOTE: create the base class by calling the metaclass to support py2 and py3
+_RecordBase = RecordMeta('_RecordBase', (object,), {'__slots__': ()})
+
+
+class Record(_RecordBase):
+    """Class to simplify creating typed nodes in ASTs, etc..
+
+    Records are immutable, their hash is computed once and then cached.
+    """
+    __slots__ = ('_hash',)
     __fields__ = ()
     __types__ = ()
 
@@ -14,46 +67,80 @@ class Record(object):
         if unknown:
             raise ValueError('unknown fields: {}'.format(unknown))
 
-        kwargs.update(dict(zip(self.__fields__, args)))
-
-        types = dict(zip(self.__fields__, self.__types__))
+        kwargs.update(zip(self.__fields__, args))
 
         for key in self.__fields__:
-            type = types.get(key)
+            object.__setattr__(self, key, kwargs.get(key))
+
+        self._coerce(self._types)
 
-            val = kwargs.get(key)
-            if val is not None and type is not None:
-                val = type(val)
+    def _coerce(self, types):
+        for key, type in types:
+            val = getattr(self, key)
+            if val is not None:
+                object.__setattr__(self, key, type(val))
 
-            setattr(self, key, val)
+    def __setattr__(self, name, value):
+        raise AttributeError('records are immutable, use update(...)')
 
     def __eq__(self, other):
+        if self is other:
+            return True
+
         try:
             other_key = other.key
 
         except AttributeError:
             return NotImplemented
 
+        # NOTE: records with unhashable fields are still comparable, only use cached hashes
+        if type(self) is type(other):
+            try:
+                if self._hash != other._hash:
+                    return False
+
+            except AttributeError:
+                pass
+
         return self.key() == other_key()
 
     def __hash__(self):
-        return hash((type(self),) + self.key())
+        try:
+            return self._hash
+
+        except AttributeError:
+            pass
+
+        result = hash((type(self),) + self.key())
+        object.__setattr__(self, '_hash', result)
+        return result
+
+    def __reduce__(self):
+        return self.__class__, self.key()
 
     def __repr__(self):
         kv_pairs = ', '.join('{}={!r}'.format(k, getattr(self, k)) for k in self.__fields__)
         return '{}({})'.format(self.__class__.__name__, kv_pairs)
 
     def key(self):
-        return tuple(getattr(self, k) for k in self.__fields__)
+        return self._key(self)
 
     def items(self):
         return zip(self.__fields__, self.key())
 
     def update(self, **kwargs):
-        values = self.key()
-        values = dict(zip(self.__fields__, values))
-        values.update(kwargs)
-        return self.__class__(**values)
+        unknown = set(kwargs) - set(self.__fields__)
+        if unknown:
+            raise ValueError('unknown fields: {}'.format(unknown))
+
+        result = object.__new__(type(self))
+
+        for key in self.__fields__:
+            object.__setattr__(result, key, kwargs[key] if key in kwargs else getattr(self, key))
+
+        # only coerce the updated values, the others have already been coerced
+        result._coerce([(key, type) for key, type in self._types if key in kwargs])
+        return result
 
 
 def diff(a, b):
@@ -77,24 +164,69 @@ def diff(a, b):
     return it.chain.from_iterable(diff(ak[k], bk[k]) for k in keys)
 
 
-def walk(obj):
-    if isinstance(obj, collections.Mapping):
-        yield obj
-        for value in obj.values():
-            for item in walk(value):
-                yield item
+def walk(obj, types=None):
+    """Iterate over all objects of a tree of records, mappings, and sequences.
+
+    The objects are yielded in pre-order, containers before their children.
+
+    :param types:
+        if given, only yield instances of these types. The whole tree is still
+        traversed.
+    """
+    stack = [obj]
+
+    while stack:
+        obj = stack.pop()
+
+        if types is None or isinstance(obj, types):
+            yield obj
+
+        obj_type = type(obj)
+
+        if obj_type in _leaf_types:
+            continue
+
+        elif obj_type is list or obj_type is tuple:
+            children = obj
+
+        elif isinstance(obj, Record):
+            children = obj.key()
+
+        elif isinstance(obj, Mapping):
+            children = list(obj.values())
+
+        elif isinstance(obj, Sequence) and not isinstance(obj, _string_types):
+            children = obj
+
+        else:
+            continue
+
+        # NOTE: push in reverse to pop the children in order
+        stack.extend(reversed(children))
+
+
+_string_types = (str, type(u''))
+_leaf_types = {type(None), bool, int, float, str, type(u'')}
+
+
+def rewrite(obj, func):
+    """Rewrite an object tree from the bottom up.
+
+    ``func`` is called for every node after its children have been rewritten
+    and returns the replacement of the node. Records, lists, and tuples are only
+    copied if any of their children changed.
+    """
+    if isinstance(obj, Record):
+        values = obj.key()
+        new_values = [rewrite(value, func) for value in values]
+
+        if any(new is not old for new, old in zip(new_values, values)):
+            obj = obj.update(**dict(zip(obj.__fields__, new_values)))
 
-    elif isinstance(obj, collections.Sequence) and not isinstance(obj, str):
-        yield obj
-        for value in obj:
-            for item in walk(value):
-                yield item
+    elif isinstance(obj, (list, tuple)):
+        new_values = [rewrite(value, func) for value in obj]
 
-    elif isinstance(obj, Record):
-        yield obj
-        for value in obj.key():
-            for item in walk(value):
-                yield item
+        if any(new is not old for new, old in zip(new_values, obj)):
+            obj = type(obj)(new_values)
 
-    else:
-        yield obj
+    return func(obj)
@@ -138,6 +138,16 @@ def test_automatic_escape_roundtrib(val):
     assert engine.execute('select %s', val).scalar() == val
 
 
+def test_executemany():
+    engine = create_engine('framequery:///')
+    engine.executor.update(foo=pd.DataFrame({'i': [0, 1, 2, 1]}))
+
+    cursor = engine.raw_connection().cursor()
+    cursor.executemany('select i from foo where i = %(i)s', [{'i': 1}, {'i': 0}])
+
+    assert cursor.fetchall() == [(1,), (1,), (0,)]
+
+
 @pytest.mark.parametrize('val', [
     '3.5',
     '4.',
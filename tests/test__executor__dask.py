@@ -1,6 +1,7 @@
 from __future__ import print_function, division, absolute_import
 
 import dask.dataframe as dd
+from dask import delayed
 import pandas as pd
 import pandas.util.testing as pdt
 
@@ -42,3 +43,96 @@ def test_dask_convert_dataframes():
             'sales': [11, 15],
         }),
     )
+
+
+def test_dask_broadcast_join():
+    """Small pandas tables are merged with each partition without a shuffle."""
+    stores = pd.DataFrame({
+        'country': [0, 0, 1, 1],
+        'id': [1, 2, 3, 4],
+    })
+
+    sales = dd.from_pandas(pd.DataFrame({
+        'store_id': [1, 2, 3, 4, 1, 2, 3, 4],
+        'sales': [5, 6, 7, 8, 1, 2, 3, 4],
+    }), npartitions=4)
+
+    query = 'select country, sales from sales join stores on store_id = id'
+    expected = pd.DataFrame({
+        'country': [0, 0, 1, 1, 0, 0, 1, 1],
+        'sales': [5, 6, 7, 8, 1, 2, 3, 4],
+    }, columns=['country', 'sales'])
+
+    actual = fq.execute(query, scope={'stores': stores, 'sales': sales}, model=fq.DaskModel())
+    assert actual.npartitions == 4
+    assert not any('shuffle' in key[0] for key in actual.dask if isinstance(key, tuple))
+    pdt.assert_frame_equal(actual.compute().reset_index(drop=True), expected)
+
+    actual = fq.execute(query, scope={'stores': stores, 'sales': sales}, model=fq.DaskModel(broadcast_threshold=0))
+    assert any('shuffle' in key[0] for key in actual.dask if isinstance(key, tuple))
+
+    actual = actual.compute().sort_values(['country', 'sales']).reset_index(drop=True)
+    pdt.assert_frame_equal(actual, expected.sort_values(['country', 'sales']).reset_index(drop=True))
+
+
+def test_dask_runtime_filter():
+    """Partitions that cannot match the keys of the smaller table are dropped before the merge."""
+    stores = pd.DataFrame({'id': range(10), 'country': [0, 1] * 5})
+    sales = dd.from_pandas(pd.DataFrame({
+        'store_id': [idx // 2 for idx in range(20)],
+        'sales': range(20),
+    }), npartitions=5)
+
+    query = 'select store_id, sales from sales join stores on store_id = id where country = 1 and id >= 6'
+    expected = pd.DataFrame({'store_id': [7, 7, 9, 9], 'sales': [14, 15, 18, 19]}, columns=['store_id', 'sales'])
+
+    model = fq.DaskModel(prune_partitions=True)
+    actual = fq.execute(query, scope={'stores': stores, 'sales': sales}, model=model)
+    assert model.pruned_partitions == 3
+    assert actual.npartitions == 2
+    pdt.assert_frame_equal(actual.compute().reset_index(drop=True), expected)
+
+    # without pruning, the rows are filtered lazily
+    for model in [fq.DaskModel(), fq.DaskModel(runtime_filters=False)]:
+        actual = fq.execute(query, scope={'stores': stores, 'sales': sales}, model=model)
+        assert model.pruned_partitions == 0
+        assert actual.npartitions == 5
+        pdt.assert_frame_equal(actual.compute().reset_index(drop=True), expected)
+
+    explained = fq.execute(
+        'explain analyze ' + query, scope={'stores': stores, 'sales': sales}, model=fq.DaskModel(prune_partitions=True),
+    )
+    explained = explained.compute().set_index('method')
+    assert explained.loc['join', 'pruned_partitions'] == 3
+
+
+def test_dask_runtime_filter__lazy():
+    calls = []
+
+    def load_stores():
+        calls.append(1)
+        return pd.DataFrame({'id': [1, 2], 'country': [0, 1]})
+
+    stores = dd.from_delayed([delayed(load_stores)()], meta=[('id', int), ('country', int)])
+    sales = dd.from_pandas(pd.DataFrame({'store_id': [1, 2, 3, 4], 'sales': range(4)}), npartitions=2)
+
+    actual = fq.execute(
+        'select store_id, sales from sales join stores on store_id = id',
+        scope={'stores': stores, 'sales': sales}, model='dask',
+    )
+    assert calls == []
+    assert sorted(actual.compute()['store_id']) == [1, 2]
+
+
+def test_dask_bloom_filter__shared_tables():
+    """The build side of the Bloom filter is also merged, its graph is shared."""
+    stores = dd.from_delayed(
+        [delayed(pd.DataFrame)({'id': [1, 2], 'country': [0, 1]})], meta=[('id', 'int64'), ('country', 'int64')],
+    )
+    sales = dd.from_pandas(pd.DataFrame({'store_id': [1, 2, 3, 4], 'sales': range(4)}), npartitions=2)
+
+    actual = fq.execute(
+        'select store_id, sales from sales join stores on store_id = id where country >= 0',
+        scope={'stores': stores, 'sales': sales}, model=fq.DaskModel(runtime_filters=False),
+    )
+    assert sorted(actual.compute()['store_id']) == [1, 2]
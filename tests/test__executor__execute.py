@@ -14,6 +14,25 @@ scope = dict(
 )
 
 
+def as_model_scope(model, tables, npartitions=2, names=None):
+    """Convert the tables, or only the given ones, into dask dataframes for the dask model."""
+    if model != 'dask':
+        return tables
+
+    return {
+        k: dd.from_pandas(df, npartitions=npartitions) if names is None or k in names else df
+        for k, df in tables.items()
+    }
+
+
+def null_to_none(values):
+    return [None if pd.isnull(value) else value for value in values]
+
+
+def null_rows_to_none(df):
+    return [tuple(null_to_none(row)) for row in df.itertuples(index=False)]
+
+
 examples = [
     ('select * from example', lambda: scope['example'].copy()),
     (
@@ -128,3 +147,430 @@ def test_readme_example():
             'sales': [11, 15],
         }),
     )
+
+
+@pytest.mark.parametrize('model', ['pandas', 'dask'])
+def test_prepare(model):
+    sc = as_model_scope(model, scope, npartitions=3)
+    executor = fq.Executor(sc, model=model)
+
+    q = 'select a, b from example where g = %(g)s and a > %(a)s'
+    statement = executor.prepare(q)
+
+    # the query is only parsed once
+    assert executor.prepare(q).ast is statement.ast
+
+    for g, expected in [(0, [1, 2]), (1, [3])]:
+        actual = executor.compute(statement.execute({'g': g, 'a': 0}))
+        assert list(actual['a']) == expected
+
+
+@pytest.mark.parametrize('model', ['pandas', 'dask'])
+@pytest.mark.parametrize('query, params_seq, batched', [
+    ('select a, b from example where g = %(g)s', [{'g': 1}, {'g': 0}, {'g': 2}, {'g': 1}], True),
+    ('select * from example where %s = g and a > 1', [(0,), (1,)], True),
+    ('select a from example where g = %s and b = %s', [(0, 5), (1, 6), (0, 6)], True),
+    ('select a from example where g = %s order by a desc', [(0,), (1,)], False),
+    ('select a from example where g = %s', [(None,), (0,)], False),
+    ('select a from example where g = %s', [(float('nan'),), (0,)], False),
+    # pandas cannot merge ints and strings, the statement is executed per parameter set
+    ('select a from example where g = %s', [('0',), (1,)], True),
+])
+def test_executemany(model, query, params_seq, batched):
+    from framequery.executor._executor import prepare_batch
+
+    sc = as_model_scope(model, scope)
+    executor = fq.Executor(sc, model=model)
+    statement = executor.prepare(query)
+
+    assert (prepare_batch(statement.ast, params_seq) is not None) == batched
+
+    actual = statement.executemany(params_seq)
+    expected = pd.concat([
+        executor.compute(statement.execute(params)) for params in params_seq
+    ], ignore_index=True)
+
+    pdt.assert_frame_equal(actual, expected, check_dtype=False)
+
+
+def test_executemany__errors(monkeypatch):
+    executor = fq.Executor(scope)
+    statement = executor.prepare('select missing from example where g = %s')
+
+    calls = []
+    monkeypatch.setattr(statement, 'execute', lambda *args, **kwargs: calls.append(args))
+
+    # errors other than incompatible join keys are not retried per parameter set
+    with pytest.raises(ValueError, match='missing'):
+        statement.executemany([(0,), (1,)])
+
+    assert calls == []
+
+
+@pytest.mark.parametrize('model', ['pandas', 'dask'])
+def test_executemany__no_result(model):
+    sc = as_model_scope(model, scope)
+    executor = fq.Executor(dict(sc), model=model)
+    statement = executor.prepare('create table u as select * from example where g = %(g)s')
+
+    assert statement.executemany([{'g': 0}, {'g': 1}]) is None
+
+    actual = executor.compute(executor.execute('select a from u'))
+    assert list(actual['a']) == [3]
+
+
+@pytest.mark.parametrize('model', ['pandas', 'dask'])
+def test_copy_from_usecols(model, tmpdir):
+    tmpdir.join('wide.csv').write('a,b,c\n1,2,3\n4,5,6\n')
+
+    executor = fq.Executor({}, model=model)
+    actual = executor.compute(executor.execute("""
+        select a, c + 1 as d
+        from copy_from('{}')
+        where c > 3
+    """.format(tmpdir.join('wide.csv'))))
+
+    pdt.assert_frame_equal(actual.reset_index(drop=True), pd.DataFrame({'a': [4], 'd': [7]}))
+
+
+@pytest.mark.parametrize('model', ['pandas', 'dask'])
+def test_constant_conditions(model):
+    sc = as_model_scope(model, scope)
+    executor = fq.Executor(sc, model=model)
+
+    actual = executor.compute(executor.execute('select a from example where 1 = 2'))
+    assert list(actual['a']) == []
+
+    actual = executor.compute(executor.execute('select a from example where g = 0 and true'))
+    assert list(actual['a']) == [1, 2]
+
+
+@pytest.mark.parametrize('model', ['pandas', 'dask'])
+def test_common_subexpressions(model):
+    sc = as_model_scope(model, scope)
+    executor = fq.Executor(sc, model=model)
+
+    actual = executor.compute(executor.execute('''
+        select 2 * (a + b) as x, 2 * (a + b) + g as y
+        from example
+        where 2 * (a + b) > 10
+    '''))
+    assert list(actual['x']) == [14, 18]
+    assert list(actual['y']) == [14, 19]
+
+    actual = executor.compute(executor.execute('''
+        select 2 * g as gg, sum(a) as a
+        from example
+        where 2 * g >= 0
+        group by 2 * g
+    '''))
+    assert sorted(actual['gg']) == [0, 2]
+    assert sorted(actual['a']) == [3, 3]
+    assert list(sc['example'].columns) == ['a', 'b', 'g']
+
+
+@pytest.mark.parametrize('model', ['pandas', 'dask'])
+def test_reorder_joins(model):
+    sc = dict(
+        f=pd.DataFrame({'x': [1, 2, 3], 'y': [4, 5, 6]}),
+        g=pd.DataFrame({'k': [1, 2]}),
+        h=pd.DataFrame({'l': [5]}),
+    )
+
+    sc = as_model_scope(model, sc)
+
+    executor = fq.Executor(sc, model=model)
+    actual = executor.compute(executor.execute('select * from f, g, h where x = k and y = l'))
+    pdt.assert_frame_equal(
+        actual.reset_index(drop=True),
+        pd.DataFrame({'x': [2], 'y': [5], 'k': [2], 'l': [5]}, columns=['x', 'y', 'k', 'l']),
+    )
+
+
+def test_explain():
+    executor = fq.Executor(scope)
+
+    # g has two distinct values
+    assert executor.explain('select a from example where g = 1') == '\n'.join([
+        'Project(columns=[a], rows=2)',
+        '  Filter(condition=(g = 1), rows=2)',
+        '    Scan(name=example, columns=[a, g], rows=3)',
+    ])
+
+
+@pytest.mark.parametrize('model', ['pandas', 'dask'])
+@pytest.mark.parametrize('how, expected', [
+    ('inner', [(1, 'x'), (2, 'x'), (2, 'y'), (4, 'y')]),
+    ('left', [(0, None), (1, 'x'), (2, 'x'), (2, 'y'), (4, 'y'), (9, None)]),
+    ('right', [(1, 'x'), (2, 'x'), (2, 'y'), (4, 'y'), (None, 'z')]),
+])
+def test_range_join(model, how, expected):
+    sc = dict(
+        points=pd.DataFrame({'p': [0, 1, 2, 4, 9]}),
+        ranges=pd.DataFrame({'lo': [1, 2, 20], 'hi': [2, 5, 30], 'name': ['x', 'y', 'z']}),
+    )
+
+    sc = as_model_scope(model, sc)
+
+    executor = fq.Executor(sc, model=model)
+    actual = executor.compute(executor.execute(
+        'select p, name from points {} join ranges on p between lo and hi'.format(how)
+    ))
+
+    def key(row):
+        return tuple(-1 if value is None else value for value in row)
+
+    actual = null_rows_to_none(actual[['p', 'name']])
+    assert sorted(actual, key=key) == sorted(expected, key=key)
+
+
+@pytest.mark.parametrize('model', ['pandas', 'dask'])
+@pytest.mark.parametrize('query, expected', [
+    ('select v, k from t order by v asc, k asc limit 3', [(0.0, 'e'), (1.0, 'c'), (1.0, 'f')]),
+    ('select v, k from t order by v desc, k asc limit 2 offset 3', [(1.0, 'c'), (1.0, 'f')]),
+    ('select v, k from t order by k desc limit 2', [(2.0, 'g'), (1.0, 'f')]),
+    ('select v, k from t order by v asc limit 10 offset 5', [(5.0, 'b'), (None, 'a')]),
+    ('select v, k from t order by v asc limit 0', []),
+])
+def test_top_n(model, query, expected):
+    sc = dict(t=pd.DataFrame({
+        'v': [None, 5, 1, 3, 0, 1, 2],
+        'k': ['a', 'b', 'c', 'd', 'e', 'f', 'g'],
+    }))
+
+    sc = as_model_scope(model, sc, npartitions=3)
+
+    executor = fq.Executor(sc, model=model)
+    actual = executor.compute(executor.execute(query))
+
+    actual = null_rows_to_none(actual[['v', 'k']])
+    assert actual == expected
+
+
+@pytest.mark.parametrize('model', ['pandas', 'dask'])
+@pytest.mark.parametrize('condition, expected', [
+    ('a in (select c from u)', [1, 3]),
+    ('a not in (select c from u)', [2, 4]),
+    ('not (a in (select c from u))', [2, 4]),
+    ('a not in (select c from v)', []),
+    ('a not in (select c from u where c > 10)', [1, 2, 3, 4, None]),
+    ('exists (select 1 from u where u.c = t.a and u.d = t.b)', [1, 3]),
+    ('not exists (select 1 from u where u.c = t.a)', [2, 4, None]),
+    ('a > 1 and b in (select d from u where u.c = t.a)', [3]),
+    ('exists (select 1 from u) and not exists (select 1 from u where c > 10)', [1, 2, 3, 4, None]),
+])
+def test_subquery_predicates(model, condition, expected):
+    sc = dict(
+        t=pd.DataFrame({'a': [1, 2, 3, 4, None], 'b': [1, 1, 2, 2, 3]}),
+        u=pd.DataFrame({'c': [1, 3, 3], 'd': [1, 2, 2]}),
+        v=pd.DataFrame({'c': [1, None]}),
+    )
+
+    sc = as_model_scope(model, sc)
+
+    executor = fq.Executor(sc, model=model)
+    actual = executor.compute(executor.execute('select a from t where ' + condition))
+
+    actual = null_to_none(actual['a'])
+    assert sorted(actual, key=lambda v: (v is None, v)) == expected
+
+
+def test_subquery_predicates__unsupported():
+    executor = fq.Executor(dict(t=pd.DataFrame({'a': [1]}), u=pd.DataFrame({'c': [1]})))
+
+    with pytest.raises(NotImplementedError):
+        executor.execute('select a from t where exists (select 1 from u where u.c > t.a)')
+
+    with pytest.raises(NotImplementedError):
+        executor.execute('select a from t where a not in (select c from u where u.c = t.a)')
+
+
+@pytest.mark.parametrize('model', ['pandas', 'dask'])
+@pytest.mark.parametrize('query', [
+    'select (select max(c) from u) from t',
+    'select a in (select c from u) from t',
+    'select a from t where a = 1 or a in (select c from u)',
+    'select a from t where a = 1 or exists (select 1 from u)',
+    'select a from t where (select max(c) from u) > a',
+])
+def test_subquery_predicates__not_top_level(model, query):
+    sc = dict(t=pd.DataFrame({'a': [1]}), u=pd.DataFrame({'c': [1]}))
+
+    sc = as_model_scope(model, sc, npartitions=1)
+
+    executor = fq.Executor(sc, model=model)
+
+    with pytest.raises(NotImplementedError, match='only supported as top-level conjuncts'):
+        executor.execute(query)
+
+
+@pytest.mark.parametrize('model', ['pandas', 'dask'])
+def test_bloom_filter_join(model):
+    sc = dict(
+        orders=pd.DataFrame({'customer': [idx % 1000 for idx in range(5000)], 'value': range(5000)}),
+        customers=pd.DataFrame({'id': [3, 500, 2000], 'name': ['a', 'b', 'c']}),
+    )
+
+    sc = as_model_scope(model, sc, names=['orders'])
+
+    executor = fq.Executor(sc, model=model)
+    actual = executor.compute(executor.execute(
+        'select value, name from orders join customers on customer = id order by value asc'
+    ))
+
+    assert list(actual['value']) == [3, 500, 1003, 1500, 2003, 2500, 3003, 3500, 4003, 4500]
+    assert list(actual['name']) == ['a', 'b'] * 5
+
+
+def test_bloom_filter_join__selectivity():
+    build = pd.DataFrame({'id': [1, 2, 3]})
+    probe = pd.DataFrame({'k': [idx % 10 for idx in range(2000)]})
+
+    actual = fq.PandasModel().bloom_filter(build, ['id'], probe, ['k'])
+    assert {1, 2, 3} <= set(actual['k'])
+    assert len(actual) < 1000
+
+    # too many rows pass the filter
+    actual = fq.PandasModel(bloom_filter_selectivity=0.1).bloom_filter(build, ['id'], probe, ['k'])
+    assert len(actual) == 2000
+
+    # hashes of different types do not agree
+    actual = fq.PandasModel().bloom_filter(build, ['id'], probe.astype(float), ['k'])
+    assert len(actual) == 2000
+
+
+@pytest.mark.parametrize('model', ['pandas', 'dask'])
+def test_bloom_filter_join__mixed_object_keys(model):
+    # merges match 1 and 1.0 in object columns, but their hashes differ
+    sc = dict(
+        big=pd.DataFrame({'k': pd.Series(range(5000), dtype=object), 'x': range(5000)}),
+        small=pd.DataFrame({'k': pd.Series([1.0, 2.0], dtype=object), 'y': ['a', 'b']}),
+    )
+
+    sc = as_model_scope(model, sc, names=['big'])
+
+    executor = fq.Executor(sc, model=model)
+    actual = executor.compute(executor.execute('select x, y from big join small on big.k = small.k order by x asc'))
+
+    assert list(actual['x']) == [1, 2]
+    assert list(actual['y']) == ['a', 'b']
+
+
+def test_bloom_filter_join__string_keys():
+    build = pd.DataFrame({'id': ['a', 'b']})
+    probe = pd.DataFrame({'k': ['abcdefghij'[idx % 10] for idx in range(2000)]})
+
+    actual = fq.PandasModel().bloom_filter(build, ['id'], probe, ['k'])
+    assert {'a', 'b'} <= set(actual['k'])
+    assert len(actual) < 1000
+
+
+@pytest.mark.parametrize('model', ['pandas', 'dask'])
+def test_explain_statement(model):
+    sc = dict(example=scope['example'])
+
+    sc = as_model_scope(model, sc)
+
+    executor = fq.Executor(sc, model=model)
+
+    actual = executor.compute(executor.execute('explain select a from example where g = 0'))
+    assert list(actual.columns) == ['operator', 'method', 'estimated_rows']
+    assert list(actual['operator']) == [
+        'Project(columns=[a])',
+        '  Filter(condition=(g = 0))',
+        '    Scan(name=example, columns=[a, g])',
+    ]
+    assert list(actual['method']) == ['transform', 'filter_table', 'get_table']
+
+    actual = executor.compute(executor.execute('explain analyze select a from example where g = 0'))
+    assert list(actual['rows_in']) == [2, 3, 0]
+    assert list(actual['rows_out']) == [2, 2, 3]
+    assert (actual['time'] >= 0).all()
+
+    if model == 'dask':
+        assert list(actual['partitions']) == [sc['example'].npartitions] * 3
+        assert (actual['tasks'] > 0).all()
+
+
+# without an estimate of their size, tables are persisted and kept
+@pytest.mark.parametrize('limit, rows, persisted', [(None, None, True), (0, 3.0, False), (0, None, True)])
+def test_materialize_common_tables(limit, rows, persisted):
+    sc = dict(example=dd.from_pandas(scope['example'], npartitions=2))
+    model = fq.DaskModel(materialize_limit=limit)
+
+    table = sc['example'][['a', 'g']]
+    materialized, used = model.materialize(table, 0, rows=rows)
+    assert (materialized is not table) is persisted
+    assert (used > 0) is persisted
+
+    actual = fq.execute(
+        'with v as (select a, g from example) select x.a, y.a as b from v x join v y on x.g = y.g and x.a < y.a',
+        scope=sc, model=model,
+    )
+    assert sorted(actual.compute().itertuples(index=False)) == [(1, 2)]
+
+
+def test_materialize_common_tables__estimates():
+    class RecordingModel(fq.DaskModel):
+        def materialize(self, table, used=0, rows=None):
+            calls.append(rows)
+            return super(RecordingModel, self).materialize(table, used, rows=rows)
+
+    calls = []
+    executor = fq.Executor(dict(example=dd.from_pandas(scope['example'], npartitions=2)), model=RecordingModel())
+    executor.execute('analyze example')
+
+    actual = executor.compute(executor.execute(
+        'with v as (select a, g from example) select x.a, y.a as b from v x join v y on x.g = y.g and x.a < y.a'
+    ))
+    assert sorted(actual.itertuples(index=False)) == [(1, 2)]
+    assert calls == [3.0]
+
+
+def test_analyze():
+    executor = fq.Executor(dict(example=dd.from_pandas(scope['example'], npartitions=2)), model='dask')
+
+    # the size of dask dataframes is unknown before analyzing them
+    assert executor.explain('select * from example') == '\n'.join([
+        'Project(columns=[*])',
+        '  Scan(name=example)',
+    ])
+
+    # the condition selects half of the value range of a
+    executor.execute('analyze example')
+    assert executor.explain('select * from example where a > 2') == '\n'.join([
+        'Project(columns=[*], rows=2)',
+        '  Filter(condition=(a > 2), rows=2)',
+        '    Scan(name=example, rows=3)',
+    ])
+
+    # small analyzed tables are broadcast in joins
+    assert executor.execute('select * from example').npartitions == 1
+
+    executor.update(example=dd.from_pandas(scope['example'].iloc[:2], npartitions=2))
+    assert executor.stats.get('example', executor.scope['example'], lazy=False) is None
+
+    executor.execute('create table other as select * from example')
+    executor.execute('analyze other')
+    executor.execute('drop table other')
+    assert 'other' not in executor.stats.tables
+
+    with pytest.raises(ValueError):
+        fq.execute('analyze example', scope=dict(example=scope['example']))
+
+
+def test_executor_scope_aliasing():
+    tables = dict(example=scope['example'])
+    executor = fq.Executor(tables)
+
+    # created tables are added to the caller's mapping
+    executor.execute('create table u as select a from example')
+    assert 'u' in tables
+
+    # tables added to the caller's mapping are visible to the executor
+    tables['v'] = pd.DataFrame({'b': [1, 2]})
+    actual = executor.execute('select b from v')
+    assert list(actual['b']) == [1, 2]
+
+    executor.execute('drop table u')
+    assert 'u' not in tables
@@ -0,0 +1,382 @@
+from __future__ import print_function, division, absolute_import
+
+import pandas as pd
+
+from framequery.executor import PandasModel, Scope
+from framequery.executor._plan import (
+    Filter, Join, Limit, Project, Scan, Sort,
+    PlanContext, build_plan, estimate_rows, format_plan, optimize, plan_columns,
+)
+from framequery.executor._util import UniqueNameGenerator
+from framequery.parser import ast as a, parse
+
+
+scope = dict(
+    t=pd.DataFrame({'a': [1, 2], 'b': [3, 4]}),
+    u=pd.DataFrame({'c': [1, 2]}),
+)
+
+
+def test_build_plan():
+    plan = build_plan(parse('select a from t where b > 1 order by a limit 2'))
+
+    assert type(plan) is Limit
+    assert type(plan.input) is Sort
+    assert type(plan.input.input) is Project
+    assert type(plan.input.input.input) is Filter
+    assert plan.input.input.input.input == Scan('t', None)
+
+
+def test_build_plan__comma_join():
+    plan = build_plan(parse('select * from t, u'))
+    assert plan.input == Join(Scan('t', None), Scan('u', None), 'inner', None)
+
+
+def test_format_plan():
+    plan = build_plan(parse('select a from t where b > 1 limit 2'))
+
+    assert format_plan(plan) == [
+        'Limit(limit=2)',
+        '  Project(columns=[a])',
+        '    Filter(condition=(b > 1))',
+        '      Scan(name=t)',
+    ]
+
+
+def _optimized(query):
+    name_generator = UniqueNameGenerator()
+    plan = build_plan(parse(query))
+    plan = optimize(plan, scope, PandasModel(), name_generator)
+    return format_plan(plan, name_generator)
+
+
+def test_optimize__join_conditions():
+    name_generator = UniqueNameGenerator()
+    plan = build_plan(parse('select * from t, u where a = c'))
+    plan = optimize(plan, scope, PandasModel(), name_generator)
+
+    join = plan.input
+    assert type(join) is Join
+    assert join.on == a.BinaryOp('=', a.Name('a'), a.Name('c'))
+
+
+def test_optimize__unknown_columns():
+    assert _optimized('select * from t, missing where a = c') == [
+        'Project(columns=[*])',
+        '  Filter(condition=(a = c))',
+        '    Join(how=inner)',
+        '      Scan(name=t)',
+        '      Scan(name=missing)',
+    ]
+
+
+def test_optimize__push_down_join():
+    assert _optimized('select * from t join u on a = c where b > 3 and c < 2') == [
+        'Project(columns=[*])',
+        '  Join(how=inner, on=(a = c))',
+        '    Filter(condition=(b > 3))',
+        '      Scan(name=t)',
+        '    Filter(condition=(c < 2))',
+        '      Scan(name=u)',
+    ]
+
+    # conditions on the null-extended side are kept above outer joins
+    assert _optimized('select * from t left join u on a = c where b > 3 and c < 2') == [
+        'Project(columns=[*])',
+        '  Filter(condition=(c < 2))',
+        '    Join(how=left, on=(a = c))',
+        '      Filter(condition=(b > 3))',
+        '        Scan(name=t)',
+        '      Scan(name=u)',
+    ]
+
+
+def test_optimize__push_down_subquery():
+    assert _optimized('select * from (select a as x, 2 * b as y from t) sq where sq.y > 4') == [
+        'Project(columns=[*])',
+        '  Alias(alias=sq)',
+        '    Project(columns=[a as x, (2 * b) as y])',
+        '      Filter(condition=((2 * b) > 4))',
+        '        Scan(name=t)',
+    ]
+
+    # only group-by keys can be pushed below aggregates
+    assert _optimized('select * from (select a, sum(b) as s from t group by a) sq where a = 1 and s > 2') == [
+        'Project(columns=[*])',
+        '  Alias(alias=sq)',
+        '    Filter(condition=(s > 2))',
+        '      Aggregate(columns=[a, sum(b) as s], group_by=[a])',
+        '        Filter(condition=(a = 1))',
+        '          Scan(name=t)',
+    ]
+
+    # limits are never passed
+    assert _optimized('select * from (select * from t limit 1) sq where a = 1') == [
+        'Project(columns=[*])',
+        '  Alias(alias=sq)',
+        '    Filter(condition=(a = 1))',
+        '      Limit(limit=1)',
+        '        Project(columns=[*])',
+        '          Scan(name=t)',
+    ]
+
+
+def test_optimize__push_down_common_tables():
+    assert _optimized('with v as (select a from t) select * from v where a > 1') == [
+        'Project(columns=[*])',
+        '  Alias(alias=v)',
+        '    Project(columns=[a])',
+        '      Filter(condition=(a > 1))',
+        '        Scan(name=t, columns=[a])',
+    ]
+
+    # common tables used multiple times are not changed
+    assert _optimized('with v as (select a from t) select * from v x, v y where x.a > 1') == [
+        'With(ctes=[Alias])',
+        '  Alias(alias=v)',
+        '    Project(columns=[a])',
+        '      Scan(name=t, columns=[a])',
+        '  Project(columns=[*])',
+        '    Join(how=inner)',
+        '      Filter(condition=(x.a > 1))',
+        '        Scan(name=v, alias=x)',
+        '      Scan(name=v, alias=y)',
+    ]
+
+    # shadowed tables
+    assert _optimized('with t as (select a from t) select * from t where a > 1') == [
+        'Project(columns=[*])',
+        '  Alias(alias=t)',
+        '    Project(columns=[a])',
+        '      Filter(condition=(a > 1))',
+        '        Scan(name=t, columns=[a])',
+    ]
+
+
+def test_optimize__inline_common_tables():
+    # unused common tables are removed, common tables used once are inlined
+    assert _optimized('with v as (select a from t), w as (select b from t) select * from v x') == [
+        'Project(columns=[*])',
+        '  Alias(alias=x)',
+        '    Project(columns=[a])',
+        '      Scan(name=t, columns=[a])',
+    ]
+
+    # common tables used multiple times are kept
+    assert _optimized('with v as (select a from t), w as (select * from v) select * from w x, w y') == [
+        'With(ctes=[Alias])',
+        '  Alias(alias=w)',
+        '    Project(columns=[*])',
+        '      Alias(alias=v)',
+        '        Project(columns=[a])',
+        '          Scan(name=t, columns=[a])',
+        '  Project(columns=[*])',
+        '    Join(how=inner)',
+        '      Scan(name=w, alias=x)',
+        '      Scan(name=w, alias=y)',
+    ]
+
+    # the tables read by inlined common tables are not affected by later ones
+    assert _optimized('with v as (select c from u), u as (select a from t) select * from v, u') == [
+        'Project(columns=[*])',
+        '  Join(how=inner)',
+        '    Alias(alias=v)',
+        '      Project(columns=[c])',
+        '        Scan(name=u)',
+        '    Alias(alias=u)',
+        '      Project(columns=[a])',
+        '        Scan(name=t, columns=[a])',
+    ]
+
+
+def test_optimize__prune_columns():
+    assert _optimized('select b from t') == [
+        'Project(columns=[b])',
+        '  Scan(name=t, columns=[b])',
+    ]
+
+    assert _optimized('select x from (select a as x, b + 1 as y from t) sq') == [
+        'Project(columns=[x])',
+        '  Alias(alias=sq)',
+        '    Project(columns=[a as x])',
+        '      Scan(name=t, columns=[a])',
+    ]
+
+    # join keys are dropped after joining
+    assert _optimized('select t.b from t join u on t.a = c join t as v on c = v.a') == [
+        'Project(columns=[t.b as t/@/b])',
+        '  Join(how=inner, on=(c = v.a))',
+        '    Retain(columns=[t/@/b, u/@/c])',
+        '      Join(how=inner, on=(t.a = c))',
+        '        Scan(name=t)',
+        '        Scan(name=u)',
+        '    Scan(name=t, alias=v, columns=[a])',
+    ]
+
+    # at least a single column is kept
+    assert _optimized('select count(*) from t') == [
+        'Aggregate(columns=[count(*) as unique_0], group_by=[true])',
+        '  Scan(name=t, columns=[a])',
+    ]
+
+
+def test_optimize__prune_columns_table_function():
+    assert _optimized("select a, c from copy_from('file.csv') where b > 1") == [
+        'Project(columns=[a, c])',
+        '  Filter(condition=(b > 1))',
+        "    TableFunction(func=copy_from, args=['file.csv'], columns=[a, b, c])",
+    ]
+
+
+def test_plan_columns():
+    name_generator = UniqueNameGenerator()
+    model = PandasModel()
+
+    plan = build_plan(parse('select * from t, u'))
+    assert plan_columns(plan, scope, model, name_generator) == ['t/@/a', 't/@/b', 'u/@/c']
+
+    plan = build_plan(parse('select a as x, b from t'))
+    assert plan_columns(plan, scope, model, name_generator) == ['x', 'b']
+
+    plan = build_plan(parse('select * from missing'))
+    assert plan_columns(plan, scope, model, name_generator) is None
+
+
+def test_optimize__simplify():
+    assert _optimized('select a from t where b > 1 and 1 = 1') == [
+        'Project(columns=[a])',
+        '  Filter(condition=(b > 1))',
+        '    Scan(name=t)',
+    ]
+
+    assert _optimized('select a from t where 2 > 1') == [
+        'Project(columns=[a])',
+        '  Scan(name=t, columns=[a])',
+    ]
+
+    assert _optimized('select a from t where false') == [
+        'Project(columns=[a])',
+        '  Filter(condition=false)',
+        '    Scan(name=t, columns=[a])',
+    ]
+
+
+def test_optimize__common_subexpressions():
+    assert _optimized('select a + b as x, (a + b) * 2 as y from t where a + b > 1') == [
+        'Project(columns=[unique_0 as x, (unique_0 * 2) as y])',
+        '  Filter(condition=(unique_0 > 1))',
+        '    AddColumns(columns=[(a + b) as unique_0])',
+        '      Scan(name=t)',
+    ]
+
+    # expressions not used by the filter are computed after filtering
+    assert _optimized('select -(a + b) as x, a + b as y from t where b > 1') == [
+        'Project(columns=[(-unique_0) as x, unique_0 as y])',
+        '  AddColumns(columns=[(a + b) as unique_0])',
+        '    Filter(condition=(b > 1))',
+        '      Scan(name=t)',
+    ]
+
+    assert _optimized('select a + 1 as x, count(*) as n from t group by a + 1') == [
+        'Aggregate(columns=[unique_0 as x, count(*) as n], group_by=[unique_0])',
+        '  AddColumns(columns=[(a + 1) as unique_0])',
+        '    Scan(name=t, columns=[a])',
+    ]
+
+    # hidden columns would be selected by wildcards
+    assert _optimized('select *, a + b as x from t where a + b > 1') == [
+        'Project(columns=[*, (a + b) as x])',
+        '  Filter(condition=((a + b) > 1))',
+        '    Scan(name=t)',
+    ]
+
+    # unused hidden columns are removed
+    assert _optimized('select x from (select a + b as x, (a + b) * 2 as y from t) sq') == [
+        'Project(columns=[x])',
+        '  Alias(alias=sq)',
+        '    Project(columns=[unique_0 as x])',
+        '      AddColumns(columns=[(a + b) as unique_0])',
+        '        Scan(name=t)',
+    ]
+
+
+def test_estimate_rows():
+    context = PlanContext(scope, PandasModel(), UniqueNameGenerator())
+
+    assert estimate_rows(build_plan(parse('select * from t')), context) == 2
+    assert estimate_rows(build_plan(parse('select * from t, u')), context) == 4
+    assert estimate_rows(build_plan(parse('select * from t join u on a = c')), context) == 2
+    assert estimate_rows(build_plan(parse('select count(*) from t')), context) == 1
+    assert estimate_rows(build_plan(parse('select * from missing')), context) is None
+
+
+def test_estimate_rows__statistics():
+    local_scope = Scope(
+        f=pd.DataFrame({'x': [1, 1, 2, 2], 'y': range(4)}),
+        g=pd.DataFrame({'k': [1, 1, 2, 2]}),
+    )
+    context = PlanContext(local_scope, PandasModel(), UniqueNameGenerator())
+
+    # the number of distinct values and the value ranges are used
+    assert estimate_rows(build_plan(parse('select * from f join g on x = k')), context) == 8
+    assert estimate_rows(build_plan(parse('select * from f where x = 1')), context) == 2
+    assert estimate_rows(build_plan(parse('select * from f where y < 1')), context) == 4 / 3
+
+
+def test_optimize__reorder_joins():
+    local_scope = dict(
+        f=pd.DataFrame({'x': range(100), 'y': range(100)}),
+        g=pd.DataFrame({'k': range(10)}),
+        h=pd.DataFrame({'l': range(5)}),
+    )
+
+    name_generator = UniqueNameGenerator()
+    plan = build_plan(parse('select * from f, g, h where x = k and y = l'))
+    plan = optimize(plan, local_scope, PandasModel(), name_generator)
+
+    # the smallest table first, without cross products, in the original column order
+    assert format_plan(plan, name_generator) == [
+        'Project(columns=[*])',
+        '  Retain(columns=[f/@/x, f/@/y, g/@/k, h/@/l])',
+        '    Join(how=inner, on=(x = k))',
+        '      Join(how=inner, on=(y = l))',
+        '        Scan(name=h)',
+        '        Scan(name=f)',
+        '      Scan(name=g)',
+    ]
+
+    # outer joins are not reordered
+    name_generator = UniqueNameGenerator()
+    plan = build_plan(parse('select * from f left join g on x = k left join h on y = l'))
+    assert optimize(plan, local_scope, PandasModel(), name_generator) == plan
+
+
+def test_optimize__top_n():
+    assert _optimized('select a, b from t order by b desc limit 1 offset 2') == [
+        'TopN(values=[b desc], limit=1, offset=2)',
+        '  Project(columns=[a, b])',
+        '    Scan(name=t)',
+    ]
+
+    # offsets without limits require a full sort
+    assert _optimized('select a from t order by a asc offset 1') == [
+        'Limit(offset=1)',
+        '  Sort(values=[a asc])',
+        '    Project(columns=[a])',
+        '      Scan(name=t, columns=[a])',
+    ]
+
+
+def test_build_plan__subquery_predicates():
+    query = 'select a from t where b = 1 and a in (select c from u) and not exists (select 1 from u where u.c = t.b)'
+    assert _optimized(query) == [
+        'Project(columns=[a])',
+        '  SemiJoin(how=anti, on=[t.b], null_aware=False)',
+        '    SemiJoin(how=semi, on=[a], null_aware=False)',
+        '      Filter(condition=(b = 1))',
+        '        Scan(name=t)',
+        '      Project(columns=[c])',
+        '        Scan(name=u)',
+        '    Project(columns=[u.c as unique_0])',
+        '      Scan(name=u)',
+    ]
@@ -0,0 +1,48 @@
+from __future__ import print_function, division, absolute_import
+
+from framequery.executor import PandasModel
+from framequery.executor._simplify import simplify
+from framequery.parser import parse
+
+import pytest
+
+
+@pytest.mark.parametrize('expr, expected', [
+    # constant folding
+    ('1 + 2 * 3', '7'),
+    ("'a' || 'b'", "'ab'"),
+    ('1 = 1', 'true'),
+    ('- (-1)', '1'),
+    ("upper('foo')", "'FOO'"),
+    ('a + (2 * 3)', 'a + 6'),
+    ('1 / 0', '1 / 0'),
+
+    # boolean identities
+    ('a and true', 'a'),
+    ('true and a', 'a'),
+    ('a and (1 = 2)', 'false'),
+    ('a or false', 'a'),
+    ('a or true', 'true'),
+    ('(a > 1) and (1 = 1) and (b > 2)', '(a > 1) and (b > 2)'),
+
+    # negation
+    ('not true', 'false'),
+    ('not (1 = 2)', 'true'),
+    ('not (not a)', 'a'),
+    ('- (-a)', 'a'),
+    ('not null', 'null'),
+
+    # case expressions
+    ('case when false then 1 when a then 2 end', 'case when a then 2 end'),
+    ('case when a then 1 when true then 2 else 3 end', 'case when a then 1 else 2 end'),
+    ('case when 1 = 1 then a else b end', 'a'),
+    ('case when false then a end', 'null'),
+    ('case when null then a else b end', 'b'),
+])
+def test_simplify(expr, expected):
+    assert simplify(parse(expr, 'value'), PandasModel()) == parse(expected, 'value')
+
+
+def test_simplify__unchanged():
+    expr = parse('a + b * c', 'value')
+    assert simplify(expr, PandasModel()) is expr
@@ -0,0 +1,70 @@
+from __future__ import print_function, division, absolute_import
+
+import dask.dataframe as dd
+import numpy as np
+import pandas as pd
+import pytest
+
+from framequery.executor._stats import Scope, Statistics, collect_stats, distinct_sketch, estimate_distinct
+
+
+@pytest.mark.parametrize('n', [10, 1000, 100000])
+def test_estimate_distinct(n):
+    values = np.repeat(np.arange(n), 3)
+    assert estimate_distinct(distinct_sketch(values)) == pytest.approx(n, rel=0.1)
+
+
+def test_collect_stats():
+    df = pd.DataFrame({
+        'a': [1, 2, None, 4, 4, 6],
+        'b': ['x', 'y', 'x', 'y', 'x', None],
+    })
+
+    stats = collect_stats(df)
+    assert stats.rows == 6
+    assert stats.memory > 0
+
+    assert stats.columns['a'].nulls == 1
+    assert stats.columns['a'].min == 1
+    assert stats.columns['a'].max == 6
+    assert stats.columns['a'].distinct == 4
+
+    assert stats.columns['b'].null_fraction == pytest.approx(1 / 6)
+    assert stats.columns['b'].min is None
+    assert stats.columns['b'].distinct == 2
+
+    # partitions are merged
+    dask_stats = collect_stats(dd.from_pandas(df, npartitions=3))
+    assert dask_stats.rows == 6
+
+    for name in ['a', 'b']:
+        actual = dask_stats.columns[name]
+        expected = stats.columns[name]
+        assert (actual.nulls, actual.min, actual.max, actual.distinct) == (
+            expected.nulls, expected.min, expected.max, expected.distinct,
+        )
+
+
+def test_statistics():
+    stats = Statistics()
+    df = pd.DataFrame({'a': [1, 2, 3]})
+    ddf = dd.from_pandas(df, npartitions=2)
+
+    # pandas dataframes are analyzed lazily, dask dataframes only explicitly
+    assert stats.get('t', df).rows == 3
+    assert stats.get('t', ddf) is None
+
+    stats.analyze('t', ddf)
+    assert stats.get('t', ddf, lazy=False).rows == 3
+
+    # replaced tables are not described by old statistics
+    assert stats.get('t', df.copy(), lazy=False) is None
+
+
+def test_scope():
+    scope = Scope(t=pd.DataFrame({'a': [1, 2, 3]}))
+    copy = scope.copy()
+
+    assert type(copy) is Scope
+    assert copy.stats is scope.stats
+    assert dict(copy) == dict(scope)
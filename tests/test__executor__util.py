@@ -1,8 +1,10 @@
 from __future__ import print_function, division, absolute_import
 
 from framequery.executor._util import (
-    column_from_parts, column_get_column, column_get_table, split_quoted_name,
+    Origin, UniqueNameGenerator,
+    column_from_parts, column_get_column, column_get_table, prepare_band_join, split_quoted_name,
 )
+from framequery.parser import ast as a, parse
 
 
 def test_examples():
@@ -19,3 +21,21 @@ def test_split_quoted_name():
     assert split_quoted_name('foo."bar baz"') == ['foo', 'bar baz']
 
     assert split_quoted_name('"foo..."."bar baz"') == ['foo...', 'bar baz']
+
+
+def test_prepare_band_join():
+    def prepare(condition):
+        return prepare_band_join(parse(condition, 'value'), UniqueNameGenerator(), ['l/@/x'], ['r/@/lo', 'r/@/hi'])
+
+    # the expression bounded from both sides is used as the key
+    assert prepare('x >= lo and hi > x') == (Origin.left, a.Name('x'), [
+        ('>=', a.Name('lo')),
+        ('<', a.Name('hi')),
+    ])
+    assert prepare('lo < x + 1') == (Origin.right, a.Name('lo'), [
+        ('<', a.BinaryOp('+', a.Name('x'), a.Integer('1'))),
+    ])
+
+    # equality conditions are joined by hashing, other conditions require cross joins
+    assert prepare('x = lo and x < hi') is None
+    assert prepare('x <> lo') is None
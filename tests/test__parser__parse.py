@@ -4,7 +4,7 @@ import re
 
 import pytest
 
-from framequery.parser import ast as a, parse
+from framequery.parser import ast as a, bind, parse
 from framequery.parser import _parser as p
 
 examples = [
@@ -46,6 +46,40 @@ examples = [
     ('select foo not in bar', a.Select([a.Column(a.BinaryOp('not in', a.Name('foo'), a.Name('bar')))])),
     ('select not foo = bar', a.Select([a.Column(a.UnaryOp('not', a.BinaryOp('=', a.Name('foo'), a.Name('bar'))))])),
 
+    ('select a - b - c', a.Select([
+        a.Column(a.BinaryOp('-', a.BinaryOp('-', a.Name('a'), a.Name('b')), a.Name('c')))
+    ])),
+    ("select a like 'x' and b", a.Select([
+        a.Column(a.BinaryOp('and', a.BinaryOp('like', a.Name('a'), a.String("'x'")), a.Name('b')))
+    ])),
+    ('select a = 1 or b in c', a.Select([
+        a.Column(a.BinaryOp(
+            'or',
+            a.BinaryOp('=', a.Name('a'), a.Integer('1')),
+            a.BinaryOp('in', a.Name('b'), a.Name('c')),
+        ))
+    ])),
+    ('select a between 1 and b + 1 and c', a.Select([
+        a.Column(a.BinaryOp(
+            'and',
+            a.BinaryOp(
+                'and',
+                a.BinaryOp('>=', a.Name('a'), a.Integer('1')),
+                a.BinaryOp('<=', a.Name('a'), a.BinaryOp('+', a.Name('b'), a.Integer('1'))),
+            ),
+            a.Name('c'),
+        ))
+    ])),
+    ('select a not between b and c', a.Select([
+        a.Column(a.BinaryOp(
+            'or',
+            a.BinaryOp('<', a.Name('a'), a.Name('b')),
+            a.BinaryOp('>', a.Name('a'), a.Name('c')),
+        ))
+    ])),
+    ('select -a ^ 2', a.Select([
+        a.Column(a.BinaryOp('^', a.UnaryOp('-', a.Name('a')), a.Integer('2')))
+    ])),
     ('select count(*)', a.Select([a.Column(a.CallSetFunction('count', [a.WildCard()]))])),
 
     ('select sum(foo) over()', a.Select([
@@ -79,6 +113,25 @@ examples = [
         )
     ])),
 
+    ('explain select 1', a.Explain(a.Select([a.Column(a.Integer('1'))]), False)),
+    ('EXPLAIN ANALYZE select 1', a.Explain(a.Select([a.Column(a.Integer('1'))]), True)),
+    ('analyze foo, bar', a.Analyze([a.Name('foo'), a.Name('bar')])),
+    ('select explain from t', a.Select([a.Column(a.Name('explain'))], a.FromClause([a.TableRef('t')]))),
+    ('select analyze from t', a.Select([a.Column(a.Name('analyze'))], a.FromClause([a.TableRef('t')]))),
+    ('ANALYZE analyze', a.Analyze([a.Name('analyze')])),
+
+    ('select foo not in (select bar from test)', a.Select([
+        a.Column(a.BinaryOp(
+            'not in',
+            a.Name('foo'),
+            a.SubQuery(a.Select([a.Column(a.Name('bar'))], a.FromClause([a.TableRef('test')]))),
+        ))
+    ])),
+    ('select (foo) in (bar)', a.Select([a.Column(a.BinaryOp('in', a.Name('foo'), a.Name('bar')))])),
+    ('select not exists (select 1)', a.Select([
+        a.Column(a.UnaryOp('not', a.Exists(a.Select([a.Column(a.Integer('1'))]))))
+    ])),
+    ('select exists from t', a.Select([a.Column(a.Name('exists'))], a.FromClause([a.TableRef('t')]))),
 ]
 
 
@@ -87,6 +140,49 @@ def test_parse_exaples(query, ast):
     assert parse(query) == ast
 
 
+@pytest.mark.parametrize('query,ast', examples)
+def test_parse_examples_packrat(query, ast):
+    assert parse(query, cache=False, packrat=True) == ast
+
+
+@pytest.mark.parametrize('query,ast', examples)
+def test_parse_examples_debug(query, ast):
+    assert parse(query, cache=False, debug=True) == ast
+
+
+def test_parse_nested_packrat():
+    q = 'select ' + '(' * 8 + 'a + 1' + ')' * 8
+    assert parse(q, cache=False, packrat=True) == parse(q, cache=False)
+
+
+def test_parse_long_where_clause():
+    n = 3000
+    q = 'select a from test where ' + ' and '.join('c{0} = {0}'.format(i) for i in range(n))
+    where_clause = parse(q, cache=False).where_clause
+
+    # chains are left associative
+    for i in reversed(range(1, n)):
+        assert where_clause.op == 'and'
+        assert where_clause.right == a.BinaryOp('=', a.Name('c%d' % i), a.Integer(str(i)))
+        where_clause = where_clause.left
+
+    assert where_clause == a.BinaryOp('=', a.Name('c0'), a.Integer('0'))
+
+
+@pytest.mark.parametrize('q', ['select a = not b', 'select - -a', 'select a +', 'select a between 1'])
+def test_parse_invalid_expressions(q):
+    with pytest.raises(ValueError):
+        parse(q, cache=False)
+
+
+def test_parse_errors_report_debug_info():
+    with pytest.raises(ValueError) as exc_info:
+        parse('select a from', cache=False)
+
+    assert 'extra tokens' in str(exc_info.value)
+    assert 'failure' in str(exc_info.value)
+
+
 def test_parse_table_ref():
     assert parse('test', a.TableRef) == a.TableRef('test')
     assert parse('public.test', a.TableRef) == a.TableRef('test', 'public')
@@ -146,3 +242,54 @@ def test_parse_trim():
     assert parse("trim('xyz' from 'foo')", p.special_calls) == a.Call(
         'trim', [a.String("'both'"), a.String("'xyz'"), a.String("'foo'")]
     )
+
+
+def test_parse_cache():
+    p.parse_cache.clear()
+
+    first = parse('select a from test where b = 1')
+    second = parse('select a from test where b = 1')
+
+    assert first is second
+    assert p.parse_cache.info().hits == 1
+    assert p.parse_cache.info().misses == 1
+
+    # different parsers do not share entries
+    assert parse('test', a.TableRef) == a.TableRef('test')
+    assert p.parse_cache.info().misses == 2
+
+    assert parse('select a from test where b = 1', cache=False) is not first
+
+    p.parse_cache.clear()
+    assert p.parse_cache.info() == (0, 0, p.parse_cache.maxsize, 0)
+
+
+def test_parse_cache_does_not_store_errors():
+    p.parse_cache.clear()
+
+    with pytest.raises(Exception):
+        parse('select from where')
+
+    assert len(p.parse_cache) == 0
+
+
+def test_parse_placeholders():
+    assert parse('select %s + %(b)s limit %s', paramstyle='pyformat') == a.Select(
+        [a.Column(a.BinaryOp('+', a.Placeholder(0), a.Placeholder('b')))],
+        limit_clause=a.Placeholder(1),
+    )
+
+
+def test_bind():
+    ast = parse('select %s, %s, %s, %s, %s where %s', paramstyle='pyformat')
+
+    assert bind(ast, (None, "it's", True, 2, 0.5, False)) == a.Select(
+        [
+            a.Column(a.Null()), a.Column(a.String("'it''s'")), a.Column(a.Bool('true')),
+            a.Column(a.Integer('2')), a.Column(a.Float('0.5')),
+        ],
+        where_clause=a.Bool('false'),
+    )
+
+    with pytest.raises(ValueError):
+        bind(ast, (1, 2))
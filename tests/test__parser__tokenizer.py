@@ -1,7 +1,12 @@
 from __future__ import print_function, division, absolute_import
 
+import random
+import string
+
 import pytest
 from framequery.parser import tokenize
+from framequery.parser import _parser as p
+from framequery.util import _monadic as m
 
 
 examples = [
@@ -25,3 +30,90 @@ examples = [
 @pytest.mark.parametrize('query, parts', examples)
 def test_split_examples(query, parts):
     assert tokenize(query) == parts
+
+
+def test_offsets():
+    assert list(p.iter_tokens("SELECT  'a''b' -- comment\n, 1.5e3")) == [
+        ('select', 0), ("'a''b'", 8), (',', 26), ('1.5e3', 28),
+    ]
+
+
+@pytest.mark.parametrize('query', ["select 'foo", 'select ?', "select 'foo''"])
+def test_errors(query):
+    with pytest.raises(ValueError):
+        tokenize(query)
+
+
+@pytest.mark.parametrize('query, parts', [
+    ('select %s, %s', ['select', '%0s', ',', '%1s']),
+    ('select %(a)s from t', ['select', '%(a)s', 'from', 't']),
+    ("select a %% 2, 'pg_%%'", ['select', 'a', '%', '2', ',', "'pg_%'"]),
+])
+def test_pyformat(query, parts):
+    assert tokenize(query, paramstyle='pyformat') == parts
+
+
+def test_pyformat_errors():
+    with pytest.raises(ValueError):
+        tokenize('select %d', paramstyle='pyformat')
+
+    with pytest.raises(ValueError):
+        tokenize('select 1', paramstyle='qmark')
+
+
+def _legacy_full_word(matcher):
+    non_terminating = string.ascii_letters + string.digits + '_'
+
+    @m._delegate(matcher, where='full_word')
+    def full_word_impl(matches, s, d, seq):
+        if not s or s[0] not in non_terminating:
+            return matches, s, d
+
+        return None, seq, dict(d, status=m.Status.failure)
+
+    return full_word_impl
+
+
+# the combinator based tokenizer used before the single-pass implementation
+_legacy_splitter = m.repeat(
+    m.any(
+        m.ignore(m.regex(r'--.*\n')),
+        m.regex(p.float_format),
+        m.regex(p.integer_format),
+        _legacy_full_word(m.map_verbatim(lambda s: s.lower(), *p.keywords)),
+        m.map_verbatim(lambda s: s.lower(), *p.operators),
+        m.regex(p.name_format),
+        m.ignore(m.regex(r'\s+')),
+        m.string("'"),
+        m.string('"'),
+    )
+)
+
+
+def _legacy_tokenize(query):
+    parts, rest, _ = _legacy_splitter(query)
+    return parts if rest == '' else None
+
+
+fragments = [
+    ' ', '  ', '\n', '\t', '-- comment\n', '--', '-', "'", '"', "''", 'a', 'B', '_x',
+    'select', 'SELECT', 'order', 'orders', 'Or', 'in', 'into', 'e', 'E', '1', '42', '.', '.5', '3.', '2e5', '1e',
+    '+', '<', '>', '=', '<=', '<<', '>>', '!', '::', ':', '||', '|', '(', ')', ',', '%', '#', '~', '^',
+    'é', "'x y'", '"quoted name"',
+]
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_legacy_equivalence(seed):
+    rng = random.Random(seed)
+
+    for _ in range(50):
+        query = ''.join(rng.choice(fragments) for _ in range(rng.randint(1, 30)))
+
+        try:
+            actual = tokenize(query)
+
+        except ValueError:
+            actual = None
+
+        assert actual == _legacy_tokenize(query), query
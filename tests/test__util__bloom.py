@@ -0,0 +1,24 @@
+from __future__ import print_function, division, absolute_import
+
+import numpy as np
+import pandas as pd
+
+from framequery.util._bloom import BloomFilter, hash_rows
+
+
+def test_bloom_filter():
+    bloom = BloomFilter.from_hashes(pd.util.hash_array(np.arange(1000)), error_rate=0.01)
+
+    # no false negatives
+    assert bloom.contains(pd.util.hash_array(np.arange(1000))).all()
+
+    # few false positives
+    assert bloom.contains(pd.util.hash_array(np.arange(1000, 101000))).mean() < 0.02
+
+
+def test_hash_rows():
+    left = pd.DataFrame({'a': [1, 2], 'b': ['x', 'y']})
+    right = pd.DataFrame({'c': [1, 2], 'd': ['x', 'z']})
+
+    assert list(hash_rows(left, ['a']) == hash_rows(right, ['c'])) == [True, True]
+    assert list(hash_rows(left, ['a', 'b']) == hash_rows(right, ['c', 'd'])) == [True, False]
@@ -0,0 +1,25 @@
+from __future__ import print_function, division, absolute_import
+
+from framequery.util._cache import LRUCache
+
+
+def test_lru_cache_eviction():
+    cache = LRUCache(maxsize=2)
+
+    assert cache.get('a', lambda: 1) == 1
+    assert cache.get('b', lambda: 2) == 2
+
+    # mark a as recently used, b is evicted next
+    assert cache.get('a', lambda: None) == 1
+    assert cache.get('c', lambda: 3) == 3
+
+    assert 'a' in cache
+    assert 'b' not in cache
+    assert cache.info() == (1, 3, 2, 2)
+
+    cache.maxsize = 1
+    assert list(cache._data) == ['c']
+
+    cache.maxsize = 0
+    assert cache.get('d', lambda: 4) == 4
+    assert len(cache) == 0
@@ -35,6 +35,64 @@ def test__unpack():
     assert v == a.Integer('42')
 
 
+def test__rule_set():
+    calls = []
+
+    def is_forty_two(seq):
+        calls.append(seq[0])
+        return m.eq(a.Integer('42'))(seq)
+
+    rules = m.RuleSet(name='rules')
+    rules.add(m.instanceof(a.Name), lambda _, obj: 'name')
+    rules.add(is_forty_two, lambda _, obj: 'forty two')
+    rules.add(m.instanceof((a.Integer, a.Float)), lambda _, obj: 'number')
+
+    assert rules(a.Name('foo')) == 'name'
+    assert rules(a.Integer('42')) == 'forty two'
+    assert rules(a.Integer('13')) == 'number'
+    assert rules(a.Float('1.5')) == 'number'
+
+    # generic matchers are only called for types, for which no earlier type rule exists
+    assert calls == [a.Integer('42'), a.Integer('13'), a.Float('1.5')]
+
+    rules.add(m.instanceof(str), lambda _, obj: 'str')
+    assert rules('foo') == 'str'
+
+
 def _apply(m, v):
     m, r, _ = m([v])
     return m, r[:1]
+
+
+def test__packrat():
+    calls = []
+
+    def counted(seq):
+        calls.append(len(seq))
+        return m.eq('a')(seq)
+
+    memoized = m.memo(counted)
+    matcher = m.any(m.sequence(memoized, m.eq('b')), m.sequence(memoized, m.eq('c')))
+
+    assert matcher(['a', 'c'])[:2] == (['a', 'c'], [])
+    assert calls == [2, 2]
+
+    del calls[:]
+
+    with m.packrat():
+        assert matcher(['a', 'c'])[:2] == (['a', 'c'], [])
+
+    assert calls == [2]
+
+
+def test__fast():
+    matcher = m.sequence(
+        m.optional(m.eq('x')), m.any(m.eq('a'), m.eq('b')), m.repeat(m.eq('c')),
+    )
+
+    for seq in [['a', 'c', 'c'], ['x', 'b'], ['x'], ['d', 'c']]:
+        expected = matcher(seq)
+        actual = m.fast(matcher)(seq)
+
+        assert actual[:2] == expected[:2]
+        assert actual[2] is None
@@ -0,0 +1,68 @@
+from __future__ import print_function, division, absolute_import
+
+import pickle
+
+import pytest
+
+from framequery.parser import ast as a
+from framequery.util._record import Record, diff, walk
+
+
+class Example(Record):
+    __fields__ = ['a', 'b']
+    __types__ = [None, tuple]
+
+
+def test_slots():
+    obj = Example(1, [2])
+
+    assert not hasattr(obj, '__dict__')
+    assert obj.b == (2,)
+
+    with pytest.raises(AttributeError):
+        obj.a = 2
+
+
+def test_hash_and_eq():
+    assert hash(Example(1, [2])) == hash(Example(1, (2,)))
+    assert Example(1, [2]) == Example(1, [2])
+    assert Example(1, [2]) != Example(2, [2])
+    assert {Example(1, [2]): 'x'}[Example(1, [2])] == 'x'
+
+    # unhashable fields do not prevent comparisons
+    assert a.FromClause([a.TableRef('t')]) == a.FromClause([a.TableRef('t')])
+
+
+def test_update():
+    obj = Example(1, [2])
+
+    assert obj.update(b=[3]) == Example(1, (3,))
+    assert obj.update(b=[3]).b == (3,)
+    assert obj == Example(1, [2])
+
+    with pytest.raises(ValueError):
+        obj.update(c=2)
+
+
+def test_pickle():
+    obj = a.BinaryOp('+', a.Name('a'), a.Null())
+
+    for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+        assert pickle.loads(pickle.dumps(obj, protocol=protocol)) == obj
+
+
+def test_walk_and_diff():
+    obj = a.BinaryOp('+', a.Name('a'), a.Integer('1'))
+
+    assert list(walk(obj)) == [
+        obj, '+', a.Name('a'), 'a', a.Integer('1'), '1',
+    ]
+    assert list(diff(obj, obj.update(right=a.Integer('2')))) == ["error '1' != '2'"]
+
+
+def test_walk_types():
+    obj = [a.Name('a'), {'b': (a.Name('b'), 'c')}, a.Call('f', [a.Integer('1'), a.Name('d')])]
+
+    assert list(walk(obj, a.Name)) == [a.Name('a'), a.Name('b'), a.Name('d')]
+    assert list(walk(obj, str)) == ['a', 'b', 'c', 'f', '1', 'd']
+    assert list(walk(obj))[:4] == [obj, a.Name('a'), 'a', {'b': (a.Name('b'), 'c')}]